@@ -0,0 +1,102 @@
+import os
+from typing import Any, Dict, NamedTuple, Optional
+
+from flask import request
+from sqlalchemy import event, inspect, select
+
+from .cache import LRUCache
+from .models import User, db
+from .tokens import TokenError, verify_token
+
+
+class AuthUser(NamedTuple):
+    id: int
+    name: str
+
+
+AUTH_USER_ENVIRON_KEY = "app.auth_user"
+TOKEN_CLAIMS_ENVIRON_KEY = "app.token_claims"
+
+_UNKNOWN_KEY = object()
+
+api_key_cache = LRUCache(
+    "api_keys",
+    max_entries=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL", "60")),
+)
+
+
+def resolve_user(api_key: Optional[str]) -> Optional[AuthUser]:
+    """
+    Пользователь по API-ключу. Найденные и неизвестные ключи кэшируются
+    на AUTH_CACHE_TTL секунд.
+    """
+    if not api_key:
+        return None
+
+    cached = api_key_cache.get(api_key)
+    if cached is _UNKNOWN_KEY:
+        return None
+    if cached is not None:
+        return cached
+
+    row = db.session.execute(
+        select(User.id, User.name).where(User.api_key == api_key)
+    ).one_or_none()
+
+    user = AuthUser(*row) if row is not None else None
+    api_key_cache.set(api_key, user if user is not None else _UNKNOWN_KEY)
+
+    return user
+
+
+def bearer_token(environ) -> Optional[str]:
+    scheme, _, token = environ.get("HTTP_AUTHORIZATION", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token.strip()
+    return None
+
+
+def _authenticate(environ) -> Optional[AuthUser]:
+    token = bearer_token(environ)
+    if token is None:
+        return resolve_user(environ.get("HTTP_API_KEY"))
+
+    try:
+        claims = verify_token(token)
+    except TokenError:
+        return None
+
+    environ[TOKEN_CLAIMS_ENVIRON_KEY] = claims
+    return AuthUser(claims["uid"], claims["name"])
+
+
+def current_user() -> Optional[AuthUser]:
+    """
+    Пользователь текущего запроса: по подписанному токену из заголовка
+    Authorization: Bearer (без обращения к базе) или по заголовку
+    API_KEY. Проверка выполняется один раз за запрос.
+    """
+    environ = request.environ
+    if AUTH_USER_ENVIRON_KEY not in environ:
+        environ[AUTH_USER_ENVIRON_KEY] = _authenticate(environ)
+
+    return environ[AUTH_USER_ENVIRON_KEY]
+
+
+def current_token_claims() -> Optional[Dict[str, Any]]:
+    """
+    Данные токена, которым авторизован текущий запрос.
+    """
+    current_user()
+    return request.environ.get(TOKEN_CLAIMS_ENVIRON_KEY)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_api_key(mapper, connection, target):
+    history = inspect(target).attrs.api_key.history
+    for api_key in (target.api_key, *history.deleted):
+        if api_key:
+            api_key_cache.delete(api_key)
@@ -0,0 +1,433 @@
+import atexit
+import logging
+import threading
+from itertools import chain
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from flask import Flask
+from sqlalchemy import exists, select
+
+from . import writes
+from .cache import feed_cache
+from .models import Like, Tweet, db
+from .versions import bump_feed_version
+
+logger = logging.getLogger()
+
+LikeKey = Tuple[int, int]
+
+
+class PendingLike(NamedTuple):
+    stored: bool
+    liked: bool
+
+
+class LikeOverlay(NamedTuple):
+    """
+    Ещё не записанные лайки твита: поправка к like_count и видимое
+    состояние лайка каждого пользователя с изменением в буфере.
+    """
+
+    delta: int
+    users: Dict[int, bool]
+
+
+def stored_like(tweet_id: int, user_id: int) -> Optional[bool]:
+    """
+    Стоит ли лайк в базе, или None, если твита нет. Только чтение:
+    строка твита не блокируется.
+    """
+    return db.session.scalar(
+        select(
+            exists().where(Like.tweet_id == tweet_id, Like.user_id == user_id)
+        ).where(Tweet.id == tweet_id)
+    )
+
+
+def stored_likes(tweet_ids: Sequence[int], user_id: int) -> Dict[int, bool]:
+    """
+    Стоят ли в базе лайки пользователя на твиты tweet_ids, одним
+    запросом. Несуществующих твитов в ответе нет.
+    """
+    if not tweet_ids:
+        return {}
+    rows = db.session.execute(
+        select(
+            Tweet.id,
+            exists().where(Like.tweet_id == Tweet.id, Like.user_id == user_id),
+        ).where(Tweet.id.in_(tweet_ids))
+    )
+    return {tweet_id: stored for tweet_id, stored in rows}
+
+
+class LikeBuffer:
+    """
+    Буфер отложенной записи лайков. Изменения копятся в памяти процесса,
+    схлопываясь по паре (tweet_id, user_id): лайк и снятие лайка до
+    записи взаимно уничтожаются. Фоновый поток раз в interval секунд
+    (или сразу, когда набирается flush_limit изменений) пишет их
+    в базу двумя запросами. Пока изменения не записаны, они видны
+    через поправку к like_count.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._full = False
+        self._flushes = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pending: Dict[LikeKey, PendingLike] = {}
+        self._flushing: Dict[LikeKey, PendingLike] = {}
+        self._deltas: Dict[int, int] = {}
+
+    def _visible(
+        self, key: LikeKey, stored: Optional[bool], flushes: int
+    ) -> Optional[PendingLike]:
+        """
+        Текущее состояние лайка: сначала буфер, затем запись, которая
+        сейчас пишется, затем прочитанное из базы значение stored. Оно
+        годится, только если с момента чтения не закончилась ни одна
+        запись буфера.
+        """
+        entry = self._pending.get(key)
+        if entry is not None:
+            return entry
+        entry = self._flushing.get(key)
+        if entry is not None:
+            return PendingLike(entry.liked, entry.liked)
+        if stored is not None and flushes == self._flushes:
+            return PendingLike(stored, stored)
+        return None
+
+    def submit(
+        self, tweet_id: int, user_id: int, liked: bool, flush_limit: int
+    ) -> Optional[bool]:
+        """
+        Добавляет лайк или снятие лайка в буфер. Возвращает True, если
+        видимое состояние изменилось, False, если лайк уже был в нужном
+        состоянии, и None, если твита нет.
+        """
+        return self._submit((tweet_id, user_id), liked, flush_limit, None, 0)
+
+    def submit_many(
+        self,
+        user_id: int,
+        changes: Sequence[Tuple[int, bool]],
+        flush_limit: int,
+    ) -> List[Optional[bool]]:
+        """
+        submit для пакета пар (tweet_id, liked) одного пользователя.
+        Состояние лайков, которых нет в буфере, читается из базы одним
+        запросом.
+        """
+        with self._lock:
+            flushes = self._flushes
+            unknown = [
+                tweet_id
+                for tweet_id, _ in changes
+                if self._visible((tweet_id, user_id), None, 0) is None
+            ]
+        stored = stored_likes(unknown, user_id)
+        missing = set(unknown) - stored.keys()
+
+        results: List[Optional[bool]] = []
+        for tweet_id, liked in changes:
+            if tweet_id in missing:
+                results.append(None)
+                continue
+            results.append(
+                self._submit(
+                    (tweet_id, user_id),
+                    liked,
+                    flush_limit,
+                    stored.get(tweet_id),
+                    flushes,
+                )
+            )
+        return results
+
+    def _submit(
+        self,
+        key: LikeKey,
+        liked: bool,
+        flush_limit: int,
+        stored: Optional[bool],
+        flushes: int,
+    ) -> Optional[bool]:
+        """
+        Решение по одному лайку. stored — значение из базы, прочитанное,
+        когда число законченных записей буфера было flushes; если оно
+        устарело, база читается заново.
+        """
+        tweet_id, user_id = key
+        while True:
+            with self._lock:
+                entry = self._visible(key, stored, flushes)
+                if entry is not None:
+                    return self._apply(key, entry, liked, flush_limit)
+                flushes = self._flushes
+
+            stored = stored_like(tweet_id, user_id)
+            if stored is None:
+                return None
+
+    def _apply(
+        self, key: LikeKey, entry: PendingLike, liked: bool, flush_limit: int
+    ) -> bool:
+        if entry.liked == liked:
+            return False
+
+        if entry.stored == liked:
+            self._pending.pop(key, None)
+        else:
+            self._pending[key] = PendingLike(entry.stored, liked)
+        self._change_delta(key[0], 1 if liked else -1)
+
+        if len(self._pending) >= flush_limit:
+            self._full = True
+            self._wakeup.notify()
+
+        return True
+
+    def delta(self, tweet_id: int) -> int:
+        """
+        Поправка к like_count твита на ещё не записанные изменения.
+        """
+        with self._lock:
+            return self._deltas.get(tweet_id, 0)
+
+    def overlay(self, tweet_ids: Iterable[int]) -> Dict[int, LikeOverlay]:
+        """
+        Незаписанные изменения твитов tweet_ids; твиты без изменений
+        в буфере в ответ не попадают. Проходит по всему буферу, который
+        ограничен flush_limit.
+        """
+        wanted = set(tweet_ids)
+        users: Dict[int, Dict[int, bool]] = {}
+
+        with self._lock:
+            if not self._pending and not self._flushing:
+                return {}
+            for (tweet_id, user_id), entry in chain(
+                self._flushing.items(), self._pending.items()
+            ):
+                if tweet_id in wanted:
+                    users.setdefault(tweet_id, {})[user_id] = entry.liked
+
+            return {
+                tweet_id: LikeOverlay(self._deltas.get(tweet_id, 0), changes)
+                for tweet_id, changes in users.items()
+            }
+
+    def flush(self) -> int:
+        """
+        Записывает накопленные изменения в одной транзакции. Если запись
+        не удалась, изменения возвращаются в буфер, не затирая более
+        поздние. Возвращает число записанных изменений.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                batch = self._flushing
+
+            try:
+                like_counts: Dict[int, int] = {}
+                for liked in (True, False):
+                    like_counts.update(
+                        writes.write_likes(
+                            sorted(
+                                key
+                                for key, entry in batch.items()
+                                if entry.liked is liked
+                            ),
+                            liked,
+                        )
+                    )
+                db.session.commit()
+
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._restore(batch)
+                raise
+
+            with self._lock:
+                for (tweet_id, _), entry in batch.items():
+                    self._change_delta(tweet_id, entry.stored - entry.liked)
+                self._flushing = {}
+                self._flushes += 1
+
+        if like_counts:
+            bump_feed_version()
+        for tweet_id in like_counts:
+            feed_cache.invalidate_tweet(tweet_id)
+
+        return len(batch)
+
+    def _restore(self, batch: Dict[LikeKey, PendingLike]) -> None:
+        for key, entry in batch.items():
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = entry
+            elif pending.liked == entry.stored:
+                del self._pending[key]
+            else:
+                self._pending[key] = PendingLike(entry.stored, pending.liked)
+        self._flushing = {}
+
+    def _change_delta(self, tweet_id: int, change: int) -> None:
+        delta = self._deltas.get(tweet_id, 0) + change
+        if delta:
+            self._deltas[tweet_id] = delta
+        else:
+            self._deltas.pop(tweet_id, None)
+
+    def start(self, app: Flask, interval: float) -> None:
+        """
+        Запускает фоновый поток записи, если он ещё не запущен.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(app, interval),
+                name="like-buffer",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, app: Flask, interval: float) -> None:
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(
+                    lambda: self._stopping or self._full, interval
+                )
+                stopping = self._stopping
+                self._full = False
+
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception as exc:
+                    logger.error(
+                        f'"result": False, '
+                        f'"task": like_buffer, '
+                        f'"error_type": {str(type(exc).__name__)}, '
+                        f'"error_message": {str(exc)}'
+                    )
+
+            if stopping:
+                return
+
+    def close(self) -> None:
+        """
+        Останавливает фоновый поток; перед остановкой он записывает
+        всё, что осталось в буфере.
+        """
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+            self._wakeup.notify()
+
+        if thread is not None:
+            thread.join()
+
+        with self._lock:
+            self._thread = None
+
+    def clear(self) -> None:
+        self.close()
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "flushing": len(self._flushing),
+                "tweets": len(self._deltas),
+            }
+
+
+like_buffer = LikeBuffer()
+atexit.register(like_buffer.close)
+
+
+def buffer_like(
+    app: Flask, tweet_id: int, user_id: int, liked: bool
+) -> Optional[bool]:
+    """
+    Отложенная запись лайка в режиме LIKE_WRITE_BEHIND. Фоновый поток
+    записи работает в контексте app. Версия ленты повышается,
+    а закэшированные страницы с твитом сбрасываются сразу, чтобы лента
+    показала лайк до записи.
+    """
+    config = app.config
+    like_buffer.start(app, config["LIKE_FLUSH_INTERVAL_MS"] / 1000)
+    changed = like_buffer.submit(
+        tweet_id, user_id, liked, config["LIKE_FLUSH_LIMIT"]
+    )
+    if changed:
+        show_changes([tweet_id])
+    return changed
+
+
+def buffer_likes(
+    app: Flask, user_id: int, items: List[writes.BulkItem]
+) -> List[Dict[str, Any]]:
+    """
+    Пакет лайков пользователя в режиме LIKE_WRITE_BEHIND: каждый
+    элемент проходит через буфер, как одиночный лайк, и статус
+    элемента — решение буфера.
+    """
+    config = app.config
+    like_buffer.start(app, config["LIKE_FLUSH_INTERVAL_MS"] / 1000)
+    decisions = like_buffer.submit_many(
+        user_id,
+        [(item.id, item.enabled) for item in items],
+        config["LIKE_FLUSH_LIMIT"],
+    )
+
+    results = []
+    for item, changed in zip(items, decisions):
+        if changed is None:
+            status = writes.NOT_FOUND
+        elif changed:
+            status = writes.CHANGED
+        else:
+            status = writes.UNCHANGED
+        results.append(writes.bulk_result(item, "tweet_id", status))
+
+    show_changes(
+        [item.id for item, changed in zip(items, decisions) if changed]
+    )
+    return results
+
+
+def show_changes(tweet_ids: List[int]) -> None:
+    """
+    Повышает версию ленты и сбрасывает закэшированные страницы
+    с твитами, чьи лайки изменились в буфере.
+    """
+    if tweet_ids:
+        bump_feed_version()
+    for tweet_id in tweet_ids:
+        feed_cache.invalidate_tweet(tweet_id)
@@ -0,0 +1,198 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+_caches: Dict[str, "LRUCache"] = {}
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш с TTL и ограничением по числу записей
+    и суммарному размеру значений в байтах.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        _caches[name] = self
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: int = 0) -> None:
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires_at = None
+        if self.ttl is not None:
+            expires_at = time.monotonic() + self.ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_where(self, predicate) -> int:
+        with self._lock:
+            keys = [
+                key
+                for key, (value, _, _) in self._entries.items()
+                if predicate(key, value)
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class FeedPage(NamedTuple):
+    body: bytes
+    low_id: float
+    high_id: float
+    etag: Optional[str] = None
+
+
+class FeedCache(LRUCache):
+    """
+    Кэш страниц ленты по курсору. Для каждой страницы хранится окно id,
+    которое она покрывает, чтобы сбрасывать только затронутые страницы.
+    """
+
+    def set_page(
+        self,
+        key: Hashable,
+        body: bytes,
+        low_id: float,
+        high_id: float,
+        etag: Optional[str] = None,
+    ) -> None:
+        self.set(key, FeedPage(body, low_id, high_id, etag), size=len(body))
+
+    def invalidate_new_tweet(self) -> int:
+        return self.delete_where(lambda key, page: math.isinf(page.high_id))
+
+    def invalidate_tweet(self, tweet_id: int) -> int:
+        return self.delete_where(
+            lambda key, page: page.low_id <= tweet_id <= page.high_id
+        )
+
+
+def feed_window(
+    before_id: Optional[int],
+    after_id: Optional[int],
+    tweet_ids: List[int],
+    has_more: bool,
+) -> Tuple[float, float]:
+    """
+    Окно id [low, high], которое покрывает страница ленты. Если страница
+    не ограничена сверху, high = inf: её сбрасывает любой новый твит.
+    """
+    if after_id is not None:
+        low: float = after_id + 1
+        high: float = max(tweet_ids) if has_more else math.inf
+    else:
+        high = before_id - 1 if before_id is not None else math.inf
+        low = min(tweet_ids) if has_more else 0
+
+    return low, high
+
+
+def clear_caches() -> None:
+    for cache in _caches.values():
+        cache.clear()
+        cache.reset_stats()
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {name: cache.stats() for name, cache in _caches.items()}
+
+
+feed_cache = FeedCache(
+    "feed",
+    max_entries=int(os.getenv("FEED_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("FEED_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("FEED_CACHE_TTL", "30")),
+)
+
+
+fragment_cache = LRUCache(
+    "tweet_fragments",
+    max_entries=int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(
+        os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    ),
+)
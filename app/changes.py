@@ -0,0 +1,159 @@
+import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import BigInteger, Text, delete, func, select
+from sqlalchemy.dialects.postgresql import distinct_on, insert
+
+from .models import ChangeCounter, TweetChange, db
+from .pagination import (
+    DEFAULT_PAGE_LIMIT,
+    MAX_PAGE_LIMIT,
+    PaginationError,
+    parse_int_arg,
+)
+
+TWEET_DELETED = "deleted"
+LIKES_CHANGED = "likes"
+
+PRUNED_VERSION = "tweet_changes:pruned"
+
+
+class UpdatesRequest(NamedTuple):
+    since_id: int
+    since_seq: Optional[int]
+    limit: int
+
+
+class Changes(NamedTuple):
+    deleted: List[int]
+    likes: List[Dict[str, Any]]
+    last_seq: int
+
+
+def record_change(
+    tweet_id: int, kind: str, like_count: Optional[int] = None
+) -> None:
+    """
+    Записывает изменение твита в журнал в текущей транзакции.
+    """
+    db.session.add(
+        TweetChange(tweet_id=tweet_id, kind=kind, like_count=like_count)
+    )
+
+
+def parse_updates_args(args) -> UpdatesRequest:
+    since_id = parse_int_arg(args, "since_id")
+    if since_id is None:
+        raise PaginationError("Параметр since_id обязателен")
+
+    limit = parse_int_arg(args, "limit")
+    if limit is None:
+        limit = DEFAULT_PAGE_LIMIT
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise PaginationError(
+            f"Параметр limit должен быть от 1 до {MAX_PAGE_LIMIT}"
+        )
+
+    return UpdatesRequest(
+        since_id=since_id,
+        since_seq=parse_int_arg(args, "since_seq"),
+        limit=limit,
+    )
+
+
+def change_horizon() -> int:
+    """
+    Горизонт транзакций: самый старый номер ещё не завершённой
+    транзакции. Все строки, записанные транзакциями до горизонта, уже
+    видны (или откачены); строки более новых транзакций могут
+    появиться позже, даже с меньшими id и seq. Горизонт нужно читать
+    до самих изменений, иначе строки, закоммиченные между двумя
+    запросами, останутся за курсором клиента.
+    """
+    horizon = db.session.scalar(
+        select(
+            func.pg_snapshot_xmin(func.pg_current_snapshot())
+            .cast(Text)
+            .cast(BigInteger)
+        )
+    )
+    return horizon or 0
+
+
+def changes_since(since_seq: int, since_id: int, horizon: int) -> Changes:
+    """
+    Последнее изменение каждого твита из транзакций не старше since_seq
+    (горизонта прошлого опроса). Счётчики лайков отдаются только для
+    твитов, которые уже есть у клиента (id не больше since_id): более
+    новые твиты приходят целиком. Изменения транзакций, завершившихся
+    после прошлого горизонта, могут прийти повторно.
+    """
+    rows = db.session.execute(
+        select(
+            TweetChange.tweet_id,
+            TweetChange.kind,
+            TweetChange.like_count,
+        )
+        .where(TweetChange.xid >= since_seq)
+        .ext(distinct_on(TweetChange.tweet_id))
+        .order_by(TweetChange.tweet_id, TweetChange.seq.desc())
+    ).all()
+
+    deleted = []
+    likes = []
+    for row in rows:
+        if row.kind == TWEET_DELETED:
+            deleted.append(row.tweet_id)
+        elif row.tweet_id <= since_id:
+            likes.append({"id": row.tweet_id, "like_count": row.like_count})
+
+    return Changes(
+        deleted=deleted, likes=likes, last_seq=max(since_seq, horizon)
+    )
+
+
+def changes_pruned_after(since_seq: int) -> bool:
+    """
+    True, если часть изменений не старше горизонта since_seq уже
+    удалена из журнала и клиенту нужно перечитать ленту целиком.
+    """
+    pruned_seq = db.session.scalar(
+        select(ChangeCounter.version).where(
+            ChangeCounter.name == PRUNED_VERSION
+        )
+    )
+    return pruned_seq is not None and since_seq <= pruned_seq
+
+
+def prune_changes(max_age: datetime.timedelta) -> int:
+    """
+    Удаляет записи журнала старше max_age и запоминает самую новую
+    транзакцию среди удалённых.
+    """
+    deleted = (
+        delete(TweetChange)
+        .where(TweetChange.created_at < func.now() - max_age)
+        .returning(TweetChange.xid)
+        .cte("deleted")
+    )
+    pruned_seq, count = db.session.execute(
+        select(func.max(deleted.c.xid), func.count())
+    ).one()
+
+    if pruned_seq is not None:
+        statement = insert(ChangeCounter).values(
+            name=PRUNED_VERSION, version=pruned_seq
+        )
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ChangeCounter.name],
+                set_={
+                    "version": func.greatest(
+                        ChangeCounter.version, statement.excluded.version
+                    )
+                },
+            )
+        )
+    db.session.commit()
+
+    return count
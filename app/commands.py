@@ -0,0 +1,185 @@
+import datetime
+from typing import Dict, cast
+
+import click
+from sqlalchemy import (
+    CursorResult,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    union_all,
+    update,
+)
+
+from .changes import LIKES_CHANGED, prune_changes
+from .models import Like, Subscribe, Tweet, TweetChange, User, db
+from .suggestions import refresh_all_suggestions
+from .versions import bump_feed_version, bump_versions, user_version
+
+
+def recount_like_counts() -> int:
+    """
+    Пересчитывает Tweet.like_count одним UPDATE по результатам GROUP BY
+    и возвращает число исправленных твитов. Исправления попадают
+    в журнал изменений, а версии твитов увеличиваются.
+    """
+    counts = (
+        select(Tweet.id, func.count(Like.id).label("like_count"))
+        .outerjoin(Like, Like.tweet_id == Tweet.id)
+        .group_by(Tweet.id)
+        .subquery()
+    )
+    fixed = (
+        update(Tweet)
+        .where(
+            Tweet.id == counts.c.id,
+            Tweet.like_count != counts.c.like_count,
+        )
+        .values(like_count=counts.c.like_count, version=Tweet.version + 1)
+        .returning(Tweet.id, Tweet.like_count)
+        .cte("fixed")
+    )
+    result = cast(
+        CursorResult,
+        db.session.execute(
+            insert(TweetChange).from_select(
+                ["tweet_id", "kind", "like_count"],
+                select(fixed.c.id, literal(LIKES_CHANGED), fixed.c.like_count),
+            )
+        ),
+    )
+    db.session.commit()
+    if result.rowcount:
+        bump_feed_version()
+
+    return result.rowcount
+
+
+USER_COUNTERS = ("tweets_count", "followers_count", "following_count")
+
+
+def user_counter_totals():
+    """
+    Фактические значения счётчиков пользователей: один GROUP BY
+    по tweets и один по subscribes (обе стороны подписки через UNION ALL).
+    """
+    tweets = (
+        select(Tweet.user_id, func.count().label("tweets_count"))
+        .where(Tweet.user_id.is_not(None))
+        .group_by(Tweet.user_id)
+        .subquery()
+    )
+
+    sides = union_all(
+        select(
+            Subscribe.target_id.label("user_id"),
+            literal(1).label("follower"),
+            literal(0).label("following"),
+        ),
+        select(
+            Subscribe.subscriber_id.label("user_id"),
+            literal(0).label("follower"),
+            literal(1).label("following"),
+        ),
+    ).subquery()
+    subscribes = (
+        select(
+            sides.c.user_id,
+            func.sum(sides.c.follower).label("followers_count"),
+            func.sum(sides.c.following).label("following_count"),
+        )
+        .group_by(sides.c.user_id)
+        .subquery()
+    )
+
+    return (
+        select(
+            User.id,
+            func.coalesce(tweets.c.tweets_count, 0).label("tweets_count"),
+            func.coalesce(subscribes.c.followers_count, 0).label(
+                "followers_count"
+            ),
+            func.coalesce(subscribes.c.following_count, 0).label(
+                "following_count"
+            ),
+        )
+        .outerjoin(tweets, tweets.c.user_id == User.id)
+        .outerjoin(subscribes, subscribes.c.user_id == User.id)
+        .subquery()
+    )
+
+
+def reconcile_user_counters() -> Dict[str, int]:
+    """
+    Пересчитывает денормализованные счётчики пользователей одним UPDATE
+    и возвращает число расхождений по каждому счётчику.
+    """
+    totals = user_counter_totals()
+    drifted = or_(
+        *(getattr(User, name) != totals.c[name] for name in USER_COUNTERS)
+    )
+
+    drift = db.session.execute(
+        select(
+            *(
+                func.count()
+                .filter(getattr(User, name) != totals.c[name])
+                .label(name)
+                for name in USER_COUNTERS
+            )
+        ).where(User.id == totals.c.id, drifted)
+    ).one()
+
+    fixed_ids = db.session.scalars(
+        update(User)
+        .where(User.id == totals.c.id, drifted)
+        .values({name: totals.c[name] for name in USER_COUNTERS})
+        .returning(User.id)
+    ).all()
+    if fixed_ids:
+        bump_versions(*(user_version(user_id) for user_id in fixed_ids))
+    db.session.commit()
+
+    return {"users": len(fixed_ids), **drift._asdict()}
+
+
+def register_commands(app) -> None:
+    @app.cli.command("recount-likes")
+    def recount_likes_command():
+        """Пересчитать счётчики лайков у всех твитов."""
+        fixed = recount_like_counts()
+        click.echo(f"Исправлено счётчиков лайков: {fixed}")
+
+    @app.cli.command("reconcile-user-counters")
+    def reconcile_user_counters_command():
+        """Сверить и исправить счётчики твитов и подписок пользователей."""
+        drift = reconcile_user_counters()
+        for name in USER_COUNTERS:
+            click.echo(f"Расхождений {name}: {drift[name]}")
+        click.echo(f"Исправлено пользователей: {drift['users']}")
+
+    @app.cli.command("recompute-suggestions")
+    @click.option(
+        "--batch-size",
+        default=500,
+        show_default=True,
+        help="Сколько пользователей пересчитывать одним запросом.",
+    )
+    def recompute_suggestions_command(batch_size):
+        """Пересчитать рекомендации подписок для всех пользователей."""
+        refreshed = refresh_all_suggestions(batch_size)
+        click.echo(f"Пересчитано рекомендаций: {refreshed}")
+
+    @app.cli.command("prune-tweet-changes")
+    @click.option(
+        "--hours",
+        default=24,
+        show_default=True,
+        help="Удалить изменения старше указанного числа часов.",
+    )
+    def prune_tweet_changes_command(hours):
+        """Очистить журнал изменений твитов."""
+        pruned = prune_changes(datetime.timedelta(hours=hours))
+        click.echo(f"Удалено записей журнала изменений: {pruned}")
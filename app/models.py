@@ -3,8 +3,11 @@ from typing import Any, Dict
 
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
+from .serializers import serialize
+
 load_dotenv()
 db = SQLAlchemy()
 
@@ -23,6 +26,10 @@ DATABASE_URL = (
     f"{DB_CONFIG['database']}"
 )
 
+# Номер транзакции, записавшей строку: по нему опрос обновлений находит
+# строки, закоммиченные позже, чем были выданы соседние номера.
+CURRENT_XID = db.text("pg_current_xact_id()::text::bigint")
+
 
 tweet_media = db.Table(
     "tweet_media",
@@ -47,6 +54,15 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(50), nullable=False)
     api_key = db.Column(db.String(100), nullable=False, unique=True)
+    followers_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    following_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    tweets_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
 
     tweets = db.relationship(
         "Tweet", back_populates="users", cascade="all, delete-orphan"
@@ -72,7 +88,7 @@ class User(db.Model):
         return f"Пользователь №{self.id}\nИмя: {self.name}"
 
     def to_json(self) -> Dict[str, Any]:
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serialize(self)
 
 
 class Tweet(db.Model):
@@ -80,9 +96,35 @@ class Tweet(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     tweet_data = db.Column(db.String, nullable=False)
+    like_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
+    version = db.Column(
+        db.Integer, nullable=False, default=1, server_default="1"
+    )
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=db.func.now(),
+    )
     user_id = db.Column(
         db.Integer, db.ForeignKey("users.id", ondelete="CASCADE")
     )
+    xid = db.Column(db.BigInteger, nullable=False, server_default=CURRENT_XID)
+    fanned_out = db.Column(
+        db.Boolean, nullable=False, default=True, server_default=db.true()
+    )
+
+    __table_args__ = (
+        db.Index("idx_tweet_user_id", "user_id", "id"),
+        db.Index("idx_tweet_xid", "xid"),
+        db.Index(
+            "idx_tweet_pulled",
+            "user_id",
+            "id",
+            postgresql_where=db.text("NOT fanned_out"),
+        ),
+    )
 
     likes = db.relationship(
         "Like", back_populates="tweets", cascade="all, delete-orphan"
@@ -97,7 +139,7 @@ class Tweet(db.Model):
         return f"Твит №{self.id}"
 
     def to_json(self) -> Dict[str, Any]:
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serialize(self)
 
 
 class Like(db.Model):
@@ -110,10 +152,15 @@ class Like(db.Model):
     user_id = db.Column(
         db.Integer, db.ForeignKey("users.id", ondelete="CASCADE")
     )
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=db.func.now(),
+    )
 
     __table_args__ = (
         db.UniqueConstraint("tweet_id", "user_id", name="uq_like"),
-        db.Index("idx_tweet", "tweet_id"),
+        db.Index("idx_like_tweet_id", "tweet_id", "id"),
         db.Index("idx_user", "user_id"),
     )
 
@@ -124,7 +171,7 @@ class Like(db.Model):
         return f"Лайк №{self.id}"
 
     def to_json(self) -> Dict[str, Any]:
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serialize(self)
 
 
 class Subscribe(db.Model):
@@ -142,8 +189,8 @@ class Subscribe(db.Model):
         db.UniqueConstraint(
             "subscriber_id", "target_id", name="uq_subscriber_target"
         ),
-        db.Index("idx_subscriber", "subscriber_id"),
-        db.Index("idx_target", "target_id"),
+        db.Index("idx_subscribe_subscriber_id", "subscriber_id", "id"),
+        db.Index("idx_subscribe_target_id", "target_id", "id"),
     )
 
     subscribers = db.relationship(
@@ -161,7 +208,7 @@ class Subscribe(db.Model):
         )
 
     def to_json(self) -> Dict[str, Any]:
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serialize(self)
 
 
 class Media(db.Model):
@@ -179,4 +226,101 @@ class Media(db.Model):
         return f"Файл №{self.id}"
 
     def to_json(self) -> Dict[str, Any]:
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+        return serialize(self)
+
+
+class TimelineEntry(db.Model):
+    __tablename__ = "timeline_entries"
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tweet_id = db.Column(db.Integer, primary_key=True)
+    author_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index("idx_timeline_tweet", "tweet_id"),)
+
+    def __repr__(self):
+        return (
+            f"Запись ленты: "
+            f"пользователь №{self.user_id}, "
+            f"твит №{self.tweet_id}"
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        return serialize(self)
+
+
+class ChangeCounter(db.Model):
+    __tablename__ = "change_counters"
+
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"Версия {self.name}: {self.version}"
+
+    def to_json(self) -> Dict[str, Any]:
+        return serialize(self)
+
+
+class TweetChange(db.Model):
+    __tablename__ = "tweet_changes"
+
+    seq = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    tweet_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    like_count = db.Column(db.Integer)
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=db.func.now(),
+    )
+    xid = db.Column(db.BigInteger, nullable=False, server_default=CURRENT_XID)
+
+    __table_args__ = (db.Index("idx_tweet_change_xid", "xid"),)
+
+    def __repr__(self):
+        return f"Изменение №{self.seq}: твит №{self.tweet_id}, {self.kind}"
+
+    def to_json(self) -> Dict[str, Any]:
+        return serialize(self)
+
+
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+
+    jti = db.Column(db.String(32), primary_key=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (db.Index("idx_revoked_token_expires", "expires_at"),)
+
+    def __repr__(self):
+        return f"Отозванный токен {self.jti}"
+
+    def to_json(self) -> Dict[str, Any]:
+        return serialize(self)
+
+
+class UserSuggestions(db.Model):
+    __tablename__ = "user_suggestions"
+
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    suggestions = db.Column(JSONB, nullable=False)
+    computed_at = db.Column(
+        db.DateTime(timezone=True),
+        nullable=False,
+        server_default=db.func.now(),
+    )
+
+    def __repr__(self):
+        return f"Рекомендации пользователю №{self.user_id}"
+
+    def to_json(self) -> Dict[str, Any]:
+        return serialize(self)
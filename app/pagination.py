@@ -0,0 +1,155 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 100
+MAX_BATCH_IDS = 200
+
+
+class PaginationError(ValueError):
+    pass
+
+
+class Page(NamedTuple):
+    limit: int
+    before_id: Optional[int] = None
+    after_id: Optional[int] = None
+
+
+def encode_cursor(data: Dict[str, int]) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError) as exc:
+        raise PaginationError("Некорректный курсор") from exc
+
+    if not isinstance(data, dict) or len(data) != 1:
+        raise PaginationError("Некорректный курсор")
+
+    key, value = next(iter(data.items()))
+    if (
+        key not in ("before_id", "after_id")
+        or not isinstance(value, int)
+        or isinstance(value, bool)
+        or value < 0
+    ):
+        raise PaginationError("Некорректный курсор")
+
+    return data
+
+
+def parse_int_arg(args, name: str) -> Optional[int]:
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+
+    try:
+        number = int(value)
+    except ValueError as exc:
+        raise PaginationError(f"Параметр {name} должен быть числом") from exc
+
+    if number < 0:
+        raise PaginationError(f"Параметр {name} должен быть неотрицательным")
+
+    return number
+
+
+def parse_id_list(value: str) -> List[int]:
+    """
+    Разбирает список id через запятую без повторов, сохраняя порядок.
+    """
+    ids: Dict[int, None] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not (item.isascii() and item.isdecimal()):
+            raise PaginationError("Параметр ids должен содержать числа")
+        ids[int(item)] = None
+
+    if not ids:
+        raise PaginationError("Параметр ids не должен быть пустым")
+    if len(ids) > MAX_BATCH_IDS:
+        raise PaginationError(
+            f"Параметр ids может содержать не больше {MAX_BATCH_IDS} id"
+        )
+
+    return list(ids)
+
+
+def parse_page_args(args, default_limit: int = DEFAULT_PAGE_LIMIT) -> Page:
+    """
+    Разбирает параметры keyset-пагинации: limit, before_id, after_id
+    и непрозрачный cursor (взаимоисключающий с before_id/after_id).
+    """
+    limit = parse_int_arg(args, "limit")
+    if limit is None:
+        limit = default_limit
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise PaginationError(
+            f"Параметр limit должен быть от 1 до {MAX_PAGE_LIMIT}"
+        )
+
+    before_id = parse_int_arg(args, "before_id")
+    after_id = parse_int_arg(args, "after_id")
+
+    cursor = args.get("cursor")
+    if cursor:
+        if before_id is not None or after_id is not None:
+            raise PaginationError(
+                "Параметр cursor нельзя сочетать с before_id/after_id"
+            )
+        data = decode_cursor(cursor)
+        before_id = data.get("before_id")
+        after_id = data.get("after_id")
+
+    if before_id is not None and after_id is not None:
+        raise PaginationError(
+            "Нельзя одновременно указать before_id и after_id"
+        )
+
+    return Page(limit=limit, before_id=before_id, after_id=after_id)
+
+
+def apply_keyset(query, column, page: Page):
+    """
+    Накладывает на запрос условие по ключу, сортировку и LIMIT.
+    Выбирается на одну строку больше, чтобы понять, есть ли следующая
+    страница.
+    """
+    if page.after_id is not None:
+        query = query.filter(column > page.after_id).order_by(column.asc())
+    else:
+        if page.before_id is not None:
+            query = query.filter(column < page.before_id)
+        query = query.order_by(column.desc())
+
+    return query.limit(page.limit + 1)
+
+
+def finish_page(
+    items: Sequence[Any], page: Page, key=lambda item: item.id
+) -> Dict[str, Any]:
+    """
+    Обрезает лишнюю строку, возвращает элементы в порядке убывания ключа
+    и курсор для продолжения в том же направлении.
+    """
+    has_more = len(items) > page.limit
+    page_items: List[Any] = list(items[: page.limit])
+
+    next_cursor = None
+    if page.after_id is not None:
+        if has_more:
+            next_cursor = encode_cursor({"after_id": key(page_items[-1])})
+        page_items.reverse()
+    elif has_more:
+        next_cursor = encode_cursor({"before_id": key(page_items[-1])})
+
+    return {"items": page_items, "next_cursor": next_cursor}
@@ -0,0 +1,296 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import current_app
+from sqlalchemy import column, select, true, union_all
+
+from .buffer import LikeOverlay, like_buffer
+from .cache import fragment_cache
+from .models import Like, Media, Subscribe, Tweet, User, db, tweet_media
+from .serializers import dumps
+
+
+def tweet_rows_query():
+    """
+    Колонки твита и автора для ленты без загрузки ORM-объектов.
+    """
+    return select(
+        Tweet.id,
+        Tweet.tweet_data,
+        Tweet.like_count,
+        Tweet.version,
+        User.id.label("author_id"),
+        User.name.label("author_name"),
+    ).outerjoin(User, User.id == Tweet.user_id)
+
+
+def new_tweet_rows(
+    since_id: int, since_seq: Optional[int], limit: int
+) -> Tuple[Sequence[Any], bool]:
+    """
+    Твиты с id больше since_id (не больше limit), от старых к новым, и
+    признак продолжения. С since_seq добавляются твиты с меньшими id,
+    закоммиченные после прошлого опроса: их клиент мог уже получить,
+    поэтому в limit и has_more они не считаются.
+    """
+    query = (
+        tweet_rows_query()
+        .where(Tweet.id > since_id)
+        .order_by(Tweet.id.asc())
+        .limit(limit + 1)
+    )
+    if since_seq is not None:
+        late = tweet_rows_query().where(
+            Tweet.id <= since_id, Tweet.xid >= since_seq
+        )
+        query = union_all(late, query).order_by(column("id").asc())
+
+    rows = db.session.execute(query).all()
+    has_more = sum(1 for row in rows if row.id > since_id) > limit
+    return (rows[:-1] if has_more else rows), has_more
+
+
+def likes_preview_rows(tweet_ids: List[int]):
+    """
+    Первые LIKES_PREVIEW_SIZE лайкнувших для каждого твита: LATERAL-запрос
+    читает по индексу (tweet_id, id) не больше нужного числа лайков.
+    """
+    tweets = (
+        select(Tweet.id.label("tweet_id"))
+        .where(Tweet.id.in_(tweet_ids))
+        .subquery()
+    )
+    preview = (
+        select(Like.id, Like.user_id, User.name)
+        .join(User, User.id == Like.user_id)
+        .where(Like.tweet_id == tweets.c.tweet_id)
+        .order_by(Like.id)
+        .limit(current_app.config["LIKES_PREVIEW_SIZE"])
+        .lateral()
+    )
+
+    return db.session.execute(
+        select(tweets.c.tweet_id, preview.c.user_id, preview.c.name)
+        .join(preview, true())
+        .order_by(tweets.c.tweet_id, preview.c.id)
+    )
+
+
+def overlay_likes(
+    likes: Dict[int, List[Dict[str, Any]]],
+    overlays: Dict[int, LikeOverlay],
+) -> None:
+    """
+    Накладывает на превью лайков незаписанные изменения из буфера:
+    снятые лайки убираются, новые добавляются в конец, пока есть место,
+    в порядке, в котором их запишет буфер.
+    Имена новых лайкнувших читаются одним запросом.
+    """
+    liked_ids = {
+        user_id
+        for overlay in overlays.values()
+        for user_id, liked in overlay.users.items()
+        if liked
+    }
+    names: Dict[int, str] = {}
+    if liked_ids:
+        names = {
+            user_id: name
+            for user_id, name in db.session.execute(
+                select(User.id, User.name).where(User.id.in_(liked_ids))
+            )
+        }
+
+    preview_size = current_app.config["LIKES_PREVIEW_SIZE"]
+    for tweet_id, overlay in overlays.items():
+        preview = [
+            like
+            for like in likes[tweet_id]
+            if overlay.users.get(like["user_id"], True)
+        ]
+        shown = {like["user_id"] for like in preview}
+        for user_id, liked in sorted(overlay.users.items()):
+            if len(preview) >= preview_size:
+                break
+            if liked and user_id not in shown and user_id in names:
+                preview.append({"user_id": user_id, "name": names[user_id]})
+        likes[tweet_id] = preview
+
+
+def build_feed(
+    tweet_rows: Sequence[Any],
+    overlays: Optional[Dict[int, LikeOverlay]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Собирает словари ленты из строк tweet_rows_query: вложения и превью
+    лайков догружаются двумя запросами по id всей пачки. Лайки, ещё
+    не записанные из буфера, учитываются в like_count и превью.
+    """
+    if not tweet_rows:
+        return []
+
+    tweet_ids = [row.id for row in tweet_rows]
+    if overlays is None:
+        overlays = like_buffer.overlay(tweet_ids)
+
+    attachments = defaultdict(list)
+    media_rows = db.session.execute(
+        select(tweet_media.c.tweet_id, Media.file_path)
+        .join(Media, Media.id == tweet_media.c.media_id)
+        .where(tweet_media.c.tweet_id.in_(tweet_ids))
+        .order_by(Media.id)
+    )
+    for tweet_id, file_path in media_rows:
+        attachments[tweet_id].append(file_path)
+
+    likes = defaultdict(list)
+    for tweet_id, user_id, name in likes_preview_rows(tweet_ids):
+        likes[tweet_id].append({"user_id": user_id, "name": name})
+    if overlays:
+        overlay_likes(likes, overlays)
+
+    return [
+        {
+            "id": row.id,
+            "content": row.tweet_data,
+            "attachments": attachments[row.id],
+            "author": (
+                {"id": row.author_id, "name": row.author_name}
+                if row.author_id is not None
+                else None
+            ),
+            "like_count": row.like_count
+            + (overlays[row.id].delta if row.id in overlays else 0),
+            "likes": likes[row.id],
+        }
+        for row in tweet_rows
+    ]
+
+
+def render_fragments(tweet_rows: Sequence[Any]) -> List[bytes]:
+    """
+    Закодированные JSON-фрагменты твитов в порядке tweet_rows.
+    Кэш фрагментов адресуется парой (id, version), поэтому заново
+    рендерятся только твиты, версия которых изменилась; устаревшие
+    фрагменты вытесняются по LRU. Твиты с незаписанными лайками
+    рендерятся мимо кэша: версия у них поменяется только при записи.
+    """
+    fragments: Dict[int, bytes] = {}
+    stale_rows = []
+    overlays = like_buffer.overlay(row.id for row in tweet_rows)
+
+    for row in tweet_rows:
+        if row.id in overlays:
+            stale_rows.append(row)
+            continue
+        fragment = fragment_cache.get((row.id, row.version))
+        if fragment is not None:
+            fragments[row.id] = fragment
+        else:
+            stale_rows.append(row)
+
+    versions = {row.id: row.version for row in stale_rows}
+    for item in build_feed(stale_rows, overlays):
+        fragment = dumps(item)
+        if item["id"] not in overlays:
+            fragment_cache.set(
+                (item["id"], versions[item["id"]]),
+                fragment,
+                size=len(fragment),
+            )
+        fragments[item["id"]] = fragment
+
+    return [fragments[row.id] for row in tweet_rows]
+
+
+def load_fragments(tweet_ids: Iterable[int]) -> List[Tuple[int, bytes]]:
+    """
+    Пары (id, фрагмент) в порядке tweet_ids; отсутствующие пропускаются.
+    """
+    tweet_ids = list(tweet_ids)
+    if not tweet_ids:
+        return []
+
+    rows = db.session.execute(
+        tweet_rows_query().where(Tweet.id.in_(tweet_ids))
+    ).all()
+    fragments = dict(zip((row.id for row in rows), render_fragments(rows)))
+
+    return [
+        (tweet_id, fragments[tweet_id])
+        for tweet_id in tweet_ids
+        if tweet_id in fragments
+    ]
+
+
+def encode_feed(fragments: Sequence[bytes], **fields: Any) -> bytes:
+    """
+    Собирает тело ответа ленты из готовых фрагментов без повторной
+    сериализации твитов.
+    """
+    parts = [b'{"result": true, "tweets": [', b",".join(fragments), b"]"]
+    for key, value in fields.items():
+        parts.extend((b", ", dumps(key), b": ", dumps(value)))
+    parts.append(b"}")
+
+    return b"".join(parts)
+
+
+def subscription_users_query(match_column, user_column, user_id: int):
+    """
+    Пользователи по одну сторону подписок user_id вместе с id подписки
+    (ключ keyset-пагинации). match_column = target_id даёт подписчиков,
+    subscriber_id — подписки.
+    """
+    return (
+        select(Subscribe.id, User.id.label("user_id"), User.name)
+        .join(User, User.id == user_column)
+        .where(match_column == user_id)
+    )
+
+
+def subscription_users(match_column, user_column, user_id: int, limit: int):
+    """
+    Последние limit пользователей по одну сторону подписок user_id.
+    """
+    rows = db.session.execute(
+        subscription_users_query(match_column, user_column, user_id)
+        .order_by(Subscribe.id.desc())
+        .limit(limit)
+    )
+    return [{"id": row.user_id, "name": row.name} for row in rows]
+
+
+def load_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Профиль пользователя: денормализованные счётчики подписчиков,
+    подписок и твитов и превью последних PROFILE_PREVIEW_SIZE из них за три
+    запроса.
+    """
+    user = db.session.execute(
+        select(
+            User.id,
+            User.name,
+            User.followers_count,
+            User.following_count,
+            User.tweets_count,
+        ).where(User.id == user_id)
+    ).one_or_none()
+
+    if user is None:
+        return None
+
+    preview_size = current_app.config["PROFILE_PREVIEW_SIZE"]
+    return {
+        "id": user.id,
+        "name": user.name,
+        "followers_count": user.followers_count,
+        "following_count": user.following_count,
+        "tweets_count": user.tweets_count,
+        "followers": subscription_users(
+            Subscribe.target_id, Subscribe.subscriber_id, user_id, preview_size
+        ),
+        "following": subscription_users(
+            Subscribe.subscriber_id, Subscribe.target_id, user_id, preview_size
+        ),
+    }
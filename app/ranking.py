@@ -0,0 +1,153 @@
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import Float, cast, func, select
+
+from .models import Like, Tweet, db
+from .pagination import Page
+from .timeline import followed_author_ids
+
+FEED_MODES = ("latest", "top")
+
+LIKE_WEIGHT = 1.0
+FOLLOW_WEIGHT = 2.0
+LIKED_AUTHOR_WEIGHT = 0.5
+
+
+class Candidates(NamedTuple):
+    tweet_ids: np.ndarray
+    author_ids: np.ndarray
+    like_counts: np.ndarray
+    ages_hours: np.ndarray
+
+
+def load_candidates(page: Page, limit: int) -> Candidates:
+    """
+    Признаки limit самых свежих твитов (в пределах before_id/after_id)
+    одним запросом, сразу в массивы NumPy.
+    """
+    age = cast(func.extract("epoch", func.now() - Tweet.created_at), Float)
+    query = select(
+        Tweet.id, func.coalesce(Tweet.user_id, 0), Tweet.like_count, age
+    )
+    if page.before_id is not None:
+        query = query.where(Tweet.id < page.before_id)
+    if page.after_id is not None:
+        query = query.where(Tweet.id > page.after_id)
+
+    rows = db.session.execute(
+        query.order_by(Tweet.id.desc()).limit(limit)
+    ).all()
+
+    columns = list(zip(*rows)) or [(), (), (), ()]
+    return Candidates(
+        tweet_ids=np.array(columns[0], dtype=np.int64),
+        author_ids=np.array(columns[1], dtype=np.int64),
+        like_counts=np.array(columns[2], dtype=np.float64),
+        ages_hours=np.array(columns[3], dtype=np.float64) / 3600.0,
+    )
+
+
+def liked_author_counts(user_id: int) -> Dict[int, int]:
+    """
+    Сколько лайков пользователь поставил твитам каждого автора.
+    """
+    rows = db.session.execute(
+        select(Tweet.user_id, func.count(Like.id))
+        .join(Tweet, Tweet.id == Like.tweet_id)
+        .where(Like.user_id == user_id, Tweet.user_id.is_not(None))
+        .group_by(Tweet.user_id)
+    )
+    return {author_id: count for author_id, count in rows}
+
+
+def author_affinity(
+    author_ids: np.ndarray,
+    followed_ids: List[int],
+    liked_counts: Dict[int, int],
+) -> np.ndarray:
+    """
+    Близость зрителя к автору каждого кандидата: подписка плюс
+    логарифм числа лайков, поставленных этому автору.
+    """
+    affinity = FOLLOW_WEIGHT * np.isin(author_ids, followed_ids)
+
+    if liked_counts:
+        liked_authors = np.fromiter(
+            liked_counts.keys(), dtype=np.int64, count=len(liked_counts)
+        )
+        likes = np.fromiter(
+            liked_counts.values(), dtype=np.float64, count=len(liked_counts)
+        )
+        order = np.argsort(liked_authors)
+        liked_authors, likes = liked_authors[order], likes[order]
+
+        positions = np.searchsorted(liked_authors, author_ids)
+        positions = np.minimum(positions, len(liked_authors) - 1)
+        matched = liked_authors[positions] == author_ids
+        affinity += LIKED_AUTHOR_WEIGHT * np.where(
+            matched, np.log1p(likes[positions]), 0.0
+        )
+
+    return affinity
+
+
+def score(
+    like_counts: np.ndarray,
+    ages_hours: np.ndarray,
+    affinity: np.ndarray,
+    half_life_hours: float,
+) -> np.ndarray:
+    """
+    Оценка кандидатов за один векторный проход: популярность и близость
+    к автору, затухающие вдвое каждые half_life_hours.
+    """
+    decay = np.exp2(-np.maximum(ages_hours, 0.0) / half_life_hours)
+    return (1.0 + LIKE_WEIGHT * np.log1p(like_counts) + affinity) * decay
+
+
+def top_k(scores: np.ndarray, tweet_ids: np.ndarray, k: int) -> np.ndarray:
+    """
+    Индексы k лучших кандидатов по убыванию оценки (при равенстве —
+    более новый твит выше). argpartition отбирает k за O(n), сортируются
+    только они.
+    """
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.int64)
+
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+
+    order = np.lexsort((-tweet_ids[best], -scores[best]))
+    return best[order]
+
+
+def rank_tweet_ids(viewer_id: Optional[int], page: Page) -> List[int]:
+    """
+    id твитов страницы ленты в режиме top. Для анонимного зрителя
+    оценка учитывает только лайки и свежесть.
+    """
+    config = current_app.config
+    candidates = load_candidates(page, config["RANKING_CANDIDATE_LIMIT"])
+
+    if viewer_id is not None:
+        affinity = author_affinity(
+            candidates.author_ids,
+            followed_author_ids(viewer_id),
+            liked_author_counts(viewer_id),
+        )
+    else:
+        affinity = np.zeros(len(candidates.tweet_ids))
+
+    scores = score(
+        candidates.like_counts,
+        candidates.ages_hours,
+        affinity,
+        config["RANKING_HALF_LIFE_HOURS"],
+    )
+    best = top_k(scores, candidates.tweet_ids, page.limit)
+
+    return candidates.tweet_ids[best].tolist()
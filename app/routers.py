@@ -1,7 +1,9 @@
 import logging
 import mimetypes
 import os
+from operator import itemgetter
 
+import numpy as np
 from flasgger import Swagger
 from flask import (
     Flask,
@@ -10,21 +12,130 @@ from flask import (
     render_template,
     request,
     send_file,
+    stream_with_context,
     url_for,
 )
-from psycopg2.errors import UniqueViolation
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import joinedload
-
-from .models import DATABASE_URL, Like, Media, Subscribe, Tweet, User, db
+from sqlalchemy import select
+
+from . import tasks
+from .auth import current_token_claims, current_user
+from .buffer import buffer_like, buffer_likes, like_buffer
+from .cache import cache_stats, feed_cache, feed_window
+from .changes import (
+    TWEET_DELETED,
+    Changes,
+    change_horizon,
+    changes_pruned_after,
+    changes_since,
+    parse_updates_args,
+    record_change,
+)
+from .commands import register_commands
+from .graph import graph_index, record_follow, social_graph
+from .models import (
+    DATABASE_URL,
+    Like,
+    Media,
+    Subscribe,
+    Tweet,
+    User,
+    db,
+)
+from .pagination import (
+    PaginationError,
+    apply_keyset,
+    finish_page,
+    parse_id_list,
+    parse_page_args,
+)
+from .queries import (
+    encode_feed,
+    load_fragments,
+    load_profile,
+    new_tweet_rows,
+    render_fragments,
+    subscription_users_query,
+    tweet_rows_query,
+)
+from .ranking import FEED_MODES, rank_tweet_ids
+from .serializers import FastJSONProvider
+from .suggestions import load_suggestions
+from .timeline import (
+    TIMELINE_STRATEGIES,
+    fan_out_tweet,
+    read_hybrid_ids,
+    read_materialized_ids,
+    read_merged_ids,
+    remove_tweet_from_timelines,
+)
+from .tokens import issue_token, revoke_token
+from .versions import (
+    FEED_VERSION,
+    bump_feed_version,
+    resource_etag,
+    user_version,
+)
+from .writes import (
+    CHANGED,
+    FOLLOW_ACTIONS,
+    LIKE_ACTIONS,
+    BulkError,
+    apply_bulk,
+    change_user_counter,
+    parse_bulk_items,
+    toggle_like,
+    toggle_likes,
+    toggle_subscribe,
+    toggle_subscribes,
+)
 
 logger = logging.getLogger()
 
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
+app.json = FastJSONProvider(app)
 
 app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+app.config["TASKS_ALWAYS_EAGER"] = (
+    os.getenv("TASKS_ALWAYS_EAGER", "false").lower() == "true"
+)
+app.config["LIKES_PREVIEW_SIZE"] = int(os.getenv("LIKES_PREVIEW_SIZE", "3"))
+app.config["PROFILE_PREVIEW_SIZE"] = int(
+    os.getenv("PROFILE_PREVIEW_SIZE", "3")
+)
+app.config["STREAM_BATCH_SIZE"] = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+app.config["TIMELINE_STRATEGY"] = os.getenv("TIMELINE_STRATEGY", "hybrid")
+app.config["TIMELINE_CELEBRITY_THRESHOLD"] = int(
+    os.getenv("TIMELINE_CELEBRITY_THRESHOLD", "10000")
+)
+app.config["TOKEN_SECRET"] = os.getenv("TOKEN_SECRET", "")
+app.config["TOKEN_TTL"] = int(os.getenv("TOKEN_TTL", "3600"))
+app.config["TOKEN_DENYLIST_REFRESH"] = float(
+    os.getenv("TOKEN_DENYLIST_REFRESH", "30")
+)
+app.config["GRAPH_DELTA_LIMIT"] = int(os.getenv("GRAPH_DELTA_LIMIT", "10000"))
+app.config["GRAPH_REFRESH_INTERVAL"] = float(
+    os.getenv("GRAPH_REFRESH_INTERVAL", "300")
+)
+app.config["SUGGESTIONS_LIMIT"] = int(os.getenv("SUGGESTIONS_LIMIT", "20"))
+app.config["SUGGESTIONS_LIKE_DAYS"] = int(
+    os.getenv("SUGGESTIONS_LIKE_DAYS", "30")
+)
+app.config["SUGGESTIONS_TTL"] = int(os.getenv("SUGGESTIONS_TTL", "3600"))
+app.config["RANKING_CANDIDATE_LIMIT"] = int(
+    os.getenv("RANKING_CANDIDATE_LIMIT", "1000")
+)
+app.config["RANKING_HALF_LIFE_HOURS"] = float(
+    os.getenv("RANKING_HALF_LIFE_HOURS", "24")
+)
+app.config["LIKE_WRITE_BEHIND"] = (
+    os.getenv("LIKE_WRITE_BEHIND", "false").lower() == "true"
+)
+app.config["LIKE_FLUSH_INTERVAL_MS"] = int(
+    os.getenv("LIKE_FLUSH_INTERVAL_MS", "50")
+)
+app.config["LIKE_FLUSH_LIMIT"] = int(os.getenv("LIKE_FLUSH_LIMIT", "5000"))
 
 app.config["SWAGGER"] = {
     "title": "Twitter API",
@@ -36,6 +147,7 @@ app.config["SWAGGER"] = {
 swagger = Swagger(app)
 
 db.init_app(app)
+register_commands(app)
 
 initial_db = False
 
@@ -71,6 +183,59 @@ def before_request_func():
         initial_db = True
 
 
+def not_modified(etag):
+    if not request.if_none_match.contains(etag):
+        return None
+
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def row_exists(column, value):
+    return db.session.scalar(select(column).where(column == value)) is not None
+
+
+def stream_tweets(page):
+    """
+    Генератор JSON-ответа ленты. Твиты читаются серверным курсором
+    порциями по STREAM_BATCH_SIZE, и каждая порция отдаётся клиенту
+    сразу после сериализации.
+    """
+    query = tweet_rows_query()
+    if page.before_id is not None:
+        query = query.where(Tweet.id < page.before_id)
+    if page.after_id is not None:
+        query = query.where(Tweet.id > page.after_id)
+
+    batch_size = app.config["STREAM_BATCH_SIZE"]
+    rows = db.session.execute(
+        query.order_by(Tweet.id.desc()).execution_options(yield_per=batch_size)
+    )
+
+    yield b'{"result": true, "tweets": ['
+
+    try:
+        separator = b""
+        for partition in rows.partitions():
+            chunk = []
+            for fragment in render_fragments(partition):
+                chunk.append(separator + fragment)
+                separator = b","
+
+            yield b"".join(chunk)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        raise
+
+    yield b'], "next_cursor": null}'
+
+
 @app.route("/")
 def homepage():
     return render_template("index.html")
@@ -209,7 +374,6 @@ def create_tweet():
               example: "Один или несколько медиафайлов не найдены"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
         tweet_data = request.json.get("tweet_data")
 
         if not tweet_data:
@@ -217,9 +381,7 @@ def create_tweet():
 
         tweet_media_ids = request.json.get("tweet_media_ids")
 
-        user = (
-            db.session.query(User).filter(User.api_key == api_key)
-        ).one_or_none()
+        user = current_user()
 
         if not user:
             return jsonify(message="Не удалось авторизовать пользователя"), 401
@@ -228,6 +390,7 @@ def create_tweet():
 
         db.session.add(new_tweet)
         db.session.flush()
+        change_user_counter(user.id, User.tweets_count, 1)
 
         if tweet_media_ids:
             media_items = (
@@ -248,6 +411,7 @@ def create_tweet():
             new_tweet.medias.extend(media_items)
 
         db.session.commit()
+        bump_feed_version()
     except Exception as exc:
         db.session.rollback()
         logger.error(
@@ -266,6 +430,9 @@ def create_tweet():
             500,
         )
 
+    feed_cache.invalidate_new_tweet()
+    tasks.submit(fan_out_tweet, new_tweet.id, user.id)
+
     return jsonify({"result": True, "tweet_id": new_tweet.id}), 201
 
 
@@ -460,8 +627,6 @@ def delete_tweet(tweet_id):
               example: "Ошибка при удалении из базы данных"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
-
         tweet = (
             db.session.query(Tweet).filter(Tweet.id == tweet_id).one_or_none()
         )
@@ -469,11 +634,7 @@ def delete_tweet(tweet_id):
         if not tweet:
             return jsonify(errors="Такого твита не существует"), 404
 
-        user = (
-            db.session.query(User)
-            .filter(User.api_key == api_key)
-            .one_or_none()
-        )
+        user = current_user()
 
         if not user:
             return jsonify(errors="Такого пользователя не существует"), 401
@@ -482,7 +643,13 @@ def delete_tweet(tweet_id):
             return jsonify(error="Пост не принадлежит вам"), 403
 
         db.session.delete(tweet)
+        change_user_counter(user.id, User.tweets_count, -1)
+        record_change(tweet_id, TWEET_DELETED)
         db.session.commit()
+        bump_feed_version()
+
+        feed_cache.invalidate_tweet(tweet_id)
+        tasks.submit(remove_tweet_from_timelines, tweet_id)
 
     except Exception as exc:
         db.session.rollback()
@@ -516,7 +683,10 @@ def create_like(tweet_id):
     description: |
       Добавляет лайк от текущего пользователя к указанному твиту.
       Пользователь может поставить только один лайк на один твит.
-      Если лайк уже существует, операция вернет ошибку.
+      Лайк вставляется одним запросом INSERT ... ON CONFLICT DO NOTHING:
+      повторный запрос ничего не меняет и возвращает 200.
+      В режиме LIKE_WRITE_BEHIND лайк попадает в буфер процесса
+      и записывается пачкой в течение LIKE_FLUSH_INTERVAL_MS (202).
     parameters:
       - name: tweet_id
         in: path
@@ -539,6 +709,22 @@ def create_like(tweet_id):
             result:
               type: boolean
               example: true
+      202:
+        description: Лайк принят в буфер отложенной записи
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+      200:
+        description: Лайк уже стоял, ничего не изменилось
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
       401:
         description: Ошибка авторизации
         schema:
@@ -547,6 +733,14 @@ def create_like(tweet_id):
             errors:
               type: string
               example: "Такого пользователя не существует"
+      404:
+        description: Твит не найден
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого твита не существует"
       500:
         description: Внутренняя ошибка сервера
         schema:
@@ -563,21 +757,30 @@ def create_like(tweet_id):
               example: "Ошибка при добавлении лайка"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
-
-        user = (
-            db.session.query(User)
-            .filter(User.api_key == api_key)
-            .one_or_none()
-        )
+        user = current_user()
 
         if not user:
             return jsonify(errors="Такого пользователя не существует"), 401
 
-        new_like = Like(tweet_id=tweet_id, user_id=user.id)
+        if app.config["LIKE_WRITE_BEHIND"]:
+            changed = buffer_like(app, tweet_id, user.id, True)
+            if changed is None:
+                return jsonify(errors="Такого твита не существует"), 404
+
+            return jsonify(result=True), 202 if changed else 200
+
+        if toggle_like(tweet_id, user.id, True) is None:
+            db.session.rollback()
+
+            if not row_exists(Tweet.id, tweet_id):
+                return jsonify(errors="Такого твита не существует"), 404
+
+            return jsonify(result=True), 200
 
-        db.session.add(new_like)
         db.session.commit()
+        bump_feed_version()
+
+        feed_cache.invalidate_tweet(tweet_id)
 
     except Exception as exc:
         db.session.rollback()
@@ -600,58 +803,80 @@ def create_like(tweet_id):
     return jsonify(result=True), 201
 
 
-@app.route("/api/tweets/<int:like_id>/likes", methods=["DELETE"])
-def delete_like(like_id):
+@app.route("/api/tweets/<int:tweet_id>/likes", methods=["GET"])
+def get_tweet_likes(tweet_id):
     """
-    Удаление лайка
+    Получение списка лайков твита
     ---
     tags:
       - Лайки
-    summary: Удалить лайк
+    summary: Получить пользователей, лайкнувших твит
     description: |
-      Удаляет лайк по его ID.
-      Лайк может удалить только пользователь, который его поставил.
-      Операция необратима.
+      Возвращает страницу пользователей, поставивших лайк твиту,
+      начиная с самых новых лайков. Пагинация такая же,
+      как у GET /api/tweets (по ID лайка).
+      like_count учитывает лайки, ещё не записанные из буфера
+      отложенной записи этого процесса.
     parameters:
-      - name: like_id
+      - name: tweet_id
         in: path
         type: integer
         required: true
-        description: ID лайка для удаления
-        example: 15
-      - name: API_KEY
-        in: header
+        description: ID твита
+        example: 42
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Размер страницы (от 1 до 100, по умолчанию 50)
+      - name: cursor
+        in: query
         type: string
-        required: true
-        description: API ключ пользователя для авторизации
-        example: "550e8400-e29b-41d4-a716-446655440000"
+        required: false
+        description: Непрозрачный курсор из next_cursor предыдущего ответа
     responses:
       200:
-        description: Лайк успешно удален
-      401:
-        description: Ошибка авторизации
+        description: Список лайков успешно получен
         schema:
           type: object
           properties:
-            errors:
+            result:
+              type: boolean
+              example: true
+            like_count:
+              type: integer
+              example: 12
+            likes:
+              type: array
+              items:
+                type: object
+                properties:
+                  user_id:
+                    type: integer
+                    example: 2
+                  name:
+                    type: string
+                    example: "Петр Петров"
+            next_cursor:
               type: string
-              example: "Такого пользователя не существует"
-      403:
-        description: Запрещено
+              nullable: true
+              example: "eyJiZWZvcmVfaWQiOjQyfQ"
+      400:
+        description: Неверные параметры пагинации
         schema:
           type: object
           properties:
             error:
               type: string
-              example: "Лайк не принадлежит вам"
+              example: "Некорректный курсор"
       404:
-        description: Лайк не найден
+        description: Твит не найден
         schema:
           type: object
           properties:
             errors:
               type: string
-              example: "Такого лайка не существует"
+              example: "Такого твита не существует"
       500:
         description: Внутренняя ошибка сервера
         schema:
@@ -665,33 +890,39 @@ def delete_like(like_id):
               example: "DatabaseError"
             error_message:
               type: string
-              example: "Ошибка при удалении лайка"
+              example: "Ошибка при получении данных из базы"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
-
-        like = db.session.query(Like).filter(Like.id == like_id).one_or_none()
-
-        if not like:
-            return jsonify(errors="Такого лайка не существует"), 404
+        page = parse_page_args(request.args)
+    except PaginationError as exc:
+        return jsonify(error=str(exc)), 400
 
-        user = (
-            db.session.query(User)
-            .filter(User.api_key == api_key)
-            .one_or_none()
+    try:
+        like_count = (
+            db.session.query(Tweet.like_count)
+            .filter(Tweet.id == tweet_id)
+            .scalar()
         )
 
-        if not user:
-            return jsonify(errors="Такого пользователя не существует"), 401
+        if like_count is None:
+            return jsonify(errors="Такого твита не существует"), 404
+        like_count += like_buffer.delta(tweet_id)
 
-        if like.user_id != user.id:
-            return jsonify(error="Лайк не принадлежит вам"), 403
+        query = (
+            db.session.query(Like.id, Like.user_id, User.name)
+            .join(User, User.id == Like.user_id)
+            .filter(Like.tweet_id == tweet_id)
+        )
+        result_page = finish_page(
+            apply_keyset(query, Like.id, page).all(), page
+        )
 
-        db.session.delete(like)
-        db.session.commit()
+        likes_data = [
+            {"user_id": row.user_id, "name": row.name}
+            for row in result_page["items"]
+        ]
 
     except Exception as exc:
-        db.session.rollback()
         logger.error(
             f'"result": False, '
             f'"error_type": {str(type(exc).__name__)}, '
@@ -708,28 +939,40 @@ def delete_like(like_id):
             500,
         )
 
-    return jsonify(result=True), 200
+    return (
+        jsonify(
+            {
+                "result": True,
+                "like_count": like_count,
+                "likes": likes_data,
+                "next_cursor": result_page["next_cursor"],
+            }
+        ),
+        200,
+    )
 
 
-@app.route("/api/users/<int:target_id>/follow", methods=["POST"])
-def create_subscribe(target_id):
+@app.route("/api/tweets/<int:tweet_id>/likes", methods=["DELETE"])
+def delete_like(tweet_id):
     """
-    Создание подписки на пользователя
+    Удаление лайка
     ---
     tags:
-      - Подписки
-    summary: Подписаться на пользователя
+      - Лайки
+    summary: Снять лайк с твита
     description: |
-      Создает подписку текущего пользователя на указанного пользователя.
-      Пользователь не может подписаться на самого себя.
-      На одного пользователя можно подписаться только один раз.
+      Снимает лайк текущего пользователя с указанного твита одним
+      запросом DELETE ... RETURNING. Если лайка не было, запрос ничего
+      не меняет и тоже возвращает 200. В режиме LIKE_WRITE_BEHIND
+      снятие лайка попадает в буфер процесса и записывается пачкой
+      в течение LIKE_FLUSH_INTERVAL_MS (202).
     parameters:
-      - name: target_id
+      - name: tweet_id
         in: path
         type: integer
         required: true
-        description: ID пользователя, на которого нужно подписаться
-        example: 5
+        description: ID твита, с которого снимается лайк
+        example: 42
       - name: API_KEY
         in: header
         type: string
@@ -737,22 +980,22 @@ def create_subscribe(target_id):
         description: API ключ пользователя для авторизации
         example: "550e8400-e29b-41d4-a716-446655440000"
     responses:
-      201:
-        description: Подписка успешно создана
+      200:
+        description: Лайк снят (или его не было)
         schema:
           type: object
           properties:
             result:
               type: boolean
               example: true
-      400:
-        description: Неверный запрос (попытка подписаться на себя)
+      202:
+        description: Снятие лайка принято в буфер отложенной записи
         schema:
           type: object
           properties:
-            error:
-              type: string
-              example: "Нельзя подписаться на самого себя"
+            result:
+              type: boolean
+              example: true
       401:
         description: Ошибка авторизации
         schema:
@@ -762,21 +1005,13 @@ def create_subscribe(target_id):
               type: string
               example: "Такого пользователя не существует"
       404:
-        description: Целевой пользователь не найден
-        schema:
-          type: object
-          properties:
-            error:
-              type: string
-              example: "Целевой пользователь не найден"
-      409:
-        description: Конфликт (уже подписаны)
+        description: Твит не найден
         schema:
           type: object
           properties:
-            error:
+            errors:
               type: string
-              example: "Вы уже подписаны на этого пользователя"
+              example: "Такого твита не существует"
       500:
         description: Внутренняя ошибка сервера
         schema:
@@ -787,55 +1022,36 @@ def create_subscribe(target_id):
               example: false
             error_type:
               type: string
-              example: "IntegrityError"
+              example: "DatabaseError"
             error_message:
               type: string
-              example: "Ошибка при создании подписки"
+              example: "Ошибка при удалении лайка"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
-
-        user = (
-            db.session.query(User)
-            .filter(User.api_key == api_key)
-            .one_or_none()
-        )
+        user = current_user()
 
         if not user:
             return jsonify(errors="Такого пользователя не существует"), 401
 
-        if target_id == user.id:
-            return jsonify(errors="Нельзя подписаться на самого себя"), 400
+        if app.config["LIKE_WRITE_BEHIND"]:
+            changed = buffer_like(app, tweet_id, user.id, False)
+            if changed is None:
+                return jsonify(errors="Такого твита не существует"), 404
 
-        new_subscribe = Subscribe(subscriber_id=user.id, target_id=target_id)
+            return jsonify(result=True), 202 if changed else 200
 
-        db.session.add(new_subscribe)
-        db.session.commit()
+        if toggle_like(tweet_id, user.id, False) is None:
+            db.session.rollback()
 
-    except IntegrityError as exc:
-        db.session.rollback()
+            if not row_exists(Tweet.id, tweet_id):
+                return jsonify(errors="Такого твита не существует"), 404
 
-        if isinstance(exc.orig, UniqueViolation):
-            return (
-                jsonify({"error": "Вы уже подписаны на этого пользователя"}),
-                409,
-            )
+            return jsonify(result=True), 200
 
-        logger.error(
-            f'"result": False, '
-            f'"error_type": {str(type(exc).__name__)}, '
-            f'"error_message": {str(exc)}'
-        )
-        return (
-            jsonify(
-                {
-                    "result": False,
-                    "error_type": str(type(exc).__name__),
-                    "error_message": str(exc),
-                }
-            ),
-            500,
-        )
+        db.session.commit()
+        bump_feed_version()
+
+        feed_cache.invalidate_tweet(tweet_id)
 
     except Exception as exc:
         db.session.rollback()
@@ -855,62 +1071,95 @@ def create_subscribe(target_id):
             500,
         )
 
-    return jsonify(result=True), 201
+    return jsonify(result=True), 200
 
 
-@app.route("/api/users/<int:user_id>/follow", methods=["DELETE"])
-def delete_subscribe(user_id):
+@app.route("/api/tweets/likes/batch", methods=["POST"])
+def create_likes_batch():
     """
-    Удаление подписки
+    Пакетная установка и снятие лайков
     ---
     tags:
-      - Подписки
-    summary: Отписаться от пользователя
+      - Лайки
+    summary: Поставить и снять лайки пакетом
     description: |
-      Удаляет подписку по ее ID.
-      Подписку может удалить только пользователь,
-      который ее создал (подписчик).
-      Операция необратима.
+      Применяет до MAX_BULK_ITEMS (500) действий like/unlike в одной
+      транзакции: все лайки вставляются одним многострочным INSERT ...
+      ON CONFLICT DO NOTHING, все снятия — одним DELETE. Каждый твит
+      может встречаться в пакете один раз. Для каждого элемента
+      возвращается статус: changed — лайк поставлен или снят,
+      unchanged — лайк уже был в нужном состоянии, not_found — твита нет.
+      В режиме LIKE_WRITE_BEHIND каждый элемент проходит через буфер
+      процесса, как одиночный лайк, и статус отражает решение буфера;
+      если что-то изменилось, ответ — 202.
     parameters:
-      - name: subscribe_id
-        in: path
-        type: integer
-        required: true
-        description: ID подписки для удаления
-        example: 15
       - name: API_KEY
         in: header
         type: string
         required: true
         description: API ключ пользователя для авторизации
         example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            items:
+              type: array
+              maxItems: 500
+              items:
+                type: object
+                properties:
+                  tweet_id:
+                    type: integer
+                    example: 42
+                  action:
+                    type: string
+                    enum: [like, unlike]
+                    example: "like"
     responses:
-      204:
-        description: Подписка успешно удалена
-      401:
-        description: Ошибка авторизации
+      200:
+        description: Пакет применён
         schema:
           type: object
           properties:
-            errors:
-              type: string
-              example: "Такого пользователя не существует"
-      403:
-        description: Запрещено
+            result:
+              type: boolean
+              example: true
+            items:
+              type: array
+              items:
+                type: object
+                properties:
+                  tweet_id:
+                    type: integer
+                    example: 42
+                  action:
+                    type: string
+                    example: "like"
+                  status:
+                    type: string
+                    enum: [changed, unchanged, not_found]
+                    example: "changed"
+      202:
+        description: Пакет принят в буфер отложенной записи, тело как у 200
+      400:
+        description: Неверное тело запроса или слишком большой пакет
         schema:
           type: object
           properties:
             error:
               type: string
-              example: "Подписка не принадлежит вам"
-      404:
-        description: Подписка не найдена
+              example: "Не больше 500 элементов в пакете"
+      401:
+        description: Ошибка авторизации
         schema:
           type: object
           properties:
             errors:
               type: string
-              example: "Такой подписки не существует"
+              example: "Такого пользователя не существует"
       500:
         description: Внутренняя ошибка сервера
         schema:
@@ -924,40 +1173,44 @@ def delete_subscribe(user_id):
               example: "DatabaseError"
             error_message:
               type: string
-              example: "Ошибка при удалении подписки"
+              example: "Ошибка при применении пакета"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
-
-        user = (
-            db.session.query(User)
-            .filter(User.api_key == api_key)
-            .one_or_none()
-        )
+        user = current_user()
 
         if not user:
             return jsonify(errors="Такого пользователя не существует"), 401
 
-        subscribe = (
-            db.session.query(Subscribe)
-            .filter(
-                Subscribe.target_id == user_id,
-                Subscribe.subscriber_id == user.id,
-            )
-            .one_or_none()
+        items = parse_bulk_items(
+            request.get_json(silent=True), "tweet_id", LIKE_ACTIONS
         )
+        if app.config["LIKE_WRITE_BEHIND"]:
+            results = buffer_likes(app, user.id, items)
+            changed = any(item["status"] == CHANGED for item in results)
+            return (
+                jsonify({"result": True, "items": results}),
+                202 if changed else 200,
+            )
 
-        if not subscribe:
-            return jsonify(errors="Такой подписки не существует"), 404
-
-        if subscribe.subscriber_id != user.id:
-            return jsonify(error="Подписка не принадлежит вам"), 403
+        results = apply_bulk(
+            items,
+            "tweet_id",
+            lambda tweet_ids, liked: toggle_likes(tweet_ids, user.id, liked),
+            Tweet.id,
+        )
 
-        db.session.delete(subscribe)
+        changed = [
+            item["tweet_id"] for item in results if item["status"] == CHANGED
+        ]
         db.session.commit()
+        if changed:
+            bump_feed_version()
 
-        return jsonify(result=True), 204
+        for tweet_id in changed:
+            feed_cache.invalidate_tweet(tweet_id)
 
+    except BulkError as exc:
+        return jsonify(error=str(exc)), 400
     except Exception as exc:
         db.session.rollback()
         logger.error(
@@ -976,25 +1229,1579 @@ def delete_subscribe(user_id):
             500,
         )
 
+    return jsonify({"result": True, "items": results}), 200
 
-@app.route("/api/tweets", methods=["GET"])
-def get_tweets():
+
+@app.route("/api/users/<int:target_id>/follow", methods=["POST"])
+def create_subscribe(target_id):
     """
-    Получение списка твитов
+    Создание подписки на пользователя
     ---
     tags:
-      - Твиты
-    summary: Получить все твиты
-    description: |
-      Возвращает список всех твитов с полной информацией.
+      - Подписки
+    summary: Подписаться на пользователя
+    description: |
+      Создает подписку текущего пользователя на указанного пользователя.
+      Пользователь не может подписаться на самого себя.
+      Подписка вставляется одним запросом INSERT ... ON CONFLICT
+      DO NOTHING: повторный запрос ничего не меняет и возвращает 200.
+    parameters:
+      - name: target_id
+        in: path
+        type: integer
+        required: true
+        description: ID пользователя, на которого нужно подписаться
+        example: 5
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+    responses:
+      201:
+        description: Подписка успешно создана
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+      400:
+        description: Неверный запрос (попытка подписаться на себя)
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Нельзя подписаться на самого себя"
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+      200:
+        description: Подписка уже была, ничего не изменилось
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+      404:
+        description: Целевой пользователь не найден
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Пользователь не найден"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при создании подписки"
+    """
+    try:
+        user = current_user()
+
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
+
+        if target_id == user.id:
+            return jsonify(errors="Нельзя подписаться на самого себя"), 400
+
+        if not toggle_subscribe(user.id, target_id, True):
+            db.session.rollback()
+
+            if not row_exists(User.id, target_id):
+                return jsonify(errors="Пользователь не найден"), 404
+
+            return jsonify(result=True), 200
+
+        db.session.commit()
+        record_follow(user.id, target_id, True)
+
+    except Exception as exc:
+        db.session.rollback()
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return jsonify(result=True), 201
+
+
+@app.route("/api/users/<int:user_id>/follow", methods=["DELETE"])
+def delete_subscribe(user_id):
+    """
+    Удаление подписки
+    ---
+    tags:
+      - Подписки
+    summary: Отписаться от пользователя
+    description: |
+      Удаляет подписку текущего пользователя на указанного пользователя
+      одним запросом DELETE ... RETURNING. Если подписки не было,
+      запрос ничего не меняет и тоже возвращает 204.
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+        description: ID пользователя, от которого нужно отписаться
+        example: 5
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+    responses:
+      204:
+        description: Подписка удалена (или её не было)
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+      404:
+        description: Пользователь не найден
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Пользователь не найден"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при удалении подписки"
+    """
+    try:
+        user = current_user()
+
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
+
+        if not toggle_subscribe(user.id, user_id, False):
+            db.session.rollback()
+
+            if not row_exists(User.id, user_id):
+                return jsonify(errors="Пользователь не найден"), 404
+
+            return jsonify(result=True), 204
+
+        db.session.commit()
+        record_follow(user.id, user_id, False)
+
+        return jsonify(result=True), 204
+
+    except Exception as exc:
+        db.session.rollback()
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+
+@app.route("/api/users/follow/batch", methods=["POST"])
+def create_subscribes_batch():
+    """
+    Пакетная подписка и отписка
+    ---
+    tags:
+      - Подписки
+    summary: Подписаться и отписаться пакетом
+    description: |
+      Применяет до MAX_BULK_ITEMS (500) действий follow/unfollow
+      в одной транзакции: все подписки вставляются одним многострочным
+      INSERT ... ON CONFLICT DO NOTHING, все отписки — одним DELETE.
+      Каждый пользователь может встречаться в пакете один раз. Для
+      каждого элемента возвращается статус: changed — подписка создана
+      или удалена, unchanged — она уже была в нужном состоянии,
+      not_found — пользователя нет, invalid — подписка на самого себя.
+    parameters:
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            items:
+              type: array
+              maxItems: 500
+              items:
+                type: object
+                properties:
+                  user_id:
+                    type: integer
+                    example: 5
+                  action:
+                    type: string
+                    enum: [follow, unfollow]
+                    example: "follow"
+    responses:
+      200:
+        description: Пакет применён
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            items:
+              type: array
+              items:
+                type: object
+                properties:
+                  user_id:
+                    type: integer
+                    example: 5
+                  action:
+                    type: string
+                    example: "follow"
+                  status:
+                    type: string
+                    enum: [changed, unchanged, not_found, invalid]
+                    example: "changed"
+      400:
+        description: Неверное тело запроса или слишком большой пакет
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Не больше 500 элементов в пакете"
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при применении пакета"
+    """
+    try:
+        user = current_user()
+
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
+
+        items = parse_bulk_items(
+            request.get_json(silent=True), "user_id", FOLLOW_ACTIONS
+        )
+        results = apply_bulk(
+            items,
+            "user_id",
+            lambda target_ids, following: toggle_subscribes(
+                user.id, target_ids, following
+            ),
+            User.id,
+            invalid_ids={user.id},
+        )
+        db.session.commit()
+
+        for item, item_result in zip(items, results):
+            if item_result["status"] == CHANGED:
+                record_follow(user.id, item.id, item.enabled)
+
+    except BulkError as exc:
+        return jsonify(error=str(exc)), 400
+    except Exception as exc:
+        db.session.rollback()
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return jsonify({"result": True, "items": results}), 200
+
+
+def get_top_tweets(page):
+    try:
+        viewer = current_user()
+        viewer_id = viewer.id if viewer is not None else None
+
+        tweet_ids = rank_tweet_ids(viewer_id, page)
+        fragments = [fragment for _, fragment in load_fragments(tweet_ids)]
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return (
+        app.response_class(
+            encode_feed(fragments, next_cursor=None, mode="top"),
+            mimetype="application/json",
+        ),
+        200,
+    )
+
+
+def get_tweets_by_ids(tweet_ids):
+    try:
+        etag = resource_etag(FEED_VERSION, request.query_string)
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+
+        found = load_fragments(tweet_ids)
+        found_ids = {tweet_id for tweet_id, _ in found}
+
+        response = app.response_class(
+            encode_feed(
+                [fragment for _, fragment in found],
+                missing=[i_id for i_id in tweet_ids if i_id not in found_ids],
+            ),
+            mimetype="application/json",
+        )
+        response.set_etag(etag)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return response, 200
+
+
+@app.route("/api/tweets", methods=["GET"])
+def get_tweets():
+    """
+    Получение списка твитов
+    ---
+    tags:
+      - Твиты
+    summary: Получить все твиты
+    description: |
+      Возвращает страницу твитов с полной информацией.
       Включает данные авторов, медиавложения и список лайков.
       Твиты возвращаются в обратном хронологическом порядке
-      (сначала самые новые).
+      (сначала самые новые). Пагинация по ключу (keyset):
+      для следующей страницы передайте next_cursor в параметр cursor.
+      С параметром stream=true отдаются все твиты (с учётом before_id,
+      after_id и cursor) потоковым JSON: строки читаются серверным
+      курсором порциями, ответ формируется по частям.
+      С параметром ids (до 200 id через запятую) возвращаются указанные
+      твиты в порядке запроса, остальные параметры игнорируются; id
+      несуществующих твитов перечисляются в missing.
+      С параметром mode=top возвращаются limit лучших твитов среди
+      RANKING_CANDIDATE_LIMIT самых свежих: оценка учитывает число
+      лайков, давность твита и близость зрителя к автору (подписка
+      и прошлые лайки). Зритель определяется по заголовку API_KEY,
+      без него учитываются только лайки и давность. next_cursor в этом
+      режиме всегда null.
+    produces:
+      - application/json
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Размер страницы (от 1 до 100, по умолчанию 50)
+        example: 20
+      - name: before_id
+        in: query
+        type: integer
+        required: false
+        description: Вернуть твиты с ID меньше указанного (более старые)
+        example: 120
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Вернуть твиты с ID больше указанного (более новые)
+        example: 100
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Непрозрачный курсор из next_cursor предыдущего ответа
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Отдать всю ленту потоковым ответом без пагинации
+      - name: ids
+        in: query
+        type: string
+        required: false
+        description: Список id твитов через запятую (не больше 200)
+        example: "42,17,5"
+      - name: mode
+        in: query
+        type: string
+        enum: [latest, top]
+        required: false
+        description: Порядок ленты (latest — по времени, top — по оценке)
+      - name: API_KEY
+        in: header
+        type: string
+        required: false
+        description: Ключ зрителя для персонального ранжирования (mode=top)
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
+    responses:
+      200:
+        description: Список твитов успешно получен
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            tweets:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    description: ID твита
+                    example: 42
+                  content:
+                    type: string
+                    description: Текст твита
+                    example: "Это мой первый твит!"
+                  attachments:
+                    type: array
+                    description: Список путей к медиавложениям
+                    items:
+                      type: string
+                    example: [
+                      "static/media/image1.jpg",
+                      "static/media/image2.png"
+                    ]
+                  author:
+                    type: object
+                    description: Информация об авторе твита
+                    properties:
+                      id:
+                        type: integer
+                        example: 1
+                      name:
+                        type: string
+                        example: "Иван Иванов"
+                  like_count:
+                    type: integer
+                    description: Количество лайков
+                    example: 12
+                  likes:
+                    type: array
+                    description: |
+                      Первые LIKES_PREVIEW_SIZE пользователей, поставивших
+                      лайк. Полный список — GET /api/tweets/<id>/likes
+                    items:
+                      type: object
+                      properties:
+                        user_id:
+                          type: integer
+                          example: 2
+                        name:
+                          type: string
+                          example: "Петр Петров"
+            next_cursor:
+              type: string
+              nullable: true
+              description: Курсор следующей страницы (null, если её нет)
+              example: "eyJiZWZvcmVfaWQiOjQyfQ"
+            missing:
+              type: array
+              description: Ненайденные id (только с параметром ids)
+              items:
+                type: integer
+              example: [5]
+      304:
+        description: Данные не изменились (ETag совпал с If-None-Match)
+      400:
+        description: Неверные параметры пагинации или режима ленты
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Некорректный курсор"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при получении данных из базы"
+    """
+    if "ids" in request.args:
+        try:
+            tweet_ids = parse_id_list(request.args["ids"])
+        except PaginationError as exc:
+            return jsonify(error=str(exc)), 400
+
+        return get_tweets_by_ids(tweet_ids)
+
+    try:
+        page = parse_page_args(request.args)
+    except PaginationError as exc:
+        return jsonify(error=str(exc)), 400
+
+    mode = request.args.get("mode", "latest")
+    if mode not in FEED_MODES:
+        return jsonify(error="Неизвестный режим ленты"), 400
+
+    if mode == "top":
+        return get_top_tweets(page)
+
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return (
+            app.response_class(
+                stream_with_context(stream_tweets(page)),
+                mimetype="application/json",
+            ),
+            200,
+        )
+
+    try:
+        etag = resource_etag(FEED_VERSION, request.query_string)
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+
+        cached_page = feed_cache.get(page)
+        if cached_page is not None and cached_page.etag != etag:
+            feed_cache.delete(page)
+            cached_page = None
+        if cached_page is not None:
+            response = app.response_class(
+                cached_page.body, mimetype="application/json"
+            )
+            response.set_etag(cached_page.etag)
+            return response, 200
+
+        rows = db.session.execute(
+            apply_keyset(tweet_rows_query(), Tweet.id, page)
+        ).all()
+        result_page = finish_page(rows, page)
+        tweets = result_page["items"]
+
+        response = app.response_class(
+            encode_feed(
+                render_fragments(tweets),
+                next_cursor=result_page["next_cursor"],
+            ),
+            mimetype="application/json",
+        )
+        low_id, high_id = feed_window(
+            page.before_id,
+            page.after_id,
+            [i_tweet.id for i_tweet in tweets],
+            result_page["next_cursor"] is not None,
+        )
+        feed_cache.set_page(page, response.get_data(), low_id, high_id, etag)
+        response.set_etag(etag)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return response, 200
+
+
+@app.route("/api/tweets/updates", methods=["GET"])
+def get_tweet_updates():
+    """
+    Изменения ленты с момента последнего опроса
+    ---
+    tags:
+      - Твиты
+    summary: Получить новые твиты и изменения
+    description: |
+      Возвращает твиты с id больше since_id (не больше limit, от новых
+      к старым) и изменения уже загруженных твитов после горизонта
+      since_seq: id удалённых твитов и новые счётчики лайков.
+      since_seq — горизонт транзакций прошлого опроса, а не номер
+      последнего изменения: транзакции коммитятся не в порядке выдачи
+      id, поэтому твиты и изменения, закоммиченные позже соседних,
+      тоже приходят, даже с id не больше since_id. Из-за этого твит
+      или изменение могут прийти повторно — клиент сверяет их по id.
+      Без since_seq изменения не возвращаются, только горизонт
+      для следующего опроса. Продолжайте опрос со значениями since_id
+      и since_seq из ответа. Если has_more = true, твитов с id больше
+      since_id больше limit; повторно пришедшие твиты в limit не
+      считаются, поэтому since_id при has_more всегда растёт. Если
+      reset = true, часть журнала изменений уже удалена и ленту нужно
+      перечитать целиком. Без изменений при совпадении ETag
+      возвращается 304.
+    produces:
+      - application/json
+    parameters:
+      - name: since_id
+        in: query
+        type: integer
+        required: true
+        description: Самый новый id твита, который уже есть у клиента
+        example: 120
+      - name: since_seq
+        in: query
+        type: integer
+        required: false
+        description: Горизонт since_seq из предыдущего ответа
+        example: 42
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Максимум новых твитов (от 1 до 100, по умолчанию 50)
+        example: 20
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
+    responses:
+      200:
+        description: Изменения успешно получены
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            tweets:
+              type: array
+              description: Новые твиты в формате GET /api/tweets
+              items:
+                type: object
+            deleted:
+              type: array
+              description: ID удалённых твитов
+              items:
+                type: integer
+              example: [17]
+            likes:
+              type: array
+              description: Новые счётчики лайков загруженных твитов
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    example: 42
+                  like_count:
+                    type: integer
+                    example: 13
+            since_id:
+              type: integer
+              description: since_id для следующего опроса
+              example: 125
+            since_seq:
+              type: integer
+              description: since_seq для следующего опроса
+              example: 48
+            has_more:
+              type: boolean
+              example: false
+            reset:
+              type: boolean
+              example: false
+      304:
+        description: Изменений нет (ETag совпал с If-None-Match)
+      400:
+        description: Неверные параметры
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Параметр since_id обязателен"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при получении данных из базы"
+    """
+    try:
+        updates = parse_updates_args(request.args)
+    except PaginationError as exc:
+        return jsonify(error=str(exc)), 400
+
+    try:
+        etag = resource_etag(FEED_VERSION, request.query_string)
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+
+        horizon = change_horizon()
+        rows, has_more = new_tweet_rows(
+            updates.since_id, updates.since_seq, updates.limit
+        )
+        since_id = max([updates.since_id, *(row.id for row in rows)])
+
+        reset = False
+        if updates.since_seq is None:
+            changes = Changes(deleted=[], likes=[], last_seq=horizon)
+        elif changes_pruned_after(updates.since_seq):
+            reset = True
+            changes = Changes(deleted=[], likes=[], last_seq=horizon)
+        else:
+            changes = changes_since(
+                updates.since_seq, updates.since_id, horizon
+            )
+
+        response = app.response_class(
+            encode_feed(
+                render_fragments(rows[::-1]),
+                deleted=changes.deleted,
+                likes=changes.likes,
+                since_id=since_id,
+                since_seq=changes.last_seq,
+                has_more=has_more,
+                reset=reset,
+            ),
+            mimetype="application/json",
+        )
+        response.set_etag(etag)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return response, 200
+
+
+@app.route("/api/timeline", methods=["GET"])
+def get_timeline():
+    """
+    Получение домашней ленты
+    ---
+    tags:
+      - Твиты
+    summary: Получить ленту подписок
+    description: |
+      Возвращает твиты пользователей, на которых подписан текущий
+      пользователь, а также его собственные твиты.
+      Стратегия push читает ленту, материализованную при создании
+      твита (fan-out-on-write), — один диапазонный проход по индексу.
+      Стратегия pull собирает ленту при чтении (fan-out-on-read):
+      берёт новейшие твиты каждого автора из подписок и сливает их.
+      Стратегия hybrid читает материализованную ленту и подмешивает
+      твиты авторов, у которых при записи твита подписчиков было больше
+      TIMELINE_CELEBRITY_THRESHOLD (им fan-out не делается).
+      По умолчанию используется стратегия из TIMELINE_STRATEGY.
+      Пагинация такая же, как у GET /api/tweets.
+    parameters:
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Размер страницы (от 1 до 100, по умолчанию 50)
+        example: 20
+      - name: before_id
+        in: query
+        type: integer
+        required: false
+        description: Вернуть твиты с ID меньше указанного
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Вернуть твиты с ID больше указанного
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Непрозрачный курсор из next_cursor предыдущего ответа
+      - name: strategy
+        in: query
+        type: string
+        required: false
+        enum: ["push", "pull", "hybrid"]
+        description: Стратегия построения ленты
+    responses:
+      200:
+        description: Лента успешно получена
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            tweets:
+              type: array
+              description: Твиты в формате GET /api/tweets
+              items:
+                type: object
+            next_cursor:
+              type: string
+              nullable: true
+              example: "eyJiZWZvcmVfaWQiOjQyfQ"
+            strategy:
+              type: string
+              example: "push"
+      400:
+        description: Неверные параметры пагинации или стратегия
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Некорректный курсор"
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при получении данных из базы"
+    """
+    try:
+        page = parse_page_args(request.args)
+    except PaginationError as exc:
+        return jsonify(error=str(exc)), 400
+
+    strategy = request.args.get("strategy", app.config["TIMELINE_STRATEGY"])
+    if strategy not in TIMELINE_STRATEGIES:
+        return jsonify(error="Неизвестная стратегия ленты"), 400
+
+    try:
+        user = current_user()
+
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
+
+        if strategy == "pull":
+            tweet_ids = read_merged_ids(user.id, page)
+        elif strategy == "hybrid":
+            tweet_ids = read_hybrid_ids(user.id, page)
+        else:
+            tweet_ids = read_materialized_ids(user.id, page)
+
+        result_page = finish_page(
+            load_fragments(tweet_ids), page, key=itemgetter(0)
+        )
+
+        body = encode_feed(
+            [fragment for _, fragment in result_page["items"]],
+            next_cursor=result_page["next_cursor"],
+            strategy=strategy,
+        )
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return app.response_class(body, mimetype="application/json"), 200
+
+
+@app.route("/api/tokens", methods=["POST"])
+def create_token():
+    """
+    Выдача токена доступа
+    ---
+    tags:
+      - Авторизация
+    summary: Получить подписанный токен
+    description: |
+      Выдаёт токен, подписанный HMAC-SHA256 (TOKEN_SECRET), с id
+      пользователя и сроком действия TOKEN_TTL секунд. Токен передаётся
+      в заголовке Authorization: Bearer <токен> и проверяется без
+      обращения к базе; заголовок API_KEY продолжает работать.
+      Если TOKEN_SECRET не задан, выдача токенов отключена.
+    parameters:
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+    responses:
+      201:
+        description: Токен успешно выдан
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            token:
+              type: string
+              example: "eyJ1aWQiOjF9.c2lnbmF0dXJl"
+            expires_in:
+              type: integer
+              example: 3600
+      400:
+        description: Выдача токенов отключена
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Выдача токенов отключена"
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+    """
+    secret = app.config["TOKEN_SECRET"]
+    if not secret:
+        return jsonify(error="Выдача токенов отключена"), 400
+
+    try:
+        user = current_user()
+
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
+
+        ttl = app.config["TOKEN_TTL"]
+        token = issue_token(secret, user.id, user.name, ttl)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return jsonify(result=True, token=token, expires_in=ttl), 201
+
+
+@app.route("/api/tokens", methods=["DELETE"])
+def delete_token():
+    """
+    Отзыв токена доступа
+    ---
+    tags:
+      - Авторизация
+    summary: Отозвать текущий токен
+    description: |
+      Отзывает токен из заголовка Authorization. Процесс, принявший
+      запрос, перестаёт принимать токен сразу, остальные — после
+      обновления deny-list (не реже раза в TOKEN_DENYLIST_REFRESH
+      секунд).
+    parameters:
+      - name: Authorization
+        in: header
+        type: string
+        required: true
+        description: Bearer-токен для отзыва
+        example: "Bearer eyJ1aWQiOjF9.c2lnbmF0dXJl"
+    responses:
+      200:
+        description: Токен отозван
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+      401:
+        description: Токен не передан, недействителен или уже отозван
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Недействительный токен"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при записи в базу данных"
+    """
+    try:
+        claims = current_token_claims()
+
+        if not claims:
+            return jsonify(errors="Недействительный токен"), 401
+
+        revoke_token(claims)
+
+    except Exception as exc:
+        db.session.rollback()
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return jsonify(result=True), 200
+
+
+@app.route("/api/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """
+    Статистика кэшей
+    ---
+    tags:
+      - Служебные
+    summary: Получить счётчики кэшей процесса
+    description: |
+      Возвращает счётчики попаданий, промахов, вытеснений и истечений TTL,
+      а также текущий размер каждого кэша в памяти процесса. В graph —
+      размер графа подписок в памяти и длина буфера его изменений,
+      в like_buffer — число лайков, ожидающих отложенной записи.
+    responses:
+      200:
+        description: Статистика успешно получена
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            caches:
+              type: object
+              example: {
+                "feed": {
+                  "hits": 10,
+                  "misses": 2,
+                  "evictions": 0,
+                  "expirations": 1,
+                  "entries": 2,
+                  "bytes": 4096
+                }
+              }
+            graph:
+              type: object
+              example: {
+                "nodes": 1001,
+                "edges": 250000,
+                "delta": 12,
+                "bytes": 2016016
+              }
+            like_buffer:
+              type: object
+              example: {
+                "pending": 120,
+                "flushing": 0,
+                "tweets": 3
+              }
+    """
+    return (
+        jsonify(
+            {
+                "result": True,
+                "caches": cache_stats(),
+                "graph": graph_index.stats(),
+                "like_buffer": like_buffer.stats(),
+            }
+        ),
+        200,
+    )
+
+
+def subscriptions_response(user_id, key, match_column, user_column):
+    try:
+        page = parse_page_args(request.args)
+    except PaginationError as exc:
+        return jsonify(error=str(exc)), 400
+
+    try:
+        etag = resource_etag(user_version(user_id), request.query_string)
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+
+        if db.session.get(User, user_id) is None:
+            return jsonify(errors="Пользователь не найден"), 404
+
+        query = subscription_users_query(match_column, user_column, user_id)
+        result_page = finish_page(
+            db.session.execute(apply_keyset(query, Subscribe.id, page)).all(),
+            page,
+        )
+
+        response = jsonify(
+            {
+                "result": True,
+                key: [
+                    {"id": row.user_id, "name": row.name}
+                    for row in result_page["items"]
+                ],
+                "next_cursor": result_page["next_cursor"],
+            }
+        )
+        response.set_etag(etag)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
+        )
+
+    return response, 200
+
+
+@app.route("/api/users/<int:user_id>/followers", methods=["GET"])
+def get_user_followers(user_id):
+    """
+    Получение подписчиков пользователя
+    ---
+    tags:
+      - Пользователи
+    summary: Получить подписчиков пользователя
+    description: |
+      Возвращает страницу пользователей, подписанных на пользователя,
+      начиная с самых новых подписок. Пагинация такая же,
+      как у GET /api/tweets (по ID подписки).
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+        description: ID пользователя
+        example: 1
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Размер страницы (от 1 до 100, по умолчанию 50)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Непрозрачный курсор из next_cursor предыдущего ответа
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
+    responses:
+      200:
+        description: Список успешно получен
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            followers:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    example: 2
+                  name:
+                    type: string
+                    example: "Петр Петров"
+            next_cursor:
+              type: string
+              nullable: true
+              example: "eyJiZWZvcmVfaWQiOjQyfQ"
+      304:
+        description: Данные не изменились (ETag совпал с If-None-Match)
+      400:
+        description: Неверные параметры пагинации
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Некорректный курсор"
+      404:
+        description: Пользователь не найден
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Пользователь не найден"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при получении данных из базы"
+    """
+    return subscriptions_response(
+        user_id, "followers", Subscribe.target_id, Subscribe.subscriber_id
+    )
+
+
+@app.route("/api/users/<int:user_id>/following", methods=["GET"])
+def get_user_following(user_id):
+    """
+    Получение подписок пользователя
+    ---
+    tags:
+      - Пользователи
+    summary: Получить подписки пользователя
+    description: |
+      Возвращает страницу пользователей, на которых подписан пользователь,
+      начиная с самых новых подписок. Пагинация такая же,
+      как у GET /api/tweets (по ID подписки).
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+        description: ID пользователя
+        example: 1
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Размер страницы (от 1 до 100, по умолчанию 50)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Непрозрачный курсор из next_cursor предыдущего ответа
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
+    responses:
+      200:
+        description: Список успешно получен
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            following:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    example: 2
+                  name:
+                    type: string
+                    example: "Петр Петров"
+            next_cursor:
+              type: string
+              nullable: true
+              example: "eyJiZWZvcmVfaWQiOjQyfQ"
+      304:
+        description: Данные не изменились (ETag совпал с If-None-Match)
+      400:
+        description: Неверные параметры пагинации
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Некорректный курсор"
+      404:
+        description: Пользователь не найден
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Пользователь не найден"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при получении данных из базы"
+    """
+    return subscriptions_response(
+        user_id, "following", Subscribe.subscriber_id, Subscribe.target_id
+    )
+
+
+@app.route("/api/users/<int:user_id>/tweets", methods=["GET"])
+def get_user_tweets(user_id):
+    """
+    Получение твитов пользователя
+    ---
+    tags:
+      - Твиты
+    summary: Получить твиты одного автора
+    description: |
+      Возвращает твиты пользователя в обратном хронологическом порядке
+      в том же формате, что и GET /api/tweets. Пагинация по ключу
+      (keyset): каждая страница читается диапазоном индекса
+      (user_id, id), для следующей страницы передайте next_cursor
+      в параметр cursor.
     produces:
       - application/json
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+        description: ID автора
+        example: 1
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Размер страницы (от 1 до 100, по умолчанию 50)
+        example: 20
+      - name: before_id
+        in: query
+        type: integer
+        required: false
+        description: Вернуть твиты с ID меньше указанного (более старые)
+        example: 120
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Вернуть твиты с ID больше указанного (более новые)
+        example: 100
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Непрозрачный курсор из next_cursor предыдущего ответа
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
     responses:
       200:
-        description: Список твитов успешно получен
+        description: Твиты пользователя успешно получены
         schema:
           type: object
           properties:
@@ -1003,48 +2810,32 @@ def get_tweets():
               example: true
             tweets:
               type: array
+              description: Твиты в формате GET /api/tweets
               items:
                 type: object
-                properties:
-                  id:
-                    type: integer
-                    description: ID твита
-                    example: 42
-                  content:
-                    type: string
-                    description: Текст твита
-                    example: "Это мой первый твит!"
-                  attachments:
-                    type: array
-                    description: Список путей к медиавложениям
-                    items:
-                      type: string
-                    example: [
-                      "static/media/image1.jpg",
-                      "static/media/image2.png"
-                    ]
-                  author:
-                    type: object
-                    description: Информация об авторе твита
-                    properties:
-                      id:
-                        type: integer
-                        example: 1
-                      name:
-                        type: string
-                        example: "Иван Иванов"
-                  likes:
-                    type: array
-                    description: Список пользователей, поставивших лайк
-                    items:
-                      type: object
-                      properties:
-                        user_id:
-                          type: integer
-                          example: 2
-                        name:
-                          type: string
-                          example: "Петр Петров"
+            next_cursor:
+              type: string
+              nullable: true
+              description: Курсор следующей страницы (null, если её нет)
+              example: "eyJiZWZvcmVfaWQiOjQyfQ"
+      304:
+        description: Данные не изменились (ETag совпал с If-None-Match)
+      400:
+        description: Неверные параметры пагинации
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+              example: "Некорректный курсор"
+      404:
+        description: Пользователь не найден
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Пользователь не найден"
       500:
         description: Внутренняя ошибка сервера
         schema:
@@ -1061,53 +2852,262 @@ def get_tweets():
               example: "Ошибка при получении данных из базы"
     """
     try:
-        tweets = (
-            db.session.query(Tweet)
-            .options(
-                joinedload(Tweet.medias),
-                joinedload(Tweet.users),
-                joinedload(Tweet.likes).joinedload(Like.users),
+        page = parse_page_args(request.args)
+    except PaginationError as exc:
+        return jsonify(error=str(exc)), 400
+
+    try:
+        etag = resource_etag(FEED_VERSION, request.full_path.encode())
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+
+        rows = db.session.execute(
+            apply_keyset(
+                tweet_rows_query().where(Tweet.user_id == user_id),
+                Tweet.id,
+                page,
             )
-            .all()
+        ).all()
+
+        if not rows and db.session.get(User, user_id) is None:
+            return jsonify(errors="Пользователь не найден"), 404
+
+        result_page = finish_page(rows, page)
+        response = app.response_class(
+            encode_feed(
+                render_fragments(result_page["items"]),
+                next_cursor=result_page["next_cursor"],
+            ),
+            mimetype="application/json",
+        )
+        response.set_etag(etag)
+
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
+                }
+            ),
+            500,
         )
 
-        return_datas = []
+    return response, 200
+
+
+@app.route("/api/users/<int:user_id>/relationship", methods=["GET"])
+def get_user_relationship(user_id):
+    """
+    Связь текущего пользователя с другим пользователем
+    ---
+    tags:
+      - Подписки
+    summary: Проверить подписки между двумя пользователями
+    description: |
+      Отвечает по графу подписок в памяти процесса, без запросов к базе
+      (кроме периодической перезагрузки графа раз в
+      GRAPH_REFRESH_INTERVAL секунд). Для несуществующего пользователя
+      все признаки равны false.
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+        description: ID пользователя
+        example: 5
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+    responses:
+      200:
+        description: Связь успешно получена
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            following:
+              type: boolean
+              description: Текущий пользователь подписан на user_id
+              example: true
+            followed_by:
+              type: boolean
+              description: user_id подписан на текущего пользователя
+              example: false
+            mutual:
+              type: boolean
+              description: Подписки взаимные
+              example: false
+            common_following_count:
+              type: integer
+              description: Сколько пользователей читают оба
+              example: 12
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при загрузке графа"
+    """
+    try:
+        user = current_user()
+
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
 
-        for i_tweet in tweets:
-            attachments = []
-            for media in i_tweet.medias:
-                attachments.append(media.file_path)
+        graph = social_graph()
+        following = graph.follows(user.id, user_id)
+        followed_by = graph.follows(user_id, user.id)
+        common_following = np.intersect1d(
+            graph.following(user.id), graph.following(user_id)
+        )
 
-            author_data = None
-            if i_tweet.users:
-                author_data = {
-                    "id": i_tweet.users.id,
-                    "name": i_tweet.users.name,
+    except Exception as exc:
+        logger.error(
+            f'"result": False, '
+            f'"error_type": {str(type(exc).__name__)}, '
+            f'"error_message": {str(exc)}'
+        )
+        return (
+            jsonify(
+                {
+                    "result": False,
+                    "error_type": str(type(exc).__name__),
+                    "error_message": str(exc),
                 }
+            ),
+            500,
+        )
 
-            likes_data = []
-            for like in i_tweet.likes:
-                if like.users:
-                    likes_data.append(
-                        {
-                            "user_id": like.user_id,
-                            "name": like.users.name,
-                        }
-                    )
-
-            temp_data = {
-                "id": i_tweet.id,
-                "content": i_tweet.tweet_data,
-                "attachments": attachments,
-                "author": author_data,
-                "likes": likes_data,
+    return (
+        jsonify(
+            {
+                "result": True,
+                "following": following,
+                "followed_by": followed_by,
+                "mutual": following and followed_by,
+                "common_following_count": len(common_following),
             }
+        ),
+        200,
+    )
+
+
+@app.route("/api/users/suggestions", methods=["GET"])
+def get_user_suggestions():
+    """
+    Рекомендации, на кого подписаться
+    ---
+    tags:
+      - Подписки
+    summary: Получить рекомендации подписок
+    description: |
+      Кандидаты упорядочены по числу пользователей, на которых подписаны
+      и текущий пользователь, и кандидат, плюс лайки, поставленные
+      твитам кандидата за последние SUGGESTIONS_LIKE_DAYS дней.
+      Рекомендации хранятся в user_suggestions и пересчитываются
+      командой flask recompute-suggestions или в фоне, если они старше
+      SUGGESTIONS_TTL секунд. Пользователи, на которых текущий
+      пользователь подписался после расчёта, не отдаются.
+    parameters:
+      - name: API_KEY
+        in: header
+        type: string
+        required: true
+        description: API ключ пользователя для авторизации
+        example: "550e8400-e29b-41d4-a716-446655440000"
+    responses:
+      200:
+        description: Рекомендации успешно получены
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: true
+            users:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                    example: 7
+                  name:
+                    type: string
+                    example: "Петр Петров"
+                  shared_following:
+                    type: integer
+                    description: Общих подписок с текущим пользователем
+                    example: 4
+                  recent_likes:
+                    type: integer
+                    description: Недавних лайков твитам кандидата
+                    example: 2
+                  score:
+                    type: number
+                    example: 5.0
+      401:
+        description: Ошибка авторизации
+        schema:
+          type: object
+          properties:
+            errors:
+              type: string
+              example: "Такого пользователя не существует"
+      500:
+        description: Внутренняя ошибка сервера
+        schema:
+          type: object
+          properties:
+            result:
+              type: boolean
+              example: false
+            error_type:
+              type: string
+              example: "DatabaseError"
+            error_message:
+              type: string
+              example: "Ошибка при получении рекомендаций"
+    """
+    try:
+        user = current_user()
 
-            return_datas.append(temp_data)
+        if not user:
+            return jsonify(errors="Такого пользователя не существует"), 401
 
-        return_datas = list(reversed(return_datas))
+        suggestions = load_suggestions(user.id)
 
     except Exception as exc:
+        db.session.rollback()
         logger.error(
             f'"result": False, '
             f'"error_type": {str(type(exc).__name__)}, '
@@ -1124,7 +3124,7 @@ def get_tweets():
             500,
         )
 
-    return jsonify({"result": True, "tweets": return_datas}), 200
+    return jsonify({"result": True, "users": suggestions}), 200
 
 
 @app.route("/api/users/me", methods=["GET"])
@@ -1138,8 +3138,8 @@ def get_my_account_info():
     description: |
       Возвращает подробную информацию
        о текущем аутентифицированном пользователе.
-      Включает информацию о подписчиках (фолловерах) и пользователях,
-      на которых подписан текущий пользователь.
+      Включает число подписчиков (фолловеров) и подписок и превью
+      последних из них.
       Требует авторизации через API ключ.
     parameters:
       - name: API_KEY
@@ -1148,6 +3148,11 @@ def get_my_account_info():
         required: true
         description: API ключ пользователя для авторизации
         example: "550e8400-e29b-41d4-a716-446655440000"
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
     responses:
       200:
         description: Информация о пользователе успешно получена
@@ -1168,10 +3173,23 @@ def get_my_account_info():
                   type: string
                   description: Имя пользователя
                   example: "Иван Иванов"
+                followers_count:
+                  type: integer
+                  description: Число подписчиков
+                  example: 120
+                following_count:
+                  type: integer
+                  description: Число подписок
+                  example: 45
+                tweets_count:
+                  type: integer
+                  description: Число твитов
+                  example: 12
                 followers:
                   type: array
-                  description: Список подписчиков
-                  (пользователей, которые подписаны на текущего пользователя)
+                  description: |
+                    Последние PROFILE_PREVIEW_SIZE подписчиков. Полный
+                    список — GET /api/users/<id>/followers
                   items:
                     type: object
                     properties:
@@ -1183,8 +3201,9 @@ def get_my_account_info():
                         example: "Петр Петров"
                 following:
                   type: array
-                  description: Список подписок
-                  (пользователей, на которых подписан текущий пользователь)
+                  description: |
+                    Последние PROFILE_PREVIEW_SIZE подписок. Полный
+                    список — GET /api/users/<id>/following
                   items:
                     type: object
                     properties:
@@ -1194,6 +3213,8 @@ def get_my_account_info():
                       name:
                         type: string
                         example: "Анна Смирнова"
+      304:
+        description: Данные не изменились (ETag совпал с If-None-Match)
       401:
         description: Ошибка авторизации
         schema:
@@ -1218,55 +3239,26 @@ def get_my_account_info():
               example: "Ошибка при получении данных пользователя"
     """
     try:
-        api_key = request.environ.get("HTTP_API_KEY")
+        auth_user = current_user()
 
-        user = (
-            db.session.query(User)
-            .options(
-                joinedload(User.subscribers).joinedload(Subscribe.subscribers),
-                joinedload(User.targets).joinedload(Subscribe.targets),
-            )
-            .filter(User.api_key == api_key)
-            .one_or_none()
-        )
-
-        if not user:
+        if not auth_user:
             return jsonify(error="Пользователь не найден"), 401
 
-        followers = []
-        for i_subscriber in user.subscribers:
-            follower_user = (
-                db.session.query(User)
-                .filter(User.id == i_subscriber.target_id)
-                .first()
-            )
-
-            follower_data = {
-                "id": follower_user.id,
-                "name": follower_user.name,
-            }
-
-            followers.append(follower_data)
+        user_id = auth_user.id
 
-        following = []
-        for i_target in user.targets:
-            target_user = (
-                db.session.query(User)
-                .filter(User.id == i_target.subscriber_id)
-                .first()
-            )
+        etag = resource_etag(user_version(user_id))
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
 
-            following_data = {"id": target_user.id, "name": target_user.name}
-            following.append(following_data)
+        return_data = load_profile(user_id)
 
-        return_data = {
-            "id": user.id,
-            "name": user.name,
-            "followers": list(reversed(followers)),
-            "following": list(reversed(following)),
-        }
+        if not return_data:
+            return jsonify(error="Пользователь не найден"), 401
 
-        return jsonify({"result": True, "user": return_data}), 200
+        response = jsonify({"result": True, "user": return_data})
+        response.set_etag(etag)
+        return response, 200
 
     except Exception as exc:
         logger.error(
@@ -1296,8 +3288,8 @@ def get_account_info_by_id(user_id):
     summary: Получить информацию о пользователе
     description: |
       Возвращает подробную информацию о пользователе по его ID.
-      Включает информацию о подписчиках (фолловерах) и пользователях,
-      на которых подписан указанный пользователь.
+      Включает число подписчиков (фолловеров) и подписок и превью
+      последних из них.
       Не требует авторизации - информация публичная.
     parameters:
       - name: user_id
@@ -1306,6 +3298,11 @@ def get_account_info_by_id(user_id):
         required: true
         description: ID пользователя
         example: 1
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag из предыдущего ответа
     responses:
       200:
         description: Информация о пользователе успешно получена
@@ -1326,9 +3323,23 @@ def get_account_info_by_id(user_id):
                   type: string
                   description: Имя пользователя
                   example: "Иван Иванов"
+                followers_count:
+                  type: integer
+                  description: Число подписчиков
+                  example: 120
+                following_count:
+                  type: integer
+                  description: Число подписок
+                  example: 45
+                tweets_count:
+                  type: integer
+                  description: Число твитов
+                  example: 12
                 followers:
                   type: array
-                  description: Список подписчиков пользователя
+                  description: |
+                    Последние PROFILE_PREVIEW_SIZE подписчиков. Полный
+                    список — GET /api/users/<id>/followers
                   items:
                     type: object
                     properties:
@@ -1340,7 +3351,9 @@ def get_account_info_by_id(user_id):
                         example: "Петр Петров"
                 following:
                   type: array
-                  description: Список подписок пользователя
+                  description: |
+                    Последние PROFILE_PREVIEW_SIZE подписок. Полный
+                    список — GET /api/users/<id>/following
                   items:
                     type: object
                     properties:
@@ -1350,6 +3363,8 @@ def get_account_info_by_id(user_id):
                       name:
                         type: string
                         example: "Анна Смирнова"
+      304:
+        description: Данные не изменились (ETag совпал с If-None-Match)
       404:
         description: Пользователь не найден
         schema:
@@ -1374,51 +3389,15 @@ def get_account_info_by_id(user_id):
               example: "Ошибка при получении данных пользователя"
     """
     try:
-        user = (
-            db.session.query(User)
-            .options(
-                joinedload(User.subscribers).joinedload(Subscribe.subscribers),
-                joinedload(User.targets).joinedload(Subscribe.targets),
-            )
-            .filter(User.id == user_id)
-            .one_or_none()
-        )
-
-        if not user:
-            return jsonify(errors="Пользователь не найден"), 404
+        etag = resource_etag(user_version(user_id))
+        cached_response = not_modified(etag)
+        if cached_response is not None:
+            return cached_response
 
-        following = []
-        for i_subscriber in user.subscribers:
-            following_user = (
-                db.session.query(User)
-                .filter(User.id == i_subscriber.target_id)
-                .first()
-            )
-
-            following_data = {
-                "id": following_user.id,
-                "name": following_user.name,
-            }
-
-            following.append(following_data)
+        return_data = load_profile(user_id)
 
-        followers = []
-        for i_target in user.targets:
-            target_user = (
-                db.session.query(User)
-                .filter(User.id == i_target.subscriber_id)
-                .first()
-            )
-
-            followers_data = {"id": target_user.id, "name": target_user.name}
-            followers.append(followers_data)
-
-        return_data = {
-            "id": user.id,
-            "name": user.name,
-            "followers": list(reversed(followers)),
-            "following": list(reversed(following)),
-        }
+        if not return_data:
+            return jsonify(errors="Пользователь не найден"), 404
 
     except Exception as exc:
         logger.error(
@@ -1437,4 +3416,6 @@ def get_account_info_by_id(user_id):
             500,
         )
 
-    return jsonify({"result": True, "user": return_data}), 200
+    response = jsonify({"result": True, "user": return_data})
+    response.set_etag(etag)
+    return response, 200
@@ -0,0 +1,149 @@
+import datetime
+import decimal
+import json
+import os
+import uuid
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from flask.json.provider import JSONProvider
+from sqlalchemy import inspect
+from sqlalchemy.orm import Mapper
+
+JSON_BACKENDS = ("orjson", "msgspec", "json")
+
+Serializer = Callable[[Any], Dict[str, Any]]
+
+_serializers: Dict[type, Serializer] = {}
+
+
+def _default(obj: Any) -> Any:
+    """
+    Типы, которые не кодируются бэкендом напрямую.
+    """
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def _load_orjson():
+    import orjson
+
+    options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=options)
+
+    return dumps, orjson.loads
+
+
+def _load_msgspec():
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=_default)
+    decoder = msgspec.json.Decoder()
+
+    def loads(data):
+        try:
+            return decoder.decode(data)
+        except msgspec.DecodeError as exc:
+            raise ValueError(str(exc)) from exc
+
+    return encoder.encode, loads
+
+
+def _load_json():
+    encoder = json.JSONEncoder(
+        default=_default, ensure_ascii=False, separators=(",", ":")
+    )
+
+    def dumps(obj: Any) -> bytes:
+        return encoder.encode(obj).encode()
+
+    return dumps, json.loads
+
+
+_loaders = {
+    "orjson": _load_orjson,
+    "msgspec": _load_msgspec,
+    "json": _load_json,
+}
+
+
+def select_backend(preferred: Optional[str] = None):
+    """
+    Выбирает JSON-бэкенд: явно заданный в JSON_BACKEND или первый
+    установленный из orjson, msgspec, стандартного json.
+    """
+    if preferred:
+        if preferred not in _loaders:
+            raise ValueError(f"Неизвестный JSON-бэкенд: {preferred}")
+        return (preferred, *_loaders[preferred]())
+
+    for name in JSON_BACKENDS:
+        try:
+            return (name, *_loaders[name]())
+        except ImportError:
+            continue
+
+    raise RuntimeError("Не найден ни один JSON-бэкенд")
+
+
+backend, dumps, loads = select_backend(os.getenv("JSON_BACKEND") or None)
+
+
+def compile_serializer(
+    model: type, fields: Optional[Sequence[str]] = None
+) -> Serializer:
+    """
+    Собирает сериализатор модели один раз: список колонок и attrgetter
+    вычисляются заранее, а не на каждом вызове.
+    """
+    if fields is None:
+        mapper: Mapper[Any] = inspect(model)
+        fields = [column.key for column in mapper.column_attrs]
+    names = tuple(fields)
+
+    if len(names) == 1:
+        name = names[0]
+        getter = attrgetter(name)
+        return lambda obj: {name: getter(obj)}
+
+    getter = attrgetter(*names)
+    return lambda obj: dict(zip(names, getter(obj)))
+
+
+def serialize(obj: Any) -> Dict[str, Any]:
+    """
+    Словарь колонок объекта модели через закэшированный сериализатор.
+    """
+    model = type(obj)
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = compile_serializer(model)
+
+    return serializer(obj)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    JSON-провайдер Flask поверх выбранного бэкенда: jsonify и request.json
+    идут через него, тело ответа кодируется сразу в байты.
+    """
+
+    mimetype = "application/json"
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
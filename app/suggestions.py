@@ -0,0 +1,231 @@
+import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Dict, List, Sequence
+
+from flask import current_app
+from sqlalchemy import (
+    Integer,
+    column,
+    exists,
+    func,
+    literal,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by, insert
+from sqlalchemy.orm import aliased
+
+from . import tasks
+from .models import Like, Subscribe, Tweet, User, UserSuggestions, db
+
+LIKE_WEIGHT = 0.5
+
+
+def suggestion_rows_query(
+    viewer_ids: Sequence[int], limit: int, like_days: int
+):
+    """
+    Кандидаты для пачки пользователей одним запросом: два шага по
+    subscribes (на кого подписан зритель -> кто ещё на них подписан)
+    плюс лайки, поставленные зрителем твитам кандидата за like_days
+    дней. Для каждого зрителя остаётся limit лучших кандидатов.
+    """
+    viewer_follows = aliased(Subscribe)
+    candidate_follows = aliased(Subscribe)
+
+    shared = (
+        select(
+            viewer_follows.subscriber_id.label("viewer_id"),
+            candidate_follows.subscriber_id.label("candidate_id"),
+            func.count().label("shared"),
+            literal(0).label("likes"),
+        )
+        .join(
+            candidate_follows,
+            candidate_follows.target_id == viewer_follows.target_id,
+        )
+        .where(viewer_follows.subscriber_id.in_(viewer_ids))
+        .group_by(
+            viewer_follows.subscriber_id, candidate_follows.subscriber_id
+        )
+    )
+    liked = (
+        select(
+            Like.user_id.label("viewer_id"),
+            Tweet.user_id.label("candidate_id"),
+            literal(0).label("shared"),
+            func.count().label("likes"),
+        )
+        .join(Tweet, Tweet.id == Like.tweet_id)
+        .where(
+            Like.user_id.in_(viewer_ids),
+            Tweet.user_id.is_not(None),
+            Like.created_at >= func.now() - datetime.timedelta(days=like_days),
+        )
+        .group_by(Like.user_id, Tweet.user_id)
+    )
+    signals = union_all(shared, liked).subquery()
+
+    already_following = exists().where(
+        Subscribe.subscriber_id == signals.c.viewer_id,
+        Subscribe.target_id == signals.c.candidate_id,
+    )
+    shared_count = func.sum(signals.c.shared)
+    like_count = func.sum(signals.c.likes)
+    score = shared_count + LIKE_WEIGHT * like_count
+
+    scored = (
+        select(
+            signals.c.viewer_id,
+            signals.c.candidate_id,
+            shared_count.label("shared"),
+            like_count.label("likes"),
+            score.label("score"),
+            func.row_number()
+            .over(
+                partition_by=signals.c.viewer_id,
+                order_by=(score.desc(), signals.c.candidate_id),
+            )
+            .label("rank"),
+        )
+        .where(
+            signals.c.candidate_id != signals.c.viewer_id,
+            ~already_following,
+        )
+        .group_by(signals.c.viewer_id, signals.c.candidate_id)
+        .subquery()
+    )
+
+    return (
+        select(
+            scored.c.viewer_id,
+            User.id,
+            User.name,
+            scored.c.shared,
+            scored.c.likes,
+            scored.c.score,
+        )
+        .join(User, User.id == scored.c.candidate_id)
+        .where(scored.c.rank <= limit)
+        .order_by(scored.c.viewer_id, scored.c.rank)
+    )
+
+
+def refresh_suggestions(viewer_ids: Sequence[int]) -> Dict[int, List[Dict]]:
+    """
+    Пересчитывает рекомендации для пачки пользователей и сохраняет
+    их в user_suggestions.
+    """
+    config = current_app.config
+    rows = db.session.execute(
+        suggestion_rows_query(
+            viewer_ids,
+            config["SUGGESTIONS_LIMIT"],
+            config["SUGGESTIONS_LIKE_DAYS"],
+        )
+    ).all()
+
+    suggestions: Dict[int, List[Dict[str, Any]]] = {
+        viewer_id: [] for viewer_id in viewer_ids
+    }
+    for viewer_id, group in groupby(rows, key=itemgetter(0)):
+        suggestions[viewer_id] = [
+            {
+                "id": row.id,
+                "name": row.name,
+                "shared_following": int(row.shared),
+                "recent_likes": int(row.likes),
+                "score": float(row.score),
+            }
+            for row in group
+        ]
+
+    if suggestions:
+        statement = insert(UserSuggestions).values(
+            [
+                {"user_id": viewer_id, "suggestions": items}
+                for viewer_id, items in suggestions.items()
+            ]
+        )
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[UserSuggestions.user_id],
+                set_={
+                    "suggestions": statement.excluded.suggestions,
+                    "computed_at": func.now(),
+                },
+            )
+        )
+    db.session.commit()
+
+    return suggestions
+
+
+def refresh_all_suggestions(batch_size: int) -> int:
+    """
+    Пересчитывает рекомендации всех пользователей пачками по batch_size.
+    """
+    refreshed = 0
+    last_id = 0
+
+    while True:
+        viewer_ids = db.session.scalars(
+            select(User.id)
+            .where(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+        ).all()
+        if not viewer_ids:
+            return refreshed
+
+        refresh_suggestions(viewer_ids)
+        refreshed += len(viewer_ids)
+        last_id = viewer_ids[-1]
+
+
+def load_suggestions(user_id: int) -> List[Dict[str, Any]]:
+    """
+    Рекомендации из user_suggestions одним запросом по первичному ключу.
+    Пользователи, на которых зритель подписался после расчёта,
+    отбрасываются при чтении.
+    Если их ещё нет, они считаются сразу; если они старше
+    SUGGESTIONS_TTL секунд, отдаются как есть и пересчитываются в фоне.
+    """
+    item = (
+        func.jsonb_array_elements(UserSuggestions.suggestions)
+        .table_valued(column("value", JSONB), with_ordinality="position")
+        .render_derived()
+    )
+    not_followed = (
+        select(
+            func.coalesce(
+                func.jsonb_agg(
+                    aggregate_order_by(item.c.value, item.c.position)
+                ),
+                literal([], JSONB),
+            )
+        )
+        .where(
+            ~exists().where(
+                Subscribe.subscriber_id == UserSuggestions.user_id,
+                Subscribe.target_id == item.c.value["id"].astext.cast(Integer),
+            )
+        )
+        .scalar_subquery()
+    )
+    row = db.session.execute(
+        select(
+            not_followed.label("suggestions"),
+            UserSuggestions.computed_at,
+        ).where(UserSuggestions.user_id == user_id)
+    ).one_or_none()
+
+    if row is None:
+        return refresh_suggestions([user_id])[user_id]
+
+    ttl = datetime.timedelta(seconds=current_app.config["SUGGESTIONS_TTL"])
+    if row.computed_at + ttl <= datetime.datetime.now(datetime.timezone.utc):
+        tasks.submit(refresh_suggestions, [user_id])
+
+    return row.suggestions
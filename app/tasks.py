@@ -0,0 +1,42 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .models import db
+
+logger = logging.getLogger()
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BACKGROUND_WORKERS", "2")),
+    thread_name_prefix="background",
+)
+
+
+def _run(app, func, args, kwargs):
+    with app.app_context():
+        try:
+            func(*args, **kwargs)
+        except Exception as exc:
+            db.session.rollback()
+            logger.error(
+                f'"result": False, '
+                f'"task": {func.__name__}, '
+                f'"error_type": {str(type(exc).__name__)}, '
+                f'"error_message": {str(exc)}'
+            )
+
+
+def submit(func, *args, **kwargs):
+    """
+    Выполняет функцию в фоновом потоке с собственным контекстом
+    приложения. При TASKS_ALWAYS_EAGER функция выполняется сразу.
+    """
+    app = current_app._get_current_object()
+
+    if app.config.get("TASKS_ALWAYS_EAGER"):
+        _run(app, func, args, kwargs)
+        return
+
+    _executor.submit(_run, app, func, args, kwargs)
@@ -0,0 +1,195 @@
+import heapq
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Union
+
+from flask import current_app
+from sqlalchemy import CompoundSelect, Select, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import Subscribe, TimelineEntry, Tweet, User, db
+from .pagination import Page, apply_keyset
+
+TIMELINE_STRATEGIES = ("push", "pull", "hybrid")
+
+
+def follower_count(author_id: int) -> int:
+    return (
+        db.session.query(User.followers_count)
+        .filter(User.id == author_id)
+        .scalar()
+    ) or 0
+
+
+def fan_out_tweet(tweet_id: int, author_id: int) -> None:
+    """
+    Раскладывает твит в ленты подписчиков автора и в ленту самого автора
+    одним INSERT ... SELECT. Подписчикам авторов, у которых больше
+    TIMELINE_CELEBRITY_THRESHOLD подписчиков, твит не раскладывается:
+    он помечается fanned_out = false и подмешивается при чтении
+    в стратегии hybrid. Решение хранится на твите, поэтому переход
+    автора через порог не теряет и не дублирует уже написанные твиты.
+    """
+    own = select(literal(author_id), literal(tweet_id), literal(author_id))
+    rows: Union[Select, CompoundSelect] = own
+
+    threshold = current_app.config["TIMELINE_CELEBRITY_THRESHOLD"]
+    if follower_count(author_id) <= threshold:
+        followers = select(
+            Subscribe.subscriber_id,
+            literal(tweet_id),
+            literal(author_id),
+        ).where(Subscribe.target_id == author_id)
+        rows = followers.union_all(own)
+    else:
+        db.session.execute(
+            update(Tweet)
+            .where(Tweet.id == tweet_id)
+            .values(fanned_out=False)
+            .execution_options(synchronize_session=False)
+        )
+
+    db.session.execute(
+        insert(TimelineEntry)
+        .from_select(["user_id", "tweet_id", "author_id"], rows)
+        .on_conflict_do_nothing()
+    )
+    db.session.commit()
+
+
+def remove_tweet_from_timelines(tweet_id: int) -> None:
+    db.session.query(TimelineEntry).filter(
+        TimelineEntry.tweet_id == tweet_id
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def keyset_stream(query, column, page: Page, chunk_size: int) -> Iterator[int]:
+    """
+    Лениво отдаёт значения column в порядке страницы, подгружая их
+    порциями по индексу.
+    """
+    before_id, after_id = page.before_id, page.after_id
+
+    while True:
+        chunk_page = Page(
+            limit=chunk_size - 1, before_id=before_id, after_id=after_id
+        )
+        ids = [row[0] for row in apply_keyset(query, column, chunk_page)]
+
+        yield from ids
+
+        if len(ids) < chunk_size:
+            return
+
+        if after_id is not None:
+            after_id = ids[-1]
+        else:
+            before_id = ids[-1]
+
+
+def author_stream(
+    author_id: int, page: Page, chunk_size: int, pulled: bool = False
+) -> Iterator[int]:
+    """
+    Твиты автора по индексу (user_id, id); с pulled — только твиты без
+    fan-out, по частичному индексу.
+    """
+    query = db.session.query(Tweet.id).filter(Tweet.user_id == author_id)
+    if pulled:
+        query = query.filter(Tweet.fanned_out.is_(False))
+    return keyset_stream(query, Tweet.id, page, chunk_size)
+
+
+def materialized_stream(
+    user_id: int, page: Page, chunk_size: int
+) -> Iterator[int]:
+    query = (
+        db.session.query(TimelineEntry.tweet_id)
+        .join(Tweet, Tweet.id == TimelineEntry.tweet_id)
+        .filter(TimelineEntry.user_id == user_id)
+    )
+    return keyset_stream(query, TimelineEntry.tweet_id, page, chunk_size)
+
+
+def merge_streams(
+    streams: Iterable[Iterator[int]], count: int, descending: bool = True
+) -> List[int]:
+    """
+    K-way слияние отсортированных потоков через кучу. Останавливается,
+    как только набрано count уникальных id.
+    """
+    result: List[int] = []
+    last: Optional[int] = None
+
+    for tweet_id in heapq.merge(*streams, reverse=descending):
+        if tweet_id == last:
+            continue
+        result.append(tweet_id)
+        last = tweet_id
+        if len(result) == count:
+            break
+
+    return result
+
+
+def followed_author_ids(user_id: int) -> List[int]:
+    rows = db.session.query(Subscribe.target_id).filter(
+        Subscribe.subscriber_id == user_id
+    )
+    return [row.target_id for row in rows]
+
+
+def followed_pulled_author_ids(user_id: int) -> List[int]:
+    """
+    Авторы из подписок, у которых есть твиты без fan-out. Смотрит на
+    сами твиты, а не на текущее число подписчиков автора.
+    """
+    pulled = (
+        select(Tweet.id)
+        .where(
+            Tweet.user_id == Subscribe.target_id, Tweet.fanned_out.is_(False)
+        )
+        .exists()
+    )
+    rows = db.session.query(Subscribe.target_id).filter(
+        Subscribe.subscriber_id == user_id, pulled
+    )
+    return [row.target_id for row in rows]
+
+
+def read_materialized_ids(user_id: int, page: Page) -> List[int]:
+    """
+    Fan-out-on-write: страница ленты — диапазон по первичному ключу
+    (user_id, tweet_id) материализованной ленты.
+    """
+    count = page.limit + 1
+    return list(islice(materialized_stream(user_id, page, count), count))
+
+
+def read_merged_ids(user_id: int, page: Page) -> List[int]:
+    """
+    Fan-out-on-read: берёт по page.limit + 1 новейших твитов каждого
+    автора из подписок (и самого пользователя) и сливает их.
+    """
+    authors = set(followed_author_ids(user_id))
+    authors.add(user_id)
+
+    count = page.limit + 1
+    streams = [author_stream(author, page, count) for author in authors]
+
+    return merge_streams(streams, count, descending=page.after_id is None)
+
+
+def read_hybrid_ids(user_id: int, page: Page) -> List[int]:
+    """
+    Материализованная лента, в которую при чтении подмешиваются твиты
+    без fan-out: их авторы на момент записи были выше порога.
+    """
+    count = page.limit + 1
+    streams = [materialized_stream(user_id, page, count)]
+    streams.extend(
+        author_stream(author, page, count, pulled=True)
+        for author in followed_pulled_author_ids(user_id)
+    )
+
+    return merge_streams(streams, count, descending=page.after_id is None)
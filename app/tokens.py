@@ -0,0 +1,154 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import RevokedToken, db
+
+
+class TokenError(ValueError):
+    pass
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret: str, payload: str) -> str:
+    digest = hmac.new(secret.encode(), payload.encode(), hashlib.sha256)
+    return _b64encode(digest.digest())
+
+
+def issue_token(secret: str, user_id: int, name: str, ttl: int) -> str:
+    """
+    Подписанный HMAC-SHA256 токен вида <payload>.<подпись> с id
+    и именем пользователя, сроком действия и уникальным jti.
+    """
+    claims = {
+        "uid": user_id,
+        "name": name,
+        "exp": int(time.time()) + ttl,
+        "jti": secrets.token_hex(16),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+
+    return f"{payload}.{_sign(secret, payload)}"
+
+
+def decode_token(secret: str, token: str) -> Dict:
+    """
+    Проверяет подпись и срок действия токена без обращения к базе.
+    """
+    payload, _, signature = token.partition(".")
+    if not payload or not signature:
+        raise TokenError("Некорректный токен")
+
+    if not hmac.compare_digest(
+        _sign(secret, payload).encode(), signature.encode()
+    ):
+        raise TokenError("Неверная подпись токена")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (binascii.Error, ValueError) as exc:
+        raise TokenError("Некорректный токен") from exc
+
+    if claims.get("exp", 0) <= time.time():
+        raise TokenError("Срок действия токена истёк")
+
+    return claims
+
+
+class DenyList:
+    """
+    Множество jti отозванных токенов в памяти процесса. Перечитывается
+    из revoked_tokens не чаще раза в refresh_interval секунд, поэтому
+    отзыв в другом процессе вступает в силу с этой задержкой.
+    """
+
+    def __init__(self):
+        self._jtis: Set[str] = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def contains(self, jti: str, refresh_interval: float) -> bool:
+        now = time.monotonic()
+        if (
+            self._loaded_at is None
+            or now - self._loaded_at >= refresh_interval
+        ):
+            self.refresh()
+
+        return jti in self._jtis
+
+    def refresh(self) -> None:
+        jtis = set(
+            db.session.scalars(
+                select(RevokedToken.jti).where(
+                    RevokedToken.expires_at
+                    > datetime.datetime.now(datetime.timezone.utc)
+                )
+            )
+        )
+        with self._lock:
+            self._jtis = jtis
+            self._loaded_at = time.monotonic()
+
+    def add(self, jti: str) -> None:
+        with self._lock:
+            self._jtis.add(jti)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._jtis = set()
+            self._loaded_at = None
+
+
+deny_list = DenyList()
+
+
+def verify_token(token: str) -> Dict:
+    config = current_app.config
+    if not config["TOKEN_SECRET"]:
+        raise TokenError("Токены отключены")
+
+    claims = decode_token(config["TOKEN_SECRET"], token)
+    if deny_list.contains(claims["jti"], config["TOKEN_DENYLIST_REFRESH"]):
+        raise TokenError("Токен отозван")
+
+    return claims
+
+
+def revoke_token(claims: Dict) -> None:
+    """
+    Заносит токен в revoked_tokens до истечения его срока и сразу
+    в локальный deny-list. Заодно удаляются записи уже истёкших токенов.
+    """
+    expires_at = datetime.datetime.fromtimestamp(
+        claims["exp"], datetime.timezone.utc
+    )
+    db.session.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at <= func.now())
+    )
+    db.session.execute(
+        insert(RevokedToken)
+        .values(jti=claims["jti"], expires_at=expires_at)
+        .on_conflict_do_nothing()
+    )
+    db.session.commit()
+
+    deny_list.add(claims["jti"])
@@ -0,0 +1,111 @@
+import zlib
+
+from sqlalchemy import (
+    CTE,
+    ColumnElement,
+    Sequence,
+    String,
+    case,
+    cast,
+    column,
+    literal,
+    select,
+    table,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from .models import ChangeCounter, db
+
+FEED_VERSION = "tweets"
+
+feed_version_sequence = Sequence("feed_version_seq", metadata=db.metadata)
+
+
+def user_version(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def bump_versions(*names: str) -> None:
+    """
+    Увеличивает счётчики изменений ресурсов в текущей транзакции одним
+    многострочным upsert; имена сортируются, чтобы строки блокировались
+    в одном порядке.
+    """
+    if not names:
+        return
+
+    statement = insert(ChangeCounter).values(
+        [{"name": name, "version": 1} for name in sorted(set(names))]
+    )
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ChangeCounter.name],
+            set_={"version": ChangeCounter.version + 1},
+        )
+    )
+
+
+def user_version_of(user_id: ColumnElement[int]) -> ColumnElement[str]:
+    """
+    user_version для колонки с id пользователя внутри запроса.
+    """
+    return literal("user:") + cast(user_id, String)
+
+
+def bump_versions_from(name: ColumnElement[str]) -> CTE:
+    """
+    bump_versions для имён, вычисляемых в самом запросе: upsert в виде
+    CTE, который добавляется к запросу записи через add_cte. Имена
+    так же сортируются.
+    """
+    statement = insert(ChangeCounter).from_select(
+        ["name", "version"],
+        select(name, literal(1)).order_by(name),
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[ChangeCounter.name],
+        set_={"version": ChangeCounter.version + 1},
+    ).cte("versions")
+
+
+def bump_feed_version() -> None:
+    """
+    Увеличивает версию ленты. Версия ленты — последовательность, а не
+    строка change_counters: nextval не берёт блокировок, и записи
+    в ленту не ждут друг друга. Вызывается после коммита, чтобы новая
+    версия не стала видна раньше данных.
+    """
+    db.session.execute(select(feed_version_sequence.next_value()))
+
+
+def feed_version() -> int:
+    """
+    Последнее значение feed_version_seq; до первого nextval — 0.
+    """
+    version = db.session.scalar(
+        select(
+            case((column("is_called"), column("last_value")), else_=0)
+        ).select_from(table(feed_version_sequence.name))
+    )
+    return version or 0
+
+
+def current_version(name: str) -> int:
+    if name == FEED_VERSION:
+        return feed_version()
+
+    version = (
+        db.session.query(ChangeCounter.version)
+        .filter(ChangeCounter.name == name)
+        .scalar()
+    )
+    return version or 0
+
+
+def resource_etag(name: str, variant: bytes = b"") -> str:
+    """
+    ETag ресурса: версия из change_counters (для ленты — из
+    feed_version_seq) плюс контрольная сумма варианта представления
+    (например, строки запроса со страницей).
+    """
+    return f"{name}-{current_version(name)}-{zlib.crc32(variant):08x}"
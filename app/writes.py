@@ -0,0 +1,311 @@
+from typing import (
+    AbstractSet,
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from sqlalchemy import (
+    Delete,
+    Insert,
+    Integer,
+    and_,
+    case,
+    column,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from .changes import LIKES_CHANGED, record_change
+from .models import Like, Subscribe, Tweet, User, db
+from .versions import bump_versions_from, user_version_of
+
+MAX_BULK_ITEMS = 500
+
+LIKE_ACTIONS = {"like": True, "unlike": False}
+FOLLOW_ACTIONS = {"follow": True, "unfollow": False}
+
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"
+INVALID = "invalid"
+
+
+class BulkError(ValueError):
+    pass
+
+
+class BulkItem(NamedTuple):
+    id: int
+    action: str
+    enabled: bool
+
+
+def parse_bulk_items(payload: Any, id_field: str, actions) -> List[BulkItem]:
+    """
+    Разбирает тело пакетного запроса вида
+    {"items": [{"<id_field>": 1, "action": "..."}, ...]}.
+    Один id может встречаться в пакете только один раз.
+    """
+    items = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BulkError("Передайте непустой список items")
+
+    if len(items) > MAX_BULK_ITEMS:
+        raise BulkError(f"Не больше {MAX_BULK_ITEMS} элементов в пакете")
+
+    parsed = []
+    seen: Set[int] = set()
+    for item in items:
+        item_id = item.get(id_field) if isinstance(item, dict) else None
+        action = item.get("action") if isinstance(item, dict) else None
+
+        if not isinstance(item_id, int) or isinstance(item_id, bool):
+            raise BulkError(f"Поле {id_field} должно быть целым числом")
+        if not isinstance(action, str) or action not in actions:
+            raise BulkError(
+                f"Поле action должно быть одним из: {', '.join(actions)}"
+            )
+        if item_id in seen:
+            raise BulkError(f"{id_field} {item_id} повторяется в пакете")
+
+        seen.add(item_id)
+        parsed.append(BulkItem(item_id, action, actions[action]))
+
+    return parsed
+
+
+def existing_ids(column, ids: Sequence[int]) -> Set[int]:
+    if not ids:
+        return set()
+    return set(db.session.scalars(select(column).where(column.in_(ids))))
+
+
+def write_likes(
+    pairs: Sequence[Tuple[int, int]], liked: bool
+) -> Dict[int, int]:
+    """
+    Ставит или снимает лайки по парам (tweet_id, user_id) одним
+    запросом: многострочный INSERT ... ON CONFLICT DO NOTHING (или
+    DELETE) в CTE и обновление счётчиков твитов на число изменившихся
+    лайков каждого твита. Возвращает новые like_count только
+    изменившихся твитов; уже стоявшие лайки, несуществующие твиты
+    и пользователи пропускаются.
+    """
+    if not pairs:
+        return {}
+
+    statement: Union[Insert, Delete]
+    if liked:
+        rows = values(
+            column("tweet_id", Integer),
+            column("user_id", Integer),
+            name="rows",
+        ).data(list(pairs))
+        statement = (
+            insert(Like)
+            .from_select(
+                ["tweet_id", "user_id"],
+                select(rows.c.tweet_id, rows.c.user_id)
+                .join(Tweet, Tweet.id == rows.c.tweet_id)
+                .join(User, User.id == rows.c.user_id),
+            )
+            .on_conflict_do_nothing()
+        )
+    else:
+        statement = delete(Like).where(
+            tuple_(Like.tweet_id, Like.user_id).in_(list(pairs))
+        )
+    changed = statement.returning(Like.tweet_id).cte("changed")
+    counts = (
+        select(changed.c.tweet_id, func.count().label("changed"))
+        .group_by(changed.c.tweet_id)
+        .subquery()
+    )
+
+    updated = db.session.execute(
+        update(Tweet)
+        .where(Tweet.id == counts.c.tweet_id)
+        .values(
+            like_count=Tweet.like_count
+            + (counts.c.changed if liked else -counts.c.changed),
+            version=Tweet.version + 1,
+        )
+        .returning(Tweet.id, Tweet.like_count)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    like_counts: Dict[int, int] = {
+        tweet_id: like_count for tweet_id, like_count in updated
+    }
+    for tweet_id, like_count in sorted(like_counts.items()):
+        record_change(tweet_id, LIKES_CHANGED, like_count)
+
+    return like_counts
+
+
+def toggle_likes(
+    tweet_ids: Sequence[int], user_id: int, liked: bool
+) -> Dict[int, int]:
+    """
+    Лайки одного пользователя сразу на несколько твитов.
+    """
+    return write_likes([(tweet_id, user_id) for tweet_id in tweet_ids], liked)
+
+
+def toggle_like(tweet_id: int, user_id: int, liked: bool) -> Optional[int]:
+    """
+    Новый like_count твита или None, если лайк уже был в нужном
+    состоянии или твита нет.
+    """
+    return toggle_likes([tweet_id], user_id, liked).get(tweet_id)
+
+
+def change_user_counter(user_id: int, column, delta: int) -> None:
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values({column: column + delta})
+        .execution_options(synchronize_session=False)
+    )
+
+
+def toggle_subscribes(
+    subscriber_id: int, target_ids: Sequence[int], following: bool
+) -> List[int]:
+    """
+    Подписки или отписки одним запросом: многострочный INSERT ...
+    ON CONFLICT DO NOTHING (или DELETE) с RETURNING в CTE, за которым
+    в том же запросе обновляются счётчики пользователей и их версии,
+    только для изменившихся подписок. Строки пользователей блокируются
+    (FOR NO KEY UPDATE, совместимо с проверкой внешнего ключа) в порядке
+    id, чтобы встречные подписки не взаимоблокировались.
+    Возвращает id пользователей, подписка на которых изменилась.
+    """
+    target_ids = [
+        target_id for target_id in target_ids if target_id != subscriber_id
+    ]
+    if not target_ids:
+        return []
+
+    statement: Union[Insert, Delete]
+    if following:
+        statement = (
+            insert(Subscribe)
+            .from_select(
+                ["subscriber_id", "target_id"],
+                select(literal(subscriber_id), User.id).where(
+                    User.id.in_(target_ids)
+                ),
+            )
+            .on_conflict_do_nothing()
+        )
+    else:
+        statement = delete(Subscribe).where(
+            Subscribe.subscriber_id == subscriber_id,
+            Subscribe.target_id.in_(target_ids),
+        )
+    changed = statement.returning(Subscribe.target_id).cte("changed")
+
+    delta = 1 if following else -1
+    changed_count = select(func.count()).select_from(changed).scalar_subquery()
+    is_subscriber = User.id == subscriber_id
+    affected = (
+        select(User.id)
+        .where(
+            or_(
+                and_(is_subscriber, changed_count > 0),
+                User.id.in_(select(changed.c.target_id)),
+            )
+        )
+        .order_by(User.id)
+        .with_for_update(key_share=True)
+        .cte("affected")
+    )
+    counters = (
+        update(User)
+        .where(User.id == affected.c.id)
+        .values(
+            following_count=User.following_count
+            + case((is_subscriber, delta * changed_count), else_=0),
+            followers_count=User.followers_count
+            + case((is_subscriber, 0), else_=delta),
+        )
+        .returning(User.id)
+        .cte("counters")
+    )
+
+    return list(
+        db.session.scalars(
+            select(changed.c.target_id)
+            .add_cte(bump_versions_from(user_version_of(counters.c.id)))
+            .execution_options(synchronize_session=False)
+        )
+    )
+
+
+def toggle_subscribe(
+    subscriber_id: int, target_id: int, following: bool
+) -> bool:
+    return bool(toggle_subscribes(subscriber_id, [target_id], following))
+
+
+def apply_bulk(
+    items: List[BulkItem],
+    id_field: str,
+    toggle,
+    column,
+    invalid_ids: AbstractSet[int] = frozenset(),
+) -> List[Dict[str, Any]]:
+    """
+    Выполняет пакет одним запросом на каждое действие (включить или
+    выключить) и возвращает результат по каждому элементу в порядке
+    запроса. Существование проверяется одним запросом и только для
+    элементов, которые ничего не изменили.
+    """
+    changed: Set[int] = set()
+    for enabled in (True, False):
+        ids = [
+            item.id
+            for item in items
+            if item.enabled is enabled and item.id not in invalid_ids
+        ]
+        changed.update(toggle(ids, enabled))
+
+    unchanged = [
+        item.id
+        for item in items
+        if item.id not in changed and item.id not in invalid_ids
+    ]
+    found = existing_ids(column, unchanged)
+
+    results = []
+    for item in items:
+        if item.id in invalid_ids:
+            status = INVALID
+        elif item.id in changed:
+            status = CHANGED
+        elif item.id in found:
+            status = UNCHANGED
+        else:
+            status = NOT_FOUND
+        results.append(bulk_result(item, id_field, status))
+
+    return results
+
+
+def bulk_result(item: BulkItem, id_field: str, status: str) -> Dict[str, Any]:
+    return {id_field: item.id, "action": item.action, "status": status}
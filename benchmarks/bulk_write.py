@@ -0,0 +1,176 @@
+"""
+Лайки и подписки: по одному запросу на элемент (каждый со своей
+транзакцией) против пакетных эндпоинтов с многострочным INSERT ...
+ON CONFLICT в одной транзакции.
+
+Запуск (нужна БД, настроенная через .env):
+
+    python -m benchmarks.bulk_write --items 2000 --batch 500
+
+Запросы идут через тестовый клиент Flask, поэтому в замер входит
+обработка запроса приложением, но не сеть. Тестовые данные
+коммитятся и удаляются в конце.
+"""
+
+import argparse
+import time
+
+from sqlalchemy import delete, event, insert
+
+from app.changes import TweetChange
+from app.models import ChangeCounter, Tweet, User, db
+from app.routers import app
+from app.versions import user_version
+
+API_KEY = "bench_bulk_key"
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, many):
+        self.statements += 1
+
+
+def seed(items):
+    user_id = db.session.scalar(
+        insert(User)
+        .values(name="bench_bulk", api_key=API_KEY)
+        .returning(User.id)
+    )
+    target_ids = db.session.scalars(
+        insert(User).returning(User.id),
+        [
+            {"name": f"bench_bulk_{i}", "api_key": f"bench_bulk_key_{i}"}
+            for i in range(items)
+        ],
+    ).all()
+    tweet_ids = db.session.scalars(
+        insert(Tweet).returning(Tweet.id),
+        [
+            {"tweet_data": f"Твит {i}", "user_id": target_ids[0]}
+            for i in range(items)
+        ],
+    ).all()
+    db.session.commit()
+
+    return user_id, target_ids, tweet_ids
+
+
+def cleanup(user_id, target_ids, tweet_ids):
+    db.session.rollback()
+    db.session.execute(
+        delete(TweetChange).where(TweetChange.tweet_id.in_(tweet_ids))
+    )
+    db.session.execute(
+        delete(ChangeCounter).where(
+            ChangeCounter.name.in_(
+                [user_version(i) for i in [user_id, *target_ids]]
+            )
+        )
+    )
+    db.session.execute(delete(User).where(User.id.in_([user_id, *target_ids])))
+    db.session.commit()
+
+
+def per_item(client, path, ids):
+    headers = {"API_KEY": API_KEY}
+    for item_id in ids:
+        client.post(path.format(item_id), headers=headers)
+    for item_id in ids:
+        client.delete(path.format(item_id), headers=headers)
+
+
+def batched(client, path, id_field, actions, ids, batch):
+    headers = {"API_KEY": API_KEY}
+    for action in actions:
+        for start in range(0, len(ids), batch):
+            end = start + batch
+            response = client.post(
+                path,
+                json={
+                    "items": [
+                        {id_field: item_id, "action": action}
+                        for item_id in ids[start:end]
+                    ]
+                },
+                headers=headers,
+            )
+            assert response.status_code == 200, response.get_json()
+
+
+def measure(name, func, items):
+    counter = QueryCounter()
+    event.listen(db.engine, "after_cursor_execute", counter)
+    try:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(db.engine, "after_cursor_execute", counter)
+
+    print(
+        f"{name:<16} "
+        f"{elapsed * 1000:>10.0f} "
+        f"{items / elapsed:>12.0f} "
+        f"{counter.statements / items:>14.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        user_id, target_ids, tweet_ids = seed(args.items)
+        operations = args.items * 2
+
+        try:
+            print(
+                f"{'path':<16} {'ms':>10} {'ops/s':>12} {'statements/op':>14}"
+            )
+            measure(
+                "likes single",
+                lambda: per_item(client, "/api/tweets/{}/likes", tweet_ids),
+                operations,
+            )
+            measure(
+                "likes batch",
+                lambda: batched(
+                    client,
+                    "/api/tweets/likes/batch",
+                    "tweet_id",
+                    ("like", "unlike"),
+                    tweet_ids,
+                    args.batch,
+                ),
+                operations,
+            )
+            measure(
+                "follows single",
+                lambda: per_item(client, "/api/users/{}/follow", target_ids),
+                operations,
+            )
+            measure(
+                "follows batch",
+                lambda: batched(
+                    client,
+                    "/api/users/follow/batch",
+                    "user_id",
+                    ("follow", "unfollow"),
+                    target_ids,
+                    args.batch,
+                ),
+                operations,
+            )
+        finally:
+            cleanup(user_id, target_ids, tweet_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Скорость кодирования ответа ленты из 1000 твитов: стандартный
+json-провайдер Flask против доступных бэкендов app.serializers
+и сборки тела из готовых фрагментов.
+
+Запуск (БД не нужна):
+
+    python -m benchmarks.feed_encode --tweets 1000 --repeat 200
+"""
+
+import argparse
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.serializers import JSON_BACKENDS, select_backend
+
+
+def make_feed(tweets, likes):
+    return [
+        {
+            "id": tweet_id,
+            "content": f"Твит №{tweet_id}: " + "текст " * 20,
+            "attachments": [f"/app/static/media/{tweet_id}.jpg"],
+            "author": {"id": tweet_id % 100, "name": f"Автор {tweet_id}"},
+            "like_count": likes,
+            "likes": [
+                {"user_id": user_id, "name": f"Пользователь {user_id}"}
+                for user_id in range(likes)
+            ],
+        }
+        for tweet_id in range(tweets, 0, -1)
+    ]
+
+
+def measure(name, encode, repeat):
+    body = encode()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode()
+    elapsed = time.perf_counter() - started
+
+    per_call = elapsed / repeat
+    print(
+        f"{name:<18} "
+        f"{per_call * 1000:>10.3f} "
+        f"{repeat / elapsed:>10.0f} "
+        f"{len(body) * repeat / elapsed / 1024 / 1024:>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tweets", type=int, default=1000)
+    parser.add_argument("--likes", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    feed = make_feed(args.tweets, args.likes)
+    payload = {"result": True, "tweets": feed, "next_cursor": None}
+
+    print(f"{'encoder':<18} {'ms/feed':>10} {'feeds/s':>10} {'MB/s':>10}")
+
+    stdlib = DefaultJSONProvider(Flask(__name__))
+    measure(
+        "flask-default",
+        lambda: stdlib.dumps(payload).encode(),
+        args.repeat,
+    )
+
+    for name in JSON_BACKENDS:
+        try:
+            _, dumps, _ = select_backend(name)
+        except ImportError:
+            print(f"{name:<18} {'не установлен':>10}")
+            continue
+
+        measure(name, lambda: dumps(payload), args.repeat)
+
+        fragments = [dumps(item) for item in feed]
+        measure(
+            f"{name}-fragments",
+            lambda: b"".join(
+                (
+                    b'{"result": true, "tweets": [',
+                    b",".join(fragments),
+                    b'], "next_cursor": null}',
+                )
+            ),
+            args.repeat,
+        )
+
+
+if __name__ == "__main__":
+    main()
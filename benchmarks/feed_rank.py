@@ -0,0 +1,103 @@
+"""
+Ранжирование ленты в режиме top: векторная оценка app.ranking
+(NumPy + argpartition) против поштучного расчёта на Python
+с полной сортировкой.
+
+Запуск (БД не нужна):
+
+    python -m benchmarks.feed_rank --candidates 100000 --k 50
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from app.ranking import (
+    FOLLOW_WEIGHT,
+    LIKE_WEIGHT,
+    LIKED_AUTHOR_WEIGHT,
+    author_affinity,
+    score,
+    top_k,
+)
+
+
+def make_candidates(count, authors, seed):
+    rng = np.random.default_rng(seed)
+    tweet_ids = np.arange(count, 0, -1, dtype=np.int64)
+    author_ids = rng.integers(1, authors + 1, size=count)
+    like_counts = rng.zipf(2.0, size=count).astype(np.float64) - 1
+    ages_hours = rng.uniform(0, 72, size=count)
+
+    followed = rng.choice(authors, size=authors // 10, replace=False) + 1
+    liked = {
+        int(author_id): int(rng.integers(1, 20))
+        for author_id in rng.choice(authors, size=authors // 5) + 1
+    }
+
+    return tweet_ids, author_ids, like_counts, ages_hours, followed, liked
+
+
+def rank_python(tweet_ids, author_ids, like_counts, ages, followed, liked, k):
+    followed = set(followed.tolist())
+    scored = []
+    for tweet_id, author_id, likes, age in zip(
+        tweet_ids.tolist(),
+        author_ids.tolist(),
+        like_counts.tolist(),
+        ages.tolist(),
+    ):
+        affinity = FOLLOW_WEIGHT * (author_id in followed)
+        if author_id in liked:
+            affinity += LIKED_AUTHOR_WEIGHT * math.log1p(liked[author_id])
+        value = (1.0 + LIKE_WEIGHT * math.log1p(likes) + affinity) * 2 ** (
+            -age / 24
+        )
+        scored.append((value, tweet_id))
+
+    scored.sort(reverse=True)
+    return [tweet_id for _, tweet_id in scored[:k]]
+
+
+def rank_numpy(tweet_ids, author_ids, like_counts, ages, followed, liked, k):
+    affinity = author_affinity(author_ids, followed, liked)
+    scores = score(like_counts, ages, affinity, 24)
+    return tweet_ids[top_k(scores, tweet_ids, k)].tolist()
+
+
+def measure(name, rank, data, k, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = rank(*data, k)
+    elapsed = (time.perf_counter() - started) / repeat
+
+    print(
+        f"{name:<8} "
+        f"{elapsed * 1000:>10.2f} "
+        f"{len(data[0]) / elapsed / 1_000_000:>14.2f}"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=100_000)
+    parser.add_argument("--authors", type=int, default=5_000)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    data = make_candidates(args.candidates, args.authors, args.seed)
+
+    print(f"{'path':<8} {'ms/rank':>10} {'M cand/s':>14}")
+    expected = measure("python", rank_python, data, args.k, args.repeat)
+    actual = measure("numpy", rank_numpy, data, args.k, args.repeat)
+
+    assert actual == expected, "Результаты ранжирования различаются"
+
+
+if __name__ == "__main__":
+    main()
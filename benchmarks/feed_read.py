@@ -0,0 +1,192 @@
+"""
+Сравнение пути чтения ленты: прежний ORM-запрос с тремя joinedload
+(все лайки каждого твита) против колоночных запросов app.queries
+(счётчик лайков и короткое превью лайкнувших).
+
+Запуск (нужна БД, настроенная через .env):
+
+    python -m benchmarks.feed_read --tweets 2000 --likes 30 --medias 2
+
+Тестовые данные создаются внутри транзакции и откатываются в конце.
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import joinedload
+
+from app.models import Like, Media, Tweet, User, db, tweet_media
+from app.pagination import Page, apply_keyset
+from app.queries import build_feed, tweet_rows_query
+from app.routers import app
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, many):
+        self.statements += 1
+        if cursor.rowcount > 0:
+            self.rows += cursor.rowcount
+
+
+def legacy_feed(page):
+    query = db.session.query(Tweet).options(
+        joinedload(Tweet.medias),
+        joinedload(Tweet.users),
+        joinedload(Tweet.likes).joinedload(Like.users),
+    )
+    tweets = apply_keyset(query, Tweet.id, page).all()[: page.limit]
+
+    return [
+        {
+            "id": tweet.id,
+            "content": tweet.tweet_data,
+            "attachments": [media.file_path for media in tweet.medias],
+            "author": {"id": tweet.users.id, "name": tweet.users.name},
+            "like_count": len(tweet.likes),
+            "likes": [
+                {"user_id": like.user_id, "name": like.users.name}
+                for like in tweet.likes
+            ],
+        }
+        for tweet in tweets
+    ]
+
+
+def lean_feed(page):
+    rows = db.session.execute(
+        apply_keyset(tweet_rows_query(), Tweet.id, page)
+    ).all()
+    return build_feed(rows[: page.limit])
+
+
+def seed(tweets, likes, medias, users):
+    user_ids = db.session.scalars(
+        insert(User).returning(User.id),
+        [
+            {"name": f"bench_{i}", "api_key": f"bench_key_{i}"}
+            for i in range(users)
+        ],
+    ).all()
+    tweet_ids = db.session.scalars(
+        insert(Tweet).returning(Tweet.id),
+        [
+            {"tweet_data": f"Твит {i}", "user_id": random.choice(user_ids)}
+            for i in range(tweets)
+        ],
+    ).all()
+    media_ids = db.session.scalars(
+        insert(Media).returning(Media.id),
+        [
+            {"file_name": f"bench_{i}.jpg", "file_path": f"bench_{i}.jpg"}
+            for i in range(tweets * medias)
+        ],
+    ).all()
+
+    if media_ids:
+        db.session.execute(
+            insert(tweet_media),
+            [
+                {"tweet_id": tweet_id, "media_id": media_ids[i * medias + j]}
+                for i, tweet_id in enumerate(tweet_ids)
+                for j in range(medias)
+            ],
+        )
+
+    like_rows = [
+        {"tweet_id": tweet_id, "user_id": user_id}
+        for tweet_id in tweet_ids
+        for user_id in random.sample(user_ids, likes)
+    ]
+    if like_rows:
+        db.session.execute(insert(Like), like_rows)
+        db.session.execute(
+            update(Tweet)
+            .where(Tweet.id.in_(tweet_ids))
+            .values(like_count=likes)
+        )
+
+
+def normalize(feed):
+    return [
+        {
+            **item,
+            "attachments": sorted(item["attachments"]),
+            "likes": None,
+        }
+        for item in feed
+    ]
+
+
+def measure(name, read_page, page, repeat):
+    counter = QueryCounter()
+    engine = db.engine
+    event.listen(engine, "after_cursor_execute", counter)
+
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            feed = read_page(page)
+            db.session.expire_all()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "after_cursor_execute", counter)
+
+    per_page = elapsed / repeat
+    print(
+        f"{name:<8} "
+        f"{counter.statements / repeat:>10.0f} "
+        f"{counter.rows / repeat:>12.0f} "
+        f"{per_page * 1000:>10.2f} "
+        f"{per_page / max(len(feed), 1) * 1_000_000:>12.1f}"
+    )
+    return feed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tweets", type=int, default=2000)
+    parser.add_argument("--likes", type=int, default=30)
+    parser.add_argument("--medias", type=int, default=2)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        try:
+            seed(
+                args.tweets,
+                min(args.likes, args.users),
+                args.medias,
+                args.users,
+            )
+            db.session.flush()
+
+            head = db.session.scalar(
+                select(Tweet.id).order_by(Tweet.id.desc())
+            )
+            page = Page(limit=args.limit, before_id=head + 1)
+
+            print(
+                f"{'path':<8} {'statements':>10} {'rows':>12} "
+                f"{'ms/page':>10} {'us/tweet':>12}"
+            )
+            legacy = measure("legacy", legacy_feed, page, args.repeat)
+            lean = measure("lean", lean_feed, page, args.repeat)
+
+            assert normalize(legacy) == normalize(
+                lean
+            ), "Результаты путей чтения различаются"
+        finally:
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    main()
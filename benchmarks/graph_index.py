@@ -0,0 +1,106 @@
+"""
+Граф подписок в памяти: размер и скорость app.graph (CSR на NumPy)
+против словаря множеств на Python.
+
+Запуск (БД не нужна):
+
+    python -m benchmarks.graph_index --edges 1000000 --users 100000
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.graph import GraphIndex, build_csr
+
+
+def make_edges(count, users, seed):
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(1, users + 1, size=count)
+    targets = (rng.zipf(1.5, size=count) + sources) % users + 1
+    keys = np.unique((sources << 32) | targets)
+    return keys >> 32, keys & 0xFFFFFFFF
+
+
+def dict_of_sets(sources, targets):
+    graph = {}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        graph.setdefault(source, set()).add(target)
+    return graph
+
+
+def dict_bytes(graph):
+    size = sys.getsizeof(graph)
+    for source, targets in graph.items():
+        size += sys.getsizeof(source) + sys.getsizeof(targets)
+        size += sum(sys.getsizeof(target) for target in targets)
+    return size
+
+
+def make_index(sources, targets):
+    graph = GraphIndex()
+    graph._reset(build_csr(sources, targets.astype(np.int32)))
+    graph._loaded_at = float("inf")
+    return graph
+
+
+def measure(name, func, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{name:<28} {elapsed * 1000:>10.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--delta", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sources, targets = make_edges(args.edges, args.users, args.seed)
+    edges = len(sources)
+
+    index = measure("build csr", lambda: make_index(sources, targets))
+    python = measure(
+        "build dict of sets", lambda: dict_of_sets(sources, targets)
+    )
+
+    rng = np.random.default_rng(args.seed + 1)
+    pairs = rng.integers(1, args.users + 1, size=(args.lookups, 2)).tolist()
+    found = measure(
+        "follows csr",
+        lambda: sum(index.follows(a, b) for a, b in pairs),
+    )
+    expected = measure(
+        "follows dict of sets",
+        lambda: sum(b in python.get(a, ()) for a, b in pairs),
+    )
+    assert found == expected, "Результаты проверки подписок различаются"
+
+    for source, target in rng.integers(
+        1, args.users + 1, size=(args.delta, 2)
+    ).tolist():
+        index.apply(source, target, True, delta_limit=args.delta + 1)
+    measure(f"compact {args.delta} changes", index.compact)
+
+    per_million = 1_000_000 / edges
+    print(f"\nрёбер: {edges}")
+    print(
+        f"csr (оба направления): "
+        f"{index.stats()['bytes'] * per_million / 2**20:.1f} МБ на 1М рёбер"
+    )
+    print(
+        f"dict of sets (одно направление): "
+        f"{dict_bytes(python) * per_million / 2**20:.1f} МБ на 1М рёбер"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Лайки одного «горячего» твита из нескольких потоков: запись каждого
+лайка своей транзакцией против буфера отложенной записи
+(LIKE_WRITE_BEHIND).
+
+Запуск (нужна БД, настроенная через .env):
+
+    python -m benchmarks.hot_likes --users 2000 --threads 16
+
+Запросы идут через тестовый клиент Flask. Тестовые данные коммитятся
+и удаляются в конце.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from app.buffer import like_buffer
+from app.changes import TweetChange
+from app.models import Tweet, User, db
+from app.routers import app
+
+
+def seed(users):
+    user_ids = db.session.scalars(
+        insert(User).returning(User.id),
+        [
+            {"name": f"bench_hot_{i}", "api_key": f"bench_hot_key_{i}"}
+            for i in range(users)
+        ],
+    ).all()
+    tweet_id = db.session.scalar(
+        insert(Tweet)
+        .values(tweet_data="Горячий твит", user_id=user_ids[0])
+        .returning(Tweet.id)
+    )
+    db.session.commit()
+
+    return user_ids, tweet_id
+
+
+def cleanup(user_ids, tweet_id):
+    db.session.rollback()
+    db.session.execute(
+        delete(TweetChange).where(TweetChange.tweet_id == tweet_id)
+    )
+    db.session.execute(delete(User).where(User.id.in_(user_ids)))
+    db.session.commit()
+
+
+def like(client, tweet_id, index, method):
+    started = time.perf_counter()
+    response = getattr(client, method)(
+        f"/api/tweets/{tweet_id}/likes",
+        headers={"API_KEY": f"bench_hot_key_{index}"},
+    )
+    assert response.status_code < 300, (
+        response.status_code,
+        response.data[:300],
+    )
+    return time.perf_counter() - started
+
+
+def measure(name, client, tweet_id, users, threads):
+    latencies = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for method in ("post", "delete"):
+            latencies.extend(
+                executor.map(
+                    lambda index: like(client, tweet_id, index, method),
+                    range(users),
+                )
+            )
+    like_buffer.flush()
+    elapsed = time.perf_counter() - started
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(
+        f"{name:<14} "
+        f"{len(latencies) / elapsed:>10.0f} "
+        f"{p50:>10.2f} "
+        f"{p99:>10.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--interval-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    app.config["LIKE_FLUSH_INTERVAL_MS"] = args.interval_ms
+    client = app.test_client()
+    with app.app_context():
+        db.create_all()
+        user_ids, tweet_id = seed(args.users)
+
+        try:
+            print(f"{'mode':<14} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+            for name, write_behind in (
+                ("per request", False),
+                ("write-behind", True),
+            ):
+                app.config["LIKE_WRITE_BEHIND"] = write_behind
+                measure(name, client, tweet_id, args.users, args.threads)
+
+            like_buffer.close()
+            like_count = db.session.scalar(
+                select(Tweet.like_count).where(Tweet.id == tweet_id)
+            )
+            assert like_count == 0, like_count
+        finally:
+            cleanup(user_ids, tweet_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import os
 import pytest
 from dotenv import load_dotenv
+from sqlalchemy import event
 from app.__main__ import app as my_app
+from app.buffer import like_buffer
+from app.cache import clear_caches
+from app.graph import graph_index
 from app.models import db as _db, User
 
 load_dotenv()
@@ -20,9 +24,14 @@ DATABASE_URL = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password'
 def app():
     _app = my_app
     _app.config["TESTING"] = True
+    _app.config["TASKS_ALWAYS_EAGER"] = True
     _app.config[
         "SQLALCHEMY_DATABASE_URI"] = f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
 
+    clear_caches()
+    graph_index.clear()
+    like_buffer.clear()
+
     with _app.app_context():
         _db.create_all()
 
@@ -47,6 +56,7 @@ def app():
         _db.session.commit()
 
         yield _app
+        like_buffer.clear()
         _db.session.close()
         _db.drop_all()
 
@@ -61,3 +71,27 @@ def client(app):
 def db(app):
     with app.app_context():
         yield _db
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def reset(self):
+        self.statements.clear()
+
+
+@pytest.fixture
+def query_counter(db):
+    """Счётчик SQL-запросов, выполненных за время теста"""
+    counter = QueryCounter()
+    event.listen(db.engine, 'after_cursor_execute', counter)
+    yield counter
+    event.remove(db.engine, 'after_cursor_execute', counter)
@@ -0,0 +1,135 @@
+import pytest
+from sqlalchemy import event
+
+from app.auth import AuthUser, api_key_cache, resolve_user
+from app.models import RevokedToken, Tweet, User
+from app.tokens import TokenError, decode_token, issue_token
+
+
+def count_user_queries(db, func):
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, many):
+        if 'WHERE users.api_key' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'after_cursor_execute', listener)
+    try:
+        func()
+    finally:
+        event.remove(db.engine, 'after_cursor_execute', listener)
+
+    return len(statements)
+
+
+def test_resolve_user_cached(client, db):
+    """Тест: повторная проверка ключа не обращается к базе"""
+    user = User.query.filter_by(api_key='test').first()
+
+    assert resolve_user('test') == AuthUser(user.id, 'test')
+    assert count_user_queries(db, lambda: resolve_user('test')) == 0
+    assert api_key_cache.stats()['hits'] == 1
+
+
+def test_resolve_user_negative_cache(client, db):
+    """Тест: неизвестный ключ кэшируется и сбрасывается при создании пользователя"""
+    assert resolve_user('new_key') is None
+    assert count_user_queries(db, lambda: resolve_user('new_key')) == 0
+
+    new_user = User(name='new', api_key='new_key')
+    db.session.add(new_user)
+    db.session.commit()
+
+    assert resolve_user('new_key') == AuthUser(new_user.id, 'new')
+
+
+def test_resolve_user_invalidated_on_delete(client, db):
+    """Тест: удаление пользователя сбрасывает кэш ключа"""
+    user = User(name='temp', api_key='temp_key')
+    db.session.add(user)
+    db.session.commit()
+    assert resolve_user('temp_key') is not None
+
+    db.session.delete(user)
+    db.session.commit()
+
+    assert resolve_user('temp_key') is None
+    response = client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers={'API_KEY': 'temp_key'})
+    assert response.status_code == 401
+
+
+def test_handlers_share_cached_user(client, db):
+    """Тест: обработчики не запрашивают пользователя повторно"""
+    client.post('/api/tweets', json={'tweet_data': 'Первый'}, headers={'API_KEY': 'test'})
+
+    queries = count_user_queries(
+        db,
+        lambda: client.post('/api/tweets', json={'tweet_data': 'Второй'}, headers={'API_KEY': 'test'}),
+    )
+
+    assert queries == 0
+
+
+def test_token_auth(app, client, db, monkeypatch):
+    """Тест: подписанный токен авторизует запросы без обращения к users"""
+    monkeypatch.setitem(app.config, 'TOKEN_SECRET', 'secret')
+    user = User.query.filter_by(api_key='test').first()
+
+    response = client.post('/api/tokens', headers={'API_KEY': 'test'})
+    assert response.status_code == 201
+    token = response.get_json()['token']
+
+    headers = {'Authorization': f'Bearer {token}'}
+    responses = []
+    queries = count_user_queries(
+        db,
+        lambda: responses.append(client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers=headers)),
+    )
+
+    assert queries == 0
+    assert responses[0].status_code == 201
+    tweet = db.session.get(Tweet, responses[0].get_json()['tweet_id'])
+    assert tweet.user_id == user.id
+
+
+def test_token_revoke(app, client, db, monkeypatch):
+    """Тест: отозванный токен больше не принимается"""
+    monkeypatch.setitem(app.config, 'TOKEN_SECRET', 'secret')
+    token = client.post('/api/tokens', headers={'API_KEY': 'test'}).get_json()['token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.delete('/api/tokens', headers=headers)
+    assert response.status_code == 200
+    assert db.session.get(RevokedToken, decode_token('secret', token)['jti']) is not None
+
+    response = client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers=headers)
+    assert response.status_code == 401
+    assert client.delete('/api/tokens', headers=headers).status_code == 401
+
+
+def test_token_rejected(app, client, monkeypatch):
+    """Тест: поддельный и просроченный токены отклоняются"""
+    monkeypatch.setitem(app.config, 'TOKEN_SECRET', 'secret')
+
+    forged = issue_token('other', 1, 'test', ttl=60)
+    expired = issue_token('secret', 1, 'test', ttl=-1)
+
+    for token in (forged, expired, 'garbage', 'abc.é'):
+        response = client.post(
+            '/api/tweets', json={'tweet_data': 'Твит'}, headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == 401
+
+    with pytest.raises(TokenError):
+        decode_token('secret', expired)
+    with pytest.raises(TokenError):
+        decode_token('secret', 'abc.подпись')
+
+
+def test_token_disabled_without_secret(app, client, monkeypatch):
+    """Тест: без TOKEN_SECRET токены не выдаются"""
+    monkeypatch.setitem(app.config, 'TOKEN_SECRET', '')
+
+    response = client.post('/api/tokens', headers={'API_KEY': 'test'})
+
+    assert response.status_code == 400
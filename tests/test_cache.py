@@ -0,0 +1,144 @@
+from app import cache
+from app.cache import FeedCache, LRUCache
+from app.models import Like, Tweet, User
+from app.versions import bump_feed_version
+
+
+def test_lru_cache_evicts_by_entries():
+    """Тест: вытеснение самой старой записи при превышении числа записей"""
+    lru = LRUCache('test_entries', max_entries=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.get('a')
+    lru.set('c', 3)
+
+    assert lru.get('b') is None
+    assert lru.get('a') == 1
+    assert lru.get('c') == 3
+    assert lru.stats()['evictions'] == 1
+
+
+def test_lru_cache_evicts_by_bytes():
+    """Тест: вытеснение записей при превышении лимита по байтам"""
+    lru = LRUCache('test_bytes', max_entries=10, max_bytes=10)
+    lru.set('a', b'12345', size=5)
+    lru.set('b', b'12345', size=5)
+    lru.set('c', b'123', size=3)
+
+    assert lru.get('a') is None
+    assert lru.stats()['bytes'] == 8
+
+    lru.set('huge', b'x' * 11, size=11)
+    assert lru.get('huge') is None
+
+
+def test_lru_cache_ttl(monkeypatch):
+    """Тест: запись истекает по TTL"""
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+
+    lru = LRUCache('test_ttl', max_entries=10, ttl=5)
+    lru.set('a', 1)
+    assert lru.get('a') == 1
+
+    now[0] += 6
+    assert lru.get('a') is None
+    assert lru.stats()['expirations'] == 1
+
+
+def test_feed_cache_precise_invalidation():
+    """Тест: сбрасываются только страницы, покрывающие изменённый твит"""
+    feed = FeedCache('test_feed', max_entries=10)
+    feed.set_page('head', b'head', 8, float('inf'))
+    feed.set_page('older', b'older', 3, 7)
+
+    feed.invalidate_tweet(5)
+    assert feed.get('older') is None
+    assert feed.get('head') is not None
+
+    feed.set_page('older', b'older', 3, 7)
+    feed.invalidate_new_tweet()
+    assert feed.get('head') is None
+    assert feed.get('older') is not None
+
+
+def test_feed_cache_hit_and_like_invalidation(client, db):
+    """Тест: повторный запрос ленты берётся из кэша, лайк сбрасывает кэш"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Кэшируемый твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+
+    client.get('/api/tweets')
+    response = client.get('/api/tweets')
+    assert response.get_json()['tweets'][0]['likes'] == []
+
+    stats = client.get('/api/cache/stats').get_json()['caches']['feed']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+    client.post(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': 'test_two'})
+
+    response = client.get('/api/tweets')
+    assert len(response.get_json()['tweets'][0]['likes']) == 1
+
+    like = Like.query.filter_by(tweet_id=tweet.id).first()
+    client.delete(f'/api/tweets/{like.id}/likes', headers={'API_KEY': 'test_two'})
+
+    response = client.get('/api/tweets')
+    assert response.get_json()['tweets'][0]['likes'] == []
+
+
+def test_feed_cache_miss_on_stale_etag(client, db):
+    """Тест: страница с устаревшим ETag (запись из другого процесса) не отдаётся из кэша"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Кэшируемый твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+    etag = client.get('/api/tweets').headers['ETag']
+
+    tweet.like_count = 5
+    tweet.version += 1
+    db.session.commit()
+    bump_feed_version()
+    db.session.commit()
+
+    response = client.get('/api/tweets')
+    assert response.get_json()['tweets'][0]['like_count'] == 5
+    assert response.headers['ETag'] != etag
+
+
+def test_feed_cache_new_tweet_invalidation(client, db):
+    """Тест: новый твит сбрасывает первую страницу ленты"""
+    assert client.get('/api/tweets').get_json()['tweets'] == []
+
+    client.post('/api/tweets', json={'tweet_data': 'Новый твит'}, headers={'API_KEY': 'test'})
+
+    assert len(client.get('/api/tweets').get_json()['tweets']) == 1
+
+
+def test_fragment_cache_reuses_unchanged_tweets(client, db):
+    """Тест: неизменившиеся твиты берутся из кэша фрагментов"""
+    user = User.query.filter_by(api_key='test').first()
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(2)]
+    db.session.add_all(tweets)
+    db.session.commit()
+
+    client.get('/api/tweets?limit=2')
+    client.get('/api/tweets?limit=3')
+
+    stats = client.get('/api/cache/stats').get_json()['caches']['tweet_fragments']
+    assert stats['entries'] == 2
+    assert stats['hits'] == 2
+
+    client.post(f'/api/tweets/{tweets[0].id}/likes', headers={'API_KEY': 'test_two'})
+    db.session.refresh(tweets[0])
+    assert tweets[0].version == 2
+
+    response = client.get('/api/tweets?limit=4')
+    feed = {tweet['id']: tweet for tweet in response.get_json()['tweets']}
+    assert feed[tweets[0].id]['like_count'] == 1
+    assert feed[tweets[1].id]['like_count'] == 0
+
+    stats = client.get('/api/cache/stats').get_json()['caches']['tweet_fragments']
+    assert stats['hits'] == 3
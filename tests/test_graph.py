@@ -0,0 +1,126 @@
+import numpy as np
+
+from app.graph import GraphIndex, build_csr, graph_index
+from app.models import Subscribe, User
+
+
+def make_graph(edges):
+    graph = GraphIndex()
+    sources, targets = np.array(edges, dtype=np.int64).T
+    graph._reset(build_csr(sources, targets.astype(np.int32)))
+    graph._loaded_at = float('inf')
+    return graph
+
+
+def test_csr_neighbors():
+    """Тест: соседи в CSR отсортированы, неизвестные вершины пусты"""
+    csr = build_csr(np.array([3, 1, 1, 3]), np.array([2, 5, 2, 1]))
+
+    assert csr.neighbors(1).tolist() == [2, 5]
+    assert csr.neighbors(3).tolist() == [1, 2]
+    assert csr.neighbors(2).tolist() == []
+    assert csr.neighbors(100).tolist() == []
+    assert csr.contains(1, 5) and not csr.contains(1, 3)
+
+
+def test_graph_delta_and_compaction():
+    """Тест: буфер изменений виден сразу и вливается в CSR без потерь"""
+    graph = make_graph([(1, 2), (1, 3), (2, 1)])
+
+    graph.apply(1, 4, True, delta_limit=100)
+    graph.apply(1, 2, False, delta_limit=100)
+    graph.apply(5, 1, True, delta_limit=100)
+    graph.apply(5, 1, False, delta_limit=100)
+    graph.apply(5, 1, True, delta_limit=100)
+
+    expected_following = [3, 4]
+    expected_followers = [2, 5]
+    assert graph.following(1).tolist() == expected_following
+    assert graph.followers(1).tolist() == expected_followers
+    assert not graph.follows(1, 2) and graph.follows(5, 1)
+    assert graph.stats()['delta'] == 5
+
+    graph.compact()
+
+    assert graph.stats()['delta'] == 0
+    assert graph.stats()['edges'] == 4
+    assert graph.following(1).tolist() == expected_following
+    assert graph.followers(1).tolist() == expected_followers
+    assert graph.followers(4).tolist() == [1]
+
+
+def test_graph_compacts_at_limit():
+    """Тест: буфер вливается в CSR при достижении лимита"""
+    graph = make_graph([(1, 2)])
+
+    graph.apply(2, 1, True, delta_limit=2)
+    assert graph.stats()['delta'] == 1
+    graph.apply(3, 1, True, delta_limit=2)
+
+    assert graph.stats() == {'nodes': 4, 'edges': 3, 'delta': 0, 'bytes': 96}
+
+
+def test_graph_refresh_keeps_concurrent_changes(monkeypatch):
+    """Тест: подписки во время перечитывания графа не теряются"""
+    graph = make_graph([(1, 2)])
+    graph._loaded_at = 0.0
+    reads = []
+
+    def read_edges():
+        reads.append(1)
+        graph.apply(3, 1, True, delta_limit=100)
+        graph.apply(1, 2, False, delta_limit=100)
+        graph.ensure_fresh(0)
+        return np.array([(1, 2)], dtype=np.int64)
+
+    monkeypatch.setattr(graph, '_read_edges', read_edges)
+    graph.ensure_fresh(0)
+
+    assert len(reads) == 1
+    assert graph.follows(3, 1) and not graph.follows(1, 2)
+    assert graph.followers(1).tolist() == [3]
+    assert graph.stats()['delta'] == 2
+
+
+def test_relationship_endpoint(client, db, query_counter):
+    """Тест: связь пользователей отдаётся из графа в памяти"""
+    user_main = User.query.filter_by(api_key='test').first()
+    users = [User(name=f'user_{i}', api_key=f'key_{i}') for i in range(3)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all([
+        Subscribe(subscriber_id=users[0].id, target_id=user_main.id),
+        Subscribe(subscriber_id=users[0].id, target_id=users[2].id),
+    ])
+    db.session.commit()
+
+    url = f'/api/users/{users[0].id}/relationship'
+    json_data = client.get(url, headers={'API_KEY': 'test'}).get_json()
+    assert json_data == {
+        'result': True,
+        'following': False,
+        'followed_by': True,
+        'mutual': False,
+        'common_following_count': 0,
+    }
+
+    client.post(f'/api/users/{users[0].id}/follow', headers={'API_KEY': 'test'})
+    client.post(f'/api/users/{users[2].id}/follow', headers={'API_KEY': 'test'})
+    assert graph_index.stats()['delta'] == 2
+
+    query_counter.reset()
+    json_data = client.get(url, headers={'API_KEY': 'test'}).get_json()
+    assert query_counter.count == 0
+    assert json_data['mutual'] is True
+    assert json_data['common_following_count'] == 1
+
+    client.delete(f'/api/users/{users[0].id}/follow', headers={'API_KEY': 'test'})
+    json_data = client.get(url, headers={'API_KEY': 'test'}).get_json()
+    assert json_data['following'] is False
+
+
+def test_relationship_unauthorized(client):
+    """Тест: связь без API ключа недоступна"""
+    response = client.get('/api/users/1/relationship')
+
+    assert response.status_code == 401
@@ -1,3 +1,5 @@
+from app import buffer
+from app.buffer import like_buffer
 from app.models import Tweet, User, Like
 
 
@@ -92,7 +94,7 @@ def test_create_like_invalid_api_key(client, db):
 
 
 def test_create_like_duplicate(client, db):
-    """Тест: попытка поставить второй лайк на тот же твит"""
+    """Тест: повторный лайк на тот же твит ничего не меняет"""
     user = User.query.filter_by(api_key='test').first()
     user_liker = User.query.filter_by(api_key='test_two').first()
 
@@ -110,10 +112,13 @@ def test_create_like_duplicate(client, db):
 
     response = client.post(f'/api/tweets/{tweet.id}/likes', headers=headers)
 
-    assert response.status_code == 500
+    assert response.status_code == 200
     json_data = response.get_json()
-    assert json_data['result'] is False
-    assert 'error_type' in json_data
+    assert json_data['result'] is True
+    assert Like.query.filter_by(tweet_id=tweet.id, user_id=user_liker.id).count() == 1
+
+    db.session.refresh(tweet)
+    assert tweet.like_count == 0
 
 
 def test_create_like_after_delete(client, db):
@@ -131,7 +136,7 @@ def test_create_like_after_delete(client, db):
     like_id = like.id
 
     delete_headers = {'API_KEY': 'test_two'}
-    client.delete(f'/api/tweets/{like_id}/likes', headers=delete_headers)
+    client.delete(f'/api/tweets/{tweet.id}/likes', headers=delete_headers)
 
     create_headers = {'API_KEY': 'test_two'}
     response = client.post(f'/api/tweets/{tweet.id}/likes', headers=create_headers)
@@ -162,16 +167,18 @@ def test_delete_like_success(client, db):
         'API_KEY': 'test_two'
     }
 
-    response = client.delete(f'/api/tweets/{like.id}/likes', headers=headers)
+    like_id = like.id
+
+    response = client.delete(f'/api/tweets/{tweet.id}/likes', headers=headers)
 
     assert response.status_code == 200
 
-    deleted_like = db.session.get(Like, like.id)
+    deleted_like = db.session.get(Like, like_id)
     assert deleted_like is None
 
 
 def test_delete_like_not_found(client):
-    """Тест: попытка удалить несуществующий лайк"""
+    """Тест: попытка снять лайк с несуществующего твита"""
     headers = {
         'API_KEY': 'test'
     }
@@ -180,7 +187,7 @@ def test_delete_like_not_found(client):
 
     assert response.status_code == 404
     json_data = response.get_json()
-    assert json_data['errors'] == 'Такого лайка не существует'
+    assert json_data['errors'] == 'Такого твита не существует'
 
 
 def test_delete_like_no_api_key(client, db):
@@ -192,31 +199,31 @@ def test_delete_like_no_api_key(client, db):
     db.session.add_all([tweet, like])
     db.session.commit()
 
-    response = client.delete(f'/api/tweets/{like.id}/likes')
+    response = client.delete(f'/api/tweets/{tweet.id}/likes')
 
     assert response.status_code == 401
 
 
-def test_delete_like_forbidden(client, db):
-    """Тест: попытка удалить чужой лайк"""
+def test_delete_like_keeps_other_likes(client, db):
+    """Тест: снятие лайка не затрагивает чужие лайки"""
     user1 = User.query.filter_by(api_key='test').first()
     user2 = User.query.filter_by(api_key='test_two').first()
 
     tweet = Tweet(tweet_data='Твит', user_id=user1.id)
+    db.session.add(tweet)
+    db.session.flush()
     like = Like(tweet_id=tweet.id, user_id=user2.id)
 
-    db.session.add_all([tweet, like])
+    db.session.add(like)
     db.session.commit()
 
     headers = {
         'API_KEY': 'test'
     }
 
-    response = client.delete(f'/api/tweets/{like.id}/likes', headers=headers)
+    response = client.delete(f'/api/tweets/{tweet.id}/likes', headers=headers)
 
-    assert response.status_code == 403
-    json_data = response.get_json()
-    assert json_data['error'] == 'Лайк не принадлежит вам'
+    assert response.status_code == 200
 
     assert db.session.get(Like, like.id) is not None
 
@@ -234,7 +241,7 @@ def test_delete_like_invalid_api_key(client, db):
         'API_KEY': 'invalid_key'
     }
 
-    response = client.delete(f'/api/tweets/{like.id}/likes', headers=headers)
+    response = client.delete(f'/api/tweets/{tweet.id}/likes', headers=headers)
 
     assert response.status_code == 401
 
@@ -245,16 +252,18 @@ def test_delete_like_cascade_check(client, db):
     user_liker = User.query.filter_by(api_key='test_two').first()
 
     tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.flush()
     like = Like(tweet_id=tweet.id, user_id=user_liker.id)
 
-    db.session.add_all([tweet, like])
+    db.session.add(like)
     db.session.commit()
 
     tweet_id = tweet.id
     like_id = like.id
 
     headers = {'API_KEY': 'test_two'}
-    response = client.delete(f'/api/tweets/{like_id}/likes', headers=headers)
+    response = client.delete(f'/api/tweets/{tweet_id}/likes', headers=headers)
 
     assert response.status_code == 200
 
@@ -282,9 +291,9 @@ def test_like_full_cycle(client, db):
     like_id = like.id
 
     duplicate_response = client.post(f'/api/tweets/{tweet.id}/likes', headers=like_headers)
-    assert duplicate_response.status_code == 500
+    assert duplicate_response.status_code == 200
 
-    delete_response = client.delete(f'/api/tweets/{like_id}/likes', headers=like_headers)
+    delete_response = client.delete(f'/api/tweets/{tweet.id}/likes', headers=like_headers)
     assert delete_response.status_code == 200
 
     assert db.session.get(Like, like_id) is None
@@ -294,21 +303,363 @@ def test_like_full_cycle(client, db):
 
 
 def test_delete_already_deleted_like(client, db):
-    """Тест: попытка удаления уже удаленного лайка"""
+    """Тест: повторное снятие лайка ничего не меняет"""
     user = User.query.filter_by(api_key='test').first()
     tweet = Tweet(tweet_data='Твит', user_id=user.id)
-    like = Like(tweet_id=tweet.id, user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
 
-    db.session.add_all([tweet, like])
+    headers = {'API_KEY': 'test'}
+    client.post(f'/api/tweets/{tweet.id}/likes', headers=headers)
+
+    response1 = client.delete(f'/api/tweets/{tweet.id}/likes', headers=headers)
+    assert response1.status_code == 200
+
+    response2 = client.delete(f'/api/tweets/{tweet.id}/likes', headers=headers)
+    assert response2.status_code == 200
+    assert response2.get_json()['result'] is True
+
+    db.session.refresh(tweet)
+    assert tweet.like_count == 0
+
+
+def test_like_count_maintained(client, db):
+    """Тест: счётчик лайков меняется вместе с лайками"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит со счётчиком', user_id=user.id)
+    db.session.add(tweet)
     db.session.commit()
 
-    like_id = like.id
+    client.post(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': 'test'})
+    client.post(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': 'test_two'})
+    db.session.refresh(tweet)
+    assert tweet.like_count == 2
+
+    client.delete(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': 'test'})
+    db.session.refresh(tweet)
+    assert tweet.like_count == 1
+
+
+def test_feed_likes_preview(app, client, db, monkeypatch):
+    """Тест: лента отдаёт счётчик и только первых лайкнувших"""
+    monkeypatch.setitem(app.config, 'LIKES_PREVIEW_SIZE', 2)
+
+    author = User.query.filter_by(api_key='test').first()
+    likers = [User(name=f'liker_{i}', api_key=f'liker_key_{i}') for i in range(3)]
+    tweet = Tweet(tweet_data='Популярный твит', user_id=author.id)
+    db.session.add_all(likers + [tweet])
+    db.session.commit()
+
+    for i in range(3):
+        client.post(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': f'liker_key_{i}'})
+
+    feed_tweet = client.get('/api/tweets').get_json()['tweets'][0]
+
+    assert feed_tweet['like_count'] == 3
+    assert [like['name'] for like in feed_tweet['likes']] == ['liker_0', 'liker_1']
 
+
+def test_get_tweet_likes_pagination(client, db):
+    """Тест: постраничный список лайкнувших твит"""
+    author = User.query.filter_by(api_key='test').first()
+    likers = [User(name=f'liker_{i}', api_key=f'liker_key_{i}') for i in range(3)]
+    tweet = Tweet(tweet_data='Твит', user_id=author.id)
+    db.session.add_all(likers + [tweet])
+    db.session.commit()
+
+    for i in range(3):
+        client.post(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': f'liker_key_{i}'})
+
+    response = client.get(f'/api/tweets/{tweet.id}/likes?limit=2')
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert json_data['like_count'] == 3
+    assert [like['name'] for like in json_data['likes']] == ['liker_2', 'liker_1']
+
+    response = client.get(f"/api/tweets/{tweet.id}/likes?cursor={json_data['next_cursor']}")
+    json_data = response.get_json()
+    assert [like['name'] for like in json_data['likes']] == ['liker_0']
+    assert json_data['next_cursor'] is None
+
+
+def test_get_tweet_likes_not_found(client):
+    """Тест: список лайков несуществующего твита"""
+    response = client.get('/api/tweets/999/likes')
+
+    assert response.status_code == 404
+    assert response.get_json()['errors'] == 'Такого твита не существует'
+
+
+def test_recount_likes_command(app, db):
+    """Тест: команда пересчёта счётчиков лайков"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id, like_count=5)
+    db.session.add(tweet)
+    db.session.flush()
+    db.session.add(Like(tweet_id=tweet.id, user_id=user.id))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['recount-likes'])
+
+    assert 'Исправлено счётчиков лайков: 1' in result.output
+    db.session.refresh(tweet)
+    assert tweet.like_count == 1
+
+
+def test_like_toggle_single_statement(client, db, query_counter):
+    """Тест: лайк и счётчик твита меняются одним запросом"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+    tweet_id = tweet.id
+
+    query_counter.reset()
+    client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+    client.delete(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+
+    statements = [s for s in query_counter.statements if 'likes' in s and 'tweets' in s]
+    assert len(statements) == 2
+    assert 'ON CONFLICT DO NOTHING' in statements[0]
+    assert 'DELETE FROM likes' in statements[1]
+    assert not any('SAVEPOINT' in s or 'ROLLBACK' in s for s in query_counter.statements)
+
+
+def test_likes_batch(client, db):
+    """Тест: пакетная установка и снятие лайков с результатом по элементам"""
+    user = User.query.filter_by(api_key='test').first()
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(3)]
+    db.session.add_all(tweets)
+    db.session.flush()
+    db.session.add(Like(tweet_id=tweets[1].id, user_id=user.id))
+    db.session.add(Like(tweet_id=tweets[2].id, user_id=user.id))
+    tweets[1].like_count = tweets[2].like_count = 1
+    db.session.commit()
+    ids = [tweet.id for tweet in tweets]
+
+    response = client.post('/api/tweets/likes/batch', json={'items': [
+        {'tweet_id': ids[0], 'action': 'like'},
+        {'tweet_id': ids[1], 'action': 'like'},
+        {'tweet_id': ids[2], 'action': 'unlike'},
+        {'tweet_id': 999, 'action': 'like'},
+    ]}, headers={'API_KEY': 'test'})
+
+    assert response.status_code == 200
+    assert [item['status'] for item in response.get_json()['items']] == [
+        'changed', 'unchanged', 'changed', 'not_found'
+    ]
+    assert response.get_json()['items'][0] == {'tweet_id': ids[0], 'action': 'like', 'status': 'changed'}
+
+    for tweet in tweets:
+        db.session.refresh(tweet)
+    assert [tweet.like_count for tweet in tweets] == [1, 1, 0]
+    assert Like.query.filter_by(user_id=user.id).count() == 2
+
+
+def test_likes_batch_invalid(client):
+    """Тест: неверный пакет лайков отклоняется целиком"""
     headers = {'API_KEY': 'test'}
-    response1 = client.delete(f'/api/tweets/{like_id}/likes', headers=headers)
-    assert response1.status_code == 200
 
-    response2 = client.delete(f'/api/tweets/{like_id}/likes', headers=headers)
-    assert response2.status_code == 404
-    json_data = response2.get_json()
-    assert json_data['errors'] == 'Такого лайка не существует'
+    assert client.post('/api/tweets/likes/batch', json={}, headers=headers).status_code == 400
+    assert client.post('/api/tweets/likes/batch', json={'items': [{'tweet_id': 1, 'action': 'love'}]}, headers=headers).status_code == 400
+    assert client.post('/api/tweets/likes/batch', json={'items': [{'tweet_id': 1, 'action': ['like']}]}, headers=headers).status_code == 400
+    duplicate = {'items': [{'tweet_id': 1, 'action': 'like'}, {'tweet_id': 1, 'action': 'unlike'}]}
+    assert client.post('/api/tweets/likes/batch', json=duplicate, headers=headers).status_code == 400
+    too_many = {'items': [{'tweet_id': i, 'action': 'like'} for i in range(501)]}
+    assert client.post('/api/tweets/likes/batch', json=too_many, headers=headers).status_code == 400
+    assert client.post('/api/tweets/likes/batch', json={'items': []}).status_code == 401
+
+
+def write_behind(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'LIKE_WRITE_BEHIND', True)
+    monkeypatch.setitem(app.config, 'LIKE_FLUSH_INTERVAL_MS', 60000)
+
+
+def test_like_write_behind(app, client, db, monkeypatch):
+    """Тест: лайк в режиме отложенной записи виден до записи в базу"""
+    write_behind(app, monkeypatch)
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+    tweet_id = tweet.id
+
+    response = client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test_two'})
+    assert response.status_code == 202
+    response = client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test_two'})
+    assert response.status_code == 200
+
+    assert Like.query.filter_by(tweet_id=tweet_id).count() == 0
+    assert client.get(f'/api/tweets/{tweet_id}/likes').get_json()['like_count'] == 1
+
+    assert like_buffer.flush() == 1
+    db.session.expire_all()
+    assert Like.query.filter_by(tweet_id=tweet_id).count() == 1
+    assert db.session.get(Tweet, tweet_id).like_count == 1
+    assert like_buffer.delta(tweet_id) == 0
+    assert client.get(f'/api/tweets/{tweet_id}/likes').get_json()['like_count'] == 1
+
+    response = client.delete(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test_two'})
+    assert response.status_code == 202
+    assert client.get(f'/api/tweets/{tweet_id}/likes').get_json()['like_count'] == 0
+
+
+def test_like_write_behind_coalesces(app, client, db, monkeypatch, query_counter):
+    """Тест: изменения одного лайка схлопываются, лайки твита пишутся одним запросом"""
+    write_behind(app, monkeypatch)
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+    tweet_id = tweet.id
+
+    client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+    client.delete(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+    assert like_buffer.stats()['pending'] == 0
+    assert like_buffer.flush() == 0
+
+    for api_key in ('test', 'test_two'):
+        client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': api_key})
+
+    query_counter.reset()
+    assert like_buffer.flush() == 2
+    assert len([s for s in query_counter.statements if 'INSERT INTO likes' in s]) == 1
+
+    db.session.expire_all()
+    assert db.session.get(Tweet, tweet_id).like_count == 2
+    assert Like.query.filter_by(tweet_id=tweet_id).count() == 2
+
+
+def test_like_write_behind_flush_during_read(app, client, db, monkeypatch):
+    """Тест: лайк, записанный буфером во время чтения из базы, не задваивается"""
+    write_behind(app, monkeypatch)
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+    tweet_id = tweet.id
+    reads = []
+    read_stored = buffer.stored_like
+
+    def stored_like(tweet_id, user_id):
+        stored = read_stored(tweet_id, user_id)
+        if not reads:
+            reads.append(stored)
+            like_buffer.submit(tweet_id, user_id, True, flush_limit=100)
+            like_buffer.flush()
+        return stored
+
+    monkeypatch.setattr('app.buffer.stored_like', stored_like)
+    response = client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+
+    assert reads == [False]
+    assert response.status_code == 200
+    assert like_buffer.stats()['pending'] == 0
+    assert like_buffer.delta(tweet_id) == 0
+    assert client.get(f'/api/tweets/{tweet_id}/likes').get_json()['like_count'] == 1
+
+
+def test_like_write_behind_feed_overlay(app, client, db, monkeypatch):
+    """Тест: лента и пакетная выдача показывают лайки до записи из буфера"""
+    write_behind(app, monkeypatch)
+    monkeypatch.setitem(app.config, 'LIKES_PREVIEW_SIZE', 2)
+    author = User.query.filter_by(api_key='test').first()
+    likers = [User(name=f'liker_{i}', api_key=f'liker_key_{i}') for i in range(2)]
+    tweet = Tweet(tweet_data='Твит', user_id=author.id, like_count=1)
+    db.session.add_all(likers + [tweet])
+    db.session.flush()
+    db.session.add(Like(tweet_id=tweet.id, user_id=likers[0].id))
+    db.session.commit()
+    tweet_id = tweet.id
+
+    response = client.get('/api/tweets')
+    assert response.get_json()['tweets'][0]['like_count'] == 1
+    etag = response.headers['ETag']
+    client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'liker_key_1'})
+    assert client.get('/api/tweets', headers={'If-None-Match': etag}).status_code == 200
+    client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+    client.delete(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'liker_key_0'})
+
+    for url in ('/api/tweets', f'/api/tweets?ids={tweet_id}'):
+        feed_tweet = client.get(url).get_json()['tweets'][0]
+        assert feed_tweet['like_count'] == 2
+        assert [like['name'] for like in feed_tweet['likes']] == [author.name, 'liker_1']
+
+    like_buffer.flush()
+    feed_tweet = client.get('/api/tweets').get_json()['tweets'][0]
+    assert feed_tweet['like_count'] == 2
+    assert [like['name'] for like in feed_tweet['likes']] == [author.name, 'liker_1']
+
+
+def test_likes_batch_write_behind(app, client, db, monkeypatch, query_counter):
+    """Тест: пакет в режиме отложенной записи решается буфером вместе с одиночными лайками"""
+    write_behind(app, monkeypatch)
+    user = User.query.filter_by(api_key='test').first()
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(3)]
+    db.session.add_all(tweets)
+    db.session.flush()
+    db.session.add(Like(tweet_id=tweets[2].id, user_id=user.id))
+    tweets[2].like_count = 1
+    db.session.commit()
+    ids = [tweet.id for tweet in tweets]
+
+    assert client.post(f'/api/tweets/{ids[0]}/likes', headers={'API_KEY': 'test'}).status_code == 202
+    query_counter.reset()
+    response = client.post('/api/tweets/likes/batch', json={'items': [
+        {'tweet_id': ids[0], 'action': 'unlike'},
+        {'tweet_id': ids[1], 'action': 'unlike'},
+        {'tweet_id': ids[2], 'action': 'like'},
+        {'tweet_id': 999, 'action': 'like'},
+    ]}, headers={'API_KEY': 'test'})
+
+    assert response.status_code == 202
+    assert [item['status'] for item in response.get_json()['items']] == [
+        'changed', 'unchanged', 'unchanged', 'not_found'
+    ]
+    assert len([s for s in query_counter.statements if 'FROM likes' in s]) == 1
+    assert like_buffer.stats()['pending'] == 0
+
+    like_buffer.flush()
+    db.session.expire_all()
+    assert [db.session.get(Tweet, tweet_id).like_count for tweet_id in ids] == [0, 0, 1]
+    assert Like.query.filter_by(user_id=user.id).count() == 1
+
+
+def test_like_write_behind_not_found(app, client, monkeypatch):
+    """Тест: лайк несуществующего твита в режиме отложенной записи"""
+    write_behind(app, monkeypatch)
+
+    response = client.post('/api/tweets/99999/likes', headers={'API_KEY': 'test'})
+
+    assert response.status_code == 404
+    assert like_buffer.stats()['pending'] == 0
+
+
+def test_like_write_behind_flush_on_close(app, client, db, monkeypatch):
+    """Тест: при остановке буфер записывает оставшиеся лайки"""
+    write_behind(app, monkeypatch)
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+    tweet_id = tweet.id
+
+    client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+    like_buffer.close()
+
+    db.session.expire_all()
+    assert Like.query.filter_by(tweet_id=tweet_id).count() == 1
+    assert db.session.get(Tweet, tweet_id).like_count == 1
+
+
+def test_likes_batch_user_lookup_error(client, monkeypatch):
+    """Тест: ошибка при поиске пользователя возвращает JSON с кодом 500"""
+    def fail():
+        raise Exception('Ошибка базы')
+
+    monkeypatch.setattr('app.routers.current_user', fail)
+    response = client.post('/api/tweets/likes/batch', json={'items': [{'tweet_id': 1, 'action': 'like'}]}, headers={'API_KEY': 'test'})
+
+    assert response.status_code == 500
+    assert response.get_json()['result'] is False
@@ -0,0 +1,102 @@
+import datetime
+
+import numpy as np
+
+from app.models import Like, Subscribe, Tweet, User
+from app.ranking import author_affinity, score, top_k
+
+
+def test_top_k_orders_by_score_then_newest():
+    """Тест: top_k возвращает лучших кандидатов по убыванию оценки"""
+    scores = np.array([1.0, 5.0, 3.0, 5.0, 0.5])
+    tweet_ids = np.array([10, 11, 12, 13, 14])
+
+    best = top_k(scores, tweet_ids, 3)
+
+    assert tweet_ids[best].tolist() == [13, 11, 12]
+    assert tweet_ids[top_k(scores, tweet_ids, 10)].tolist() == [13, 11, 12, 10, 14]
+    assert top_k(scores, tweet_ids, 0).tolist() == []
+
+
+def test_score_decay_and_affinity():
+    """Тест: оценка растёт с лайками и близостью и падает с давностью"""
+    scores = score(
+        like_counts=np.array([0.0, 10.0, 10.0, 0.0]),
+        ages_hours=np.array([0.0, 0.0, 24.0, 0.0]),
+        affinity=np.array([0.0, 0.0, 0.0, 2.0]),
+        half_life_hours=24,
+    )
+
+    assert scores[1] > scores[0]
+    assert scores[2] == scores[1] / 2
+    assert scores[3] > scores[0]
+
+
+def test_author_affinity():
+    """Тест: близость учитывает подписки и прошлые лайки"""
+    affinity = author_affinity(np.array([1, 2, 3, 4]), [2], {3: 5, 4: 1, 9: 7})
+
+    assert affinity[0] == 0
+    assert affinity[1] == 2
+    assert affinity[2] > affinity[3] > 0
+
+
+def test_get_tweets_top_mode(client, db):
+    """Тест: режим top ставит выше популярные твиты и твиты близких авторов"""
+    author = User.query.filter_by(api_key='test').first()
+    viewer = User.query.filter_by(api_key='test_two').first()
+    other = User(name='other', api_key='other')
+    db.session.add(other)
+    db.session.commit()
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    popular = Tweet(tweet_data='Популярный', user_id=other.id, like_count=50, created_at=now)
+    old = Tweet(
+        tweet_data='Старый', user_id=other.id, like_count=50,
+        created_at=now - datetime.timedelta(days=30)
+    )
+    followed = Tweet(tweet_data='От подписки', user_id=author.id, created_at=now)
+    plain = Tweet(tweet_data='Обычный', user_id=other.id, created_at=now)
+    db.session.add_all([popular, old, followed, plain])
+    db.session.add(Subscribe(subscriber_id=viewer.id, target_id=author.id))
+    db.session.commit()
+
+    response = client.get('/api/tweets?mode=top&limit=3', headers={'API_KEY': 'test_two'})
+
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == [popular.id, followed.id, plain.id]
+    assert json_data['next_cursor'] is None
+
+    response = client.get('/api/tweets?mode=top&limit=3')
+    assert [tweet['id'] for tweet in response.get_json()['tweets']][0] == popular.id
+
+
+def test_get_tweets_top_mode_liked_author(client, db):
+    """Тест: прошлые лайки зрителя поднимают твиты автора"""
+    author = User.query.filter_by(api_key='test').first()
+    viewer = User.query.filter_by(api_key='test_two').first()
+    other = User(name='other', api_key='other')
+    db.session.add(other)
+    db.session.commit()
+
+    liked_before = Tweet(tweet_data='Старый лайкнутый', user_id=author.id)
+    db.session.add(liked_before)
+    db.session.commit()
+    db.session.add(Like(tweet_id=liked_before.id, user_id=viewer.id))
+
+    by_other = Tweet(tweet_data='Другой автор', user_id=other.id)
+    by_author = Tweet(tweet_data='Лайкнутый автор', user_id=author.id)
+    db.session.add_all([by_author, by_other])
+    db.session.commit()
+
+    response = client.get('/api/tweets?mode=top&limit=1', headers={'API_KEY': 'test_two'})
+
+    assert [tweet['id'] for tweet in response.get_json()['tweets']] == [by_author.id]
+
+
+def test_get_tweets_unknown_mode(client):
+    """Тест: неизвестный режим ленты"""
+    response = client.get('/api/tweets?mode=random')
+
+    assert response.status_code == 400
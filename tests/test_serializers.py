@@ -0,0 +1,55 @@
+import datetime
+
+import pytest
+
+from app import serializers
+from app.models import Tweet, User
+from app.serializers import FastJSONProvider, select_backend
+
+
+def test_model_serializer_matches_columns(client, db):
+    """Тест: скомпилированный сериализатор возвращает все колонки модели"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+
+    assert tweet.to_json() == {
+        column.name: getattr(tweet, column.name)
+        for column in Tweet.__table__.columns
+    }
+    assert Tweet in serializers._serializers
+
+
+@pytest.mark.parametrize('name', ['orjson', 'json'])
+def test_backends_encode_same_data(name):
+    """Тест: бэкенды кодируют одинаковые данные, включая даты"""
+    pytest.importorskip(name)
+    _, dumps, loads = select_backend(name)
+    data = {
+        'id': 1,
+        'content': 'Привет',
+        'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5),
+    }
+
+    assert loads(dumps(data)) == {
+        'id': 1,
+        'content': 'Привет',
+        'created_at': '2024-01-02T03:04:05',
+    }
+
+
+def test_unknown_backend():
+    """Тест: неизвестный JSON-бэкенд"""
+    with pytest.raises(ValueError):
+        select_backend('yaml')
+
+
+def test_responses_use_fast_provider(client):
+    """Тест: ответы API кодируются через провайдер сериализаторов"""
+    assert isinstance(client.application.json, FastJSONProvider)
+
+    response = client.get('/api/users/me', headers={'API_KEY': 'test'})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['user']['name'] == 'test'
@@ -1,8 +1,7 @@
 import json
 from unittest.mock import patch
 from sqlalchemy.exc import IntegrityError
-from psycopg2.errors import UniqueViolation
-from app.models import User, Subscribe
+from app.models import ChangeCounter, User, Subscribe
 
 
 def test_create_subscribe_success(client, db):
@@ -82,7 +81,7 @@ def test_create_subscribe_target_not_found(client):
 
 
 def test_create_subscribe_duplicate(client, db):
-    """Тест: попытка повторно подписаться на того же пользователя"""
+    """Тест: повторная подписка на того же пользователя ничего не меняет"""
     user1 = User.query.filter_by(api_key='test').first()
     user2 = User.query.filter_by(api_key='test_two').first()
 
@@ -96,18 +95,19 @@ def test_create_subscribe_duplicate(client, db):
 
     response = client.post(f'/api/users/{user2.id}/follow', headers=headers)
 
-    assert response.status_code == 409
+    assert response.status_code == 200
     json_data = response.get_json()
-    assert json_data['error'] == 'Вы уже подписаны на этого пользователя'
+    assert json_data['result'] is True
+    assert Subscribe.query.filter_by(subscriber_id=user1.id, target_id=user2.id).count() == 1
 
+    db.session.refresh(user2)
+    assert user2.followers_count == 0
 
-def test_create_subscribe_other_integrity_error(client, db, monkeypatch):
-    """Тест: обработка других IntegrityError"""
-    with patch('app.routers.db.session.add') as mock_add:
-        mock_integrity_error = IntegrityError("Some other integrity error", {}, None)
-        mock_integrity_error.orig = Exception("Not a UniqueViolation")
-        mock_add.side_effect = mock_integrity_error
 
+def test_create_subscribe_integrity_error(client, db, monkeypatch):
+    """Тест: обработка IntegrityError"""
+    mock_integrity_error = IntegrityError("Some integrity error", {}, None)
+    with patch('app.routers.toggle_subscribe', side_effect=mock_integrity_error):
         user = User.query.filter_by(api_key='test_two').first()
 
         headers = {
@@ -124,7 +124,7 @@ def test_create_subscribe_other_integrity_error(client, db, monkeypatch):
 
 def test_create_subscribe_other_exception(client, db, monkeypatch):
     """Тест: обработка других исключений"""
-    with patch('app.routers.db.session.add', side_effect=Exception("Some other error")):
+    with patch('app.routers.toggle_subscribe', side_effect=Exception("Some other error")):
         user = User.query.filter_by(api_key='test_two').first()
 
         headers = {
@@ -139,6 +139,31 @@ def test_create_subscribe_other_exception(client, db, monkeypatch):
         assert 'error_type' in json_data
 
 
+def test_subscribe_toggle_single_statement(client, db, query_counter):
+    """Тест: подписка со счётчиками и версиями — один запрос, повтор ничего не меняет"""
+    user1 = User.query.filter_by(api_key='test').first()
+    user2 = User.query.filter_by(api_key='test_two').first()
+    headers = {'API_KEY': 'test'}
+
+    for method in ('post', 'post', 'delete'):
+        query_counter.reset()
+        getattr(client, method)(f'/api/users/{user2.id}/follow', headers=headers)
+
+        writes = [s for s in query_counter.statements if 'subscribes' in s and 'UPDATE users' in s]
+        assert len(writes) == 1
+        assert 'change_counters' in writes[0]
+        assert not any(s.startswith(('UPDATE', 'INSERT', 'DELETE')) for s in query_counter.statements if s not in writes)
+
+        if method == 'post':
+            db.session.expire_all()
+            assert (user1.following_count, user2.followers_count) == (1, 1)
+
+    db.session.expire_all()
+    assert (user1.following_count, user2.followers_count) == (0, 0)
+    versions = {row.name: row.version for row in ChangeCounter.query}
+    assert versions[f'user:{user1.id}'] == versions[f'user:{user2.id}'] == 2
+
+
 def test_delete_subscribe_success(client, db):
     """Тест: успешное удаление своей подписки"""
     user1 = User.query.filter_by(api_key='test').first()
@@ -162,7 +187,7 @@ def test_delete_subscribe_success(client, db):
 
 
 def test_delete_subscribe_not_found(client):
-    """Тест: попытка удалить несуществующую подписку"""
+    """Тест: попытка отписаться от несуществующего пользователя"""
     headers = {
         'API_KEY': 'test'
     }
@@ -171,7 +196,18 @@ def test_delete_subscribe_not_found(client):
 
     assert response.status_code == 404
     json_data = response.get_json()
-    assert json_data['errors'] == 'Такой подписки не существует'
+    assert json_data['errors'] == 'Пользователь не найден'
+
+
+def test_delete_subscribe_without_subscription(client, db):
+    """Тест: отписка без подписки ничего не меняет"""
+    user2 = User.query.filter_by(api_key='test_two').first()
+
+    response = client.delete(f'/api/users/{user2.id}/follow', headers={'API_KEY': 'test'})
+
+    assert response.status_code == 204
+    db.session.refresh(user2)
+    assert user2.followers_count == 0
 
 
 def test_delete_subscribe_no_api_key(client, db):
@@ -249,7 +285,7 @@ def test_subscribe_full_cycle(client, db):
     subscribe_id = subscribe.id
 
     response_duplicate = client.post(f'/api/users/{user2.id}/follow', headers=headers_create)
-    assert response_duplicate.status_code == 409
+    assert response_duplicate.status_code == 200
 
     headers_delete = {'API_KEY': 'test'}
     response_delete = client.delete(f'/api/users/{user2.id}/follow', headers=headers_delete)
@@ -259,7 +295,7 @@ def test_subscribe_full_cycle(client, db):
     assert db.session.get(Subscribe, subscribe_id) is None
 
     response_delete_again = client.delete(f'/api/users/{user2.id}/follow', headers=headers_delete)
-    assert response_delete_again.status_code == 404
+    assert response_delete_again.status_code == 204
 
 
 def test_subscribe_affects_user_info(client, db):
@@ -356,4 +392,52 @@ def test_subscribe_data_integrity(client, db):
     subscribe_from_db = db.session.get(Subscribe, subscribe.id)
     assert subscribe_from_db is not None
     assert subscribe_from_db.subscribers.id == user1.id
-    assert subscribe_from_db.targets.id == user2.id
\ No newline at end of file
+    assert subscribe_from_db.targets.id == user2.id
+
+def test_subscribes_batch(client, db):
+    """Тест: пакетная подписка и отписка с результатом по элементам"""
+    user1 = User.query.filter_by(api_key='test').first()
+    users = [User(name=f'user_{i}', api_key=f'key_{i}') for i in range(3)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.commit()
+    ids = [user.id for user in users]
+    client.post(f'/api/users/{ids[2]}/follow', headers={'API_KEY': 'test'})
+
+    response = client.post('/api/users/follow/batch', json={'items': [
+        {'user_id': ids[0], 'action': 'follow'},
+        {'user_id': ids[1], 'action': 'unfollow'},
+        {'user_id': ids[2], 'action': 'unfollow'},
+        {'user_id': user1.id, 'action': 'follow'},
+        {'user_id': 999, 'action': 'follow'},
+    ]}, headers={'API_KEY': 'test'})
+
+    assert response.status_code == 200
+    assert [item['status'] for item in response.get_json()['items']] == [
+        'changed', 'unchanged', 'changed', 'invalid', 'not_found'
+    ]
+
+    subscribes = Subscribe.query.filter_by(subscriber_id=user1.id).all()
+    assert [subscribe.target_id for subscribe in subscribes] == [ids[0]]
+    db.session.refresh(user1)
+    assert user1.following_count == 1
+    for user in users:
+        db.session.refresh(user)
+    assert [user.followers_count for user in users] == [1, 0, 0]
+
+
+def test_subscribes_batch_invalid(client):
+    """Тест: неверный пакет подписок отклоняется"""
+    response = client.post('/api/users/follow/batch', json={'items': [{'user_id': 'x', 'action': 'follow'}]}, headers={'API_KEY': 'test'})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Поле user_id должно быть целым числом'
+
+
+def test_subscribes_batch_user_lookup_error(client):
+    """Тест: ошибка при поиске пользователя возвращает JSON с кодом 500"""
+    with patch('app.routers.current_user', side_effect=Exception('Ошибка базы')):
+        response = client.post('/api/users/follow/batch', json={'items': [{'user_id': 1, 'action': 'follow'}]}, headers={'API_KEY': 'test'})
+
+    assert response.status_code == 500
+    assert response.get_json()['result'] is False
@@ -0,0 +1,100 @@
+from app.models import Like, Subscribe, Tweet, User, UserSuggestions
+
+
+def make_users(db, count):
+    users = [User(name=f'user_{i}', api_key=f'key_{i}') for i in range(count)]
+    db.session.add_all(users)
+    db.session.flush()
+    return users
+
+
+def follow(db, *pairs):
+    db.session.add_all(Subscribe(subscriber_id=a.id, target_id=b.id) for a, b in pairs)
+
+
+def test_suggestions_ranked_by_shared_following(client, db):
+    """Тест: кандидаты упорядочены по общим подпискам и лайкам"""
+    viewer = User.query.filter_by(api_key='test').first()
+    a, b, c, d, e = make_users(db, 5)
+    follow(db, (viewer, a), (viewer, b), (viewer, e))
+    follow(db, (c, a), (c, b), (d, a), (e, a))
+    tweet = Tweet(tweet_data='Твит', user_id=d.id)
+    db.session.add(tweet)
+    db.session.flush()
+    db.session.add(Like(tweet_id=tweet.id, user_id=viewer.id))
+    db.session.commit()
+
+    response = client.get('/api/users/suggestions', headers={'API_KEY': 'test'})
+
+    assert response.status_code == 200
+    users = response.get_json()['users']
+    assert [user['id'] for user in users] == [c.id, d.id]
+    assert users[0] == {
+        'id': c.id,
+        'name': 'user_2',
+        'shared_following': 2,
+        'recent_likes': 0,
+        'score': 2.0,
+    }
+    assert users[1]['recent_likes'] == 1
+    assert users[1]['score'] == 1.5
+
+
+def test_suggestions_served_from_cache(client, db, query_counter):
+    """Тест: кэш читается одним запросом без уже подписанных"""
+    viewer = User.query.filter_by(api_key='test').first()
+    a, b, c = make_users(db, 3)
+    follow(db, (viewer, a), (b, a), (c, a))
+    db.session.commit()
+
+    users = client.get('/api/users/suggestions', headers={'API_KEY': 'test'}).get_json()['users']
+    assert [user['id'] for user in users] == [b.id, c.id]
+    follow(db, (viewer, b))
+    db.session.commit()
+    c_id = c.id
+
+    query_counter.reset()
+    users = client.get('/api/users/suggestions', headers={'API_KEY': 'test'}).get_json()['users']
+
+    assert [user['id'] for user in users] == [c_id]
+    assert query_counter.count == 1
+    assert 'FROM user_suggestions' in query_counter.statements[0]
+
+
+def test_stale_suggestions_recomputed(app, client, db, monkeypatch):
+    """Тест: устаревшие рекомендации отдаются и пересчитываются в фоне"""
+    viewer = User.query.filter_by(api_key='test').first()
+    a, b, c = make_users(db, 3)
+    follow(db, (viewer, a), (b, a))
+    db.session.commit()
+
+    client.get('/api/users/suggestions', headers={'API_KEY': 'test'})
+    follow(db, (c, a))
+    db.session.commit()
+    monkeypatch.setitem(app.config, 'SUGGESTIONS_TTL', 0)
+
+    users = client.get('/api/users/suggestions', headers={'API_KEY': 'test'}).get_json()['users']
+    assert [user['id'] for user in users] == [b.id]
+
+    users = client.get('/api/users/suggestions', headers={'API_KEY': 'test'}).get_json()['users']
+    assert [user['id'] for user in users] == [b.id, c.id]
+
+
+def test_recompute_suggestions_command(app, db):
+    """Тест: команда пересчитывает рекомендации всех пользователей"""
+    viewer = User.query.filter_by(api_key='test').first()
+    a, b = make_users(db, 2)
+    follow(db, (viewer, a), (b, a))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['recompute-suggestions', '--batch-size', '2'])
+
+    assert 'Пересчитано рекомендаций: 4' in result.output
+    cached = db.session.get(UserSuggestions, viewer.id)
+    assert [user['id'] for user in cached.suggestions] == [b.id]
+    assert db.session.get(UserSuggestions, a.id).suggestions == []
+
+
+def test_suggestions_unauthorized(client):
+    """Тест: рекомендации без API ключа недоступны"""
+    assert client.get('/api/users/suggestions').status_code == 401
@@ -0,0 +1,201 @@
+from app.models import Subscribe, TimelineEntry, Tweet, User
+from app.timeline import merge_streams
+
+
+def test_timeline_fan_out_to_followers(client, db):
+    """Тест: твит попадает в ленту подписчика и автора"""
+    author = User.query.filter_by(api_key='test').first()
+    follower = User.query.filter_by(api_key='test_two').first()
+
+    db.session.add(Subscribe(subscriber_id=follower.id, target_id=author.id))
+    db.session.commit()
+
+    response = client.post(
+        '/api/tweets', json={'tweet_data': 'Твит в ленту'}, headers={'API_KEY': 'test'}
+    )
+    tweet_id = response.get_json()['tweet_id']
+
+    for api_key in ('test', 'test_two'):
+        response = client.get('/api/timeline', headers={'API_KEY': api_key})
+
+        assert response.status_code == 200
+        json_data = response.get_json()
+        assert [tweet['id'] for tweet in json_data['tweets']] == [tweet_id]
+        assert json_data['tweets'][0]['author']['id'] == author.id
+
+
+def test_timeline_excludes_not_followed(client, db):
+    """Тест: твиты пользователей без подписки не попадают в ленту"""
+    client.post(
+        '/api/tweets', json={'tweet_data': 'Чужой твит'}, headers={'API_KEY': 'test'}
+    )
+
+    response = client.get('/api/timeline', headers={'API_KEY': 'test_two'})
+
+    assert response.status_code == 200
+    assert response.get_json()['tweets'] == []
+
+
+def test_timeline_cleanup_on_delete(client, db):
+    """Тест: удаление твита очищает записи лент"""
+    author = User.query.filter_by(api_key='test').first()
+    follower = User.query.filter_by(api_key='test_two').first()
+
+    db.session.add(Subscribe(subscriber_id=follower.id, target_id=author.id))
+    db.session.commit()
+
+    response = client.post(
+        '/api/tweets', json={'tweet_data': 'Удаляемый твит'}, headers={'API_KEY': 'test'}
+    )
+    tweet_id = response.get_json()['tweet_id']
+    assert TimelineEntry.query.filter_by(tweet_id=tweet_id).count() == 2
+
+    client.delete(f'/api/tweets/{tweet_id}', headers={'API_KEY': 'test'})
+
+    assert TimelineEntry.query.filter_by(tweet_id=tweet_id).count() == 0
+    response = client.get('/api/timeline', headers={'API_KEY': 'test_two'})
+    assert response.get_json()['tweets'] == []
+
+
+def test_timeline_pagination(client, db):
+    """Тест: постраничное чтение ленты"""
+    tweet_ids = []
+    for i in range(3):
+        response = client.post(
+            '/api/tweets', json={'tweet_data': f'Твит {i}'}, headers={'API_KEY': 'test'}
+        )
+        tweet_ids.append(response.get_json()['tweet_id'])
+
+    response = client.get('/api/timeline?limit=2', headers={'API_KEY': 'test'})
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == tweet_ids[:0:-1]
+
+    response = client.get(
+        f"/api/timeline?cursor={json_data['next_cursor']}", headers={'API_KEY': 'test'}
+    )
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == tweet_ids[:1]
+    assert json_data['next_cursor'] is None
+
+
+def test_timeline_unauthorized(client):
+    """Тест: получение ленты без API ключа"""
+    response = client.get('/api/timeline')
+
+    assert response.status_code == 401
+
+
+def test_timeline_strategies_match(client, db):
+    """Тест: ленты push и pull совпадают"""
+    reader = User.query.filter_by(api_key='test').first()
+    authors = [User(name=f'author_{i}', api_key=f'author_key_{i}') for i in range(3)]
+    db.session.add_all(authors)
+    db.session.flush()
+    db.session.add_all(
+        Subscribe(subscriber_id=reader.id, target_id=author.id) for author in authors[:2]
+    )
+    db.session.commit()
+
+    for i in range(9):
+        api_key = f'author_key_{i % 3}'
+        client.post('/api/tweets', json={'tweet_data': f'Твит {i}'}, headers={'API_KEY': api_key})
+
+    pages = {}
+    for strategy in ('push', 'pull', 'hybrid'):
+        ids = []
+        url = f'/api/timeline?limit=2&strategy={strategy}'
+        while url:
+            json_data = client.get(url, headers={'API_KEY': 'test'}).get_json()
+            assert json_data['strategy'] == strategy
+            ids.extend(tweet['id'] for tweet in json_data['tweets'])
+            cursor = json_data['next_cursor']
+            url = f'/api/timeline?strategy={strategy}&limit=2&cursor={cursor}' if cursor else None
+        pages[strategy] = ids
+
+    expected = [
+        tweet.id
+        for tweet in Tweet.query.filter(Tweet.user_id.in_([authors[0].id, authors[1].id]))
+        .order_by(Tweet.id.desc())
+    ]
+    assert pages['push'] == expected
+    assert pages['pull'] == expected
+    assert pages['hybrid'] == expected
+
+
+def test_timeline_hybrid_skips_celebrity_fan_out(app, client, db, monkeypatch):
+    """Тест: твиты авторов выше порога подмешиваются только при чтении"""
+    monkeypatch.setitem(app.config, 'TIMELINE_CELEBRITY_THRESHOLD', 0)
+
+    author = User.query.filter_by(api_key='test').first()
+    client.post(f'/api/users/{author.id}/follow', headers={'API_KEY': 'test_two'})
+
+    response = client.post(
+        '/api/tweets', json={'tweet_data': 'Твит знаменитости'}, headers={'API_KEY': 'test'}
+    )
+    tweet_id = response.get_json()['tweet_id']
+
+    entries = TimelineEntry.query.filter_by(tweet_id=tweet_id).all()
+    assert [entry.user_id for entry in entries] == [author.id]
+
+    push = client.get('/api/timeline?strategy=push', headers={'API_KEY': 'test_two'})
+    assert push.get_json()['tweets'] == []
+
+    hybrid = client.get('/api/timeline?strategy=hybrid', headers={'API_KEY': 'test_two'})
+    assert [tweet['id'] for tweet in hybrid.get_json()['tweets']] == [tweet_id]
+
+
+def test_timeline_hybrid_celebrity_threshold_crossing(app, client, db, monkeypatch):
+    """Тест: переход автора через порог не теряет и не дублирует твиты"""
+    monkeypatch.setitem(app.config, 'TIMELINE_CELEBRITY_THRESHOLD', 1)
+
+    author = User.query.filter_by(api_key='test').first()
+    db.session.add(User(name='user_third', api_key='test_third'))
+    db.session.commit()
+
+    def post(text):
+        response = client.post('/api/tweets', json={'tweet_data': text}, headers={'API_KEY': 'test'})
+        return response.get_json()['tweet_id']
+
+    def hybrid():
+        response = client.get('/api/timeline?strategy=hybrid', headers={'API_KEY': 'test_two'})
+        return [tweet['id'] for tweet in response.get_json()['tweets']]
+
+    client.post(f'/api/users/{author.id}/follow', headers={'API_KEY': 'test_two'})
+    fanned_id = post('До порога')
+
+    client.post(f'/api/users/{author.id}/follow', headers={'API_KEY': 'test_third'})
+    pulled_id = post('Выше порога')
+    assert db.session.get(Tweet, pulled_id).fanned_out is False
+    assert hybrid() == [pulled_id, fanned_id]
+
+    client.delete(f'/api/users/{author.id}/follow', headers={'API_KEY': 'test_third'})
+    assert hybrid() == [pulled_id, fanned_id]
+
+    last_id = post('Снова ниже порога')
+    assert hybrid() == [last_id, pulled_id, fanned_id]
+
+    client.post(f'/api/users/{author.id}/follow', headers={'API_KEY': 'test_third'})
+    assert hybrid() == [last_id, pulled_id, fanned_id]
+
+
+def test_timeline_unknown_strategy(client):
+    """Тест: неизвестная стратегия ленты"""
+    response = client.get('/api/timeline?strategy=magic', headers={'API_KEY': 'test'})
+
+    assert response.status_code == 400
+
+
+def test_merge_streams_stops_when_page_is_full():
+    """Тест: k-way слияние не читает потоки дальше заполненной страницы"""
+    consumed = []
+
+    def stream(ids):
+        for tweet_id in ids:
+            consumed.append(tweet_id)
+            yield tweet_id
+
+    result = merge_streams([stream([9, 5, 1]), stream([8, 7, 6, 2]), stream([9, 3])], 4)
+
+    assert result == [9, 8, 7, 6]
+    assert 1 not in consumed
+    assert 2 not in consumed
@@ -1,4 +1,6 @@
-from app.models import Tweet, User, Media, Like
+from sqlalchemy import insert
+from app.models import Tweet, TweetChange, User, Media, Like
+from app.pagination import encode_cursor
 
 
 def test_create_tweet_success_no_media(client, db):
@@ -319,3 +321,349 @@ def test_get_tweets_various_data(client, db):
         assert tweet['author'] is not None
         assert tweet['author']['id'] == user.id
         assert tweet['author']['name'] == 'test'
+
+
+def test_get_tweets_pagination(client, db):
+    """Тест: постраничное получение твитов по курсору"""
+    user = User.query.filter_by(api_key='test').first()
+
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(5)]
+    db.session.add_all(tweets)
+    db.session.commit()
+    ids = sorted((tweet.id for tweet in tweets), reverse=True)
+
+    response = client.get('/api/tweets?limit=2')
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert [tweet['id'] for tweet in json_data['tweets']] == ids[:2]
+    assert json_data['next_cursor'] is not None
+
+    response = client.get(f"/api/tweets?limit=2&cursor={json_data['next_cursor']}")
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == ids[2:4]
+
+    response = client.get(f"/api/tweets?limit=2&cursor={json_data['next_cursor']}")
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == ids[4:]
+    assert json_data['next_cursor'] is None
+
+
+def test_get_tweets_after_id(client, db):
+    """Тест: получение более новых твитов через after_id"""
+    user = User.query.filter_by(api_key='test').first()
+
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(4)]
+    db.session.add_all(tweets)
+    db.session.commit()
+    ids = sorted(tweet.id for tweet in tweets)
+
+    response = client.get(f'/api/tweets?after_id={ids[0]}&limit=2')
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert [tweet['id'] for tweet in json_data['tweets']] == [ids[2], ids[1]]
+    assert json_data['next_cursor'] is not None
+
+    response = client.get(f"/api/tweets?cursor={json_data['next_cursor']}")
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == [ids[3]]
+
+
+def test_get_tweets_invalid_pagination(client):
+    """Тест: некорректные параметры пагинации"""
+    assert client.get('/api/tweets?limit=0').status_code == 400
+    assert client.get('/api/tweets?limit=abc').status_code == 400
+    assert client.get('/api/tweets?cursor=broken').status_code == 400
+    for cursor in ({'before_id': True}, {'after_id': False}, {'before_id': -1}):
+        assert client.get(f'/api/tweets?cursor={encode_cursor(cursor)}').status_code == 400
+    assert client.get('/api/tweets?before_id=5&after_id=1').status_code == 400
+
+
+def test_get_tweets_stream(app, client, db, monkeypatch):
+    """Тест: потоковая выдача всей ленты"""
+    monkeypatch.setitem(app.config, 'STREAM_BATCH_SIZE', 2)
+    user = User.query.filter_by(api_key='test').first()
+
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(5)]
+    db.session.add_all(tweets)
+    db.session.flush()
+    db.session.add(Like(tweet_id=tweets[0].id, user_id=user.id))
+    db.session.commit()
+    ids = sorted((tweet.id for tweet in tweets), reverse=True)
+
+    response = client.get('/api/tweets?stream=true&limit=2')
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    json_data = response.get_json()
+    assert json_data['result'] is True
+    assert [tweet['id'] for tweet in json_data['tweets']] == ids
+    assert json_data['tweets'][-1]['likes'][0]['name'] == 'test'
+    assert json_data['next_cursor'] is None
+
+    response = client.get(f'/api/tweets?stream=1&before_id={ids[1]}')
+    assert [tweet['id'] for tweet in response.get_json()['tweets']] == ids[2:]
+
+
+def test_get_tweets_etag(client, db):
+    """Тест: повторный запрос ленты с If-None-Match получает 304"""
+    user = User.query.filter_by(api_key='test').first()
+    tweet = Tweet(tweet_data='Твит', user_id=user.id)
+    db.session.add(tweet)
+    db.session.commit()
+
+    response = client.get('/api/tweets')
+    etag = response.headers['ETag']
+
+    response = client.get('/api/tweets', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    response = client.get('/api/tweets?limit=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+    client.post(f'/api/tweets/{tweet.id}/likes', headers={'API_KEY': 'test'})
+
+    response = client.get('/api/tweets', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['tweets'][0]['like_count'] == 1
+
+
+def test_feed_version_without_row_lock(client, db, query_counter):
+    """Тест: запись твитов и лайков не обновляет общую строку change_counters"""
+    tweet_id = client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers={'API_KEY': 'test'}).get_json()['tweet_id']
+    client.post(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+    client.delete(f'/api/tweets/{tweet_id}/likes', headers={'API_KEY': 'test'})
+
+    assert not any('change_counters' in s for s in query_counter.statements)
+    assert len([s for s in query_counter.statements if 'feed_version_seq' in s]) == 3
+
+
+def test_tweet_updates_returns_new_tweets(client, db):
+    """Тест: опрос обновлений возвращает только новые твиты"""
+    headers = {'API_KEY': 'test'}
+    old_id = client.post('/api/tweets', json={'tweet_data': 'Старый'}, headers=headers).get_json()['tweet_id']
+
+    response = client.get(f'/api/tweets/updates?since_id={old_id}')
+    json_data = response.get_json()
+    assert response.status_code == 200
+    assert json_data['tweets'] == []
+    assert json_data['since_id'] == old_id
+    since_seq = json_data['since_seq']
+
+    new_ids = [
+        client.post('/api/tweets', json={'tweet_data': f'Новый {i}'}, headers=headers).get_json()['tweet_id']
+        for i in range(3)
+    ]
+
+    response = client.get(f'/api/tweets/updates?since_id={old_id}&since_seq={since_seq}&limit=2')
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == [new_ids[1], new_ids[0]]
+    assert json_data['has_more'] is True
+    assert json_data['since_id'] == new_ids[1]
+    since_seq = json_data['since_seq']
+
+    response = client.get(f'/api/tweets/updates?since_id={new_ids[1]}&since_seq={since_seq}')
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == [new_ids[2]]
+    assert json_data['has_more'] is False
+
+
+def test_tweet_updates_late_commit(client, db):
+    """Тест: твит и изменение, закоммиченные позже более новых, не теряются"""
+    headers = {'API_KEY': 'test'}
+    kept_id = client.post('/api/tweets', json={'tweet_data': 'Есть у клиента'}, headers=headers).get_json()['tweet_id']
+    since_seq = client.get(f'/api/tweets/updates?since_id={kept_id}').get_json()['since_seq']
+    user = User.query.filter_by(api_key='test').first()
+
+    with db.engine.connect() as connection:
+        late_id = connection.execute(
+            insert(Tweet).values(tweet_data='Поздний', user_id=user.id).returning(Tweet.id)
+        ).scalar()
+        connection.execute(insert(TweetChange).values(tweet_id=kept_id, kind='likes', like_count=5))
+
+        new_id = client.post('/api/tweets', json={'tweet_data': 'Новый'}, headers=headers).get_json()['tweet_id']
+        assert late_id < new_id
+
+        json_data = client.get(f'/api/tweets/updates?since_id={kept_id}&since_seq={since_seq}').get_json()
+        assert [tweet['id'] for tweet in json_data['tweets']] == [new_id]
+        assert json_data['likes'] == []
+        since_id, since_seq = json_data['since_id'], json_data['since_seq']
+
+        connection.commit()
+
+    json_data = client.get(f'/api/tweets/updates?since_id={since_id}&since_seq={since_seq}').get_json()
+    assert late_id in [tweet['id'] for tweet in json_data['tweets']]
+    assert json_data['likes'] == [{'id': kept_id, 'like_count': 5}]
+
+
+def test_tweet_updates_has_more_advances(client, db):
+    """Тест: повторно пришедшие твиты не зацикливают опрос по has_more"""
+    headers = {'API_KEY': 'test'}
+    kept_id = client.post('/api/tweets', json={'tweet_data': 'Есть у клиента'}, headers=headers).get_json()['tweet_id']
+    since_seq = client.get(f'/api/tweets/updates?since_id={kept_id}').get_json()['since_seq']
+    user = User.query.filter_by(api_key='test').first()
+
+    with db.engine.connect() as connection:
+        connection.execute(insert(Tweet).values(tweet_data='Долгая транзакция', user_id=user.id))
+        new_ids = [
+            client.post('/api/tweets', json={'tweet_data': f'Новый {i}'}, headers=headers).get_json()['tweet_id']
+            for i in range(4)
+        ]
+
+        since_id, seen = kept_id, []
+        for _ in range(4):
+            json_data = client.get(
+                f'/api/tweets/updates?since_id={since_id}&since_seq={since_seq}&limit=2'
+            ).get_json()
+            assert json_data['since_id'] > since_id
+            since_id, since_seq = json_data['since_id'], json_data['since_seq']
+            seen.extend(tweet['id'] for tweet in json_data['tweets'])
+            if not json_data['has_more']:
+                break
+
+        assert json_data['has_more'] is False
+        assert since_id == new_ids[3]
+        assert set(seen) == set(new_ids)
+        connection.rollback()
+
+
+def test_tweet_updates_tombstones_and_like_counts(client, db):
+    """Тест: опрос обновлений возвращает удаления и новые счётчики лайков"""
+    headers = {'API_KEY': 'test'}
+    kept_id = client.post('/api/tweets', json={'tweet_data': 'Останется'}, headers=headers).get_json()['tweet_id']
+    deleted_id = client.post('/api/tweets', json={'tweet_data': 'Удалится'}, headers=headers).get_json()['tweet_id']
+
+    since_seq = client.get(f'/api/tweets/updates?since_id={deleted_id}').get_json()['since_seq']
+
+    client.post(f'/api/tweets/{kept_id}/likes', headers={'API_KEY': 'test_two'})
+    client.post(f'/api/tweets/{kept_id}/likes', headers=headers)
+    client.delete(f'/api/tweets/{deleted_id}', headers=headers)
+
+    response = client.get(f'/api/tweets/updates?since_id={deleted_id}&since_seq={since_seq}')
+    json_data = response.get_json()
+
+    assert json_data['tweets'] == []
+    assert json_data['deleted'] == [deleted_id]
+    assert json_data['likes'] == [{'id': kept_id, 'like_count': 2}]
+    assert json_data['since_seq'] > since_seq
+    assert json_data['reset'] is False
+
+    response = client.get(
+        f'/api/tweets/updates?since_id={deleted_id}&since_seq={json_data["since_seq"]}'
+    )
+    assert response.get_json()['deleted'] == []
+    assert response.get_json()['likes'] == []
+
+
+def test_tweet_updates_not_modified(client, db):
+    """Тест: повторный опрос без изменений возвращает 304"""
+    url = '/api/tweets/updates?since_id=0&since_seq=0'
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    client.post('/api/tweets', json={'tweet_data': 'Новый'}, headers={'API_KEY': 'test'})
+
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()['tweets']) == 1
+
+
+def test_tweet_updates_reset_after_prune(app, client, db):
+    """Тест: после очистки журнала клиенту предлагается перечитать ленту"""
+    headers = {'API_KEY': 'test'}
+    tweet_id = client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers=headers).get_json()['tweet_id']
+    client.post(f'/api/tweets/{tweet_id}/likes', headers=headers)
+
+    result = app.test_cli_runner().invoke(args=['prune-tweet-changes', '--hours', '-1'])
+    assert 'Удалено записей журнала изменений: 1' in result.output
+
+    response = client.get(f'/api/tweets/updates?since_id={tweet_id}&since_seq=0')
+    assert response.get_json()['reset'] is True
+
+
+def test_tweet_updates_requires_since_id(client):
+    """Тест: опрос обновлений без since_id"""
+    response = client.get('/api/tweets/updates')
+
+    assert response.status_code == 400
+
+
+def test_get_tweets_by_ids(client, db):
+    """Тест: пакетная загрузка твитов по списку id в порядке запроса"""
+    user = User.query.filter_by(api_key='test').first()
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(3)]
+    db.session.add_all(tweets)
+    db.session.commit()
+
+    missing_id = tweets[-1].id + 100
+    ids = [tweets[1].id, missing_id, tweets[0].id, tweets[2].id, tweets[1].id]
+    response = client.get('/api/tweets?ids=' + ','.join(map(str, ids)))
+
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == [tweets[1].id, tweets[0].id, tweets[2].id]
+    assert json_data['tweets'][0]['content'] == 'Твит 1'
+    assert json_data['missing'] == [missing_id]
+
+
+def test_get_tweets_by_ids_invalid(client):
+    """Тест: неверный или слишком длинный список id"""
+    assert client.get('/api/tweets?ids=1,abc').status_code == 400
+    assert client.get('/api/tweets?ids=²').status_code == 400
+    assert client.get('/api/tweets?ids=').status_code == 400
+
+    ids = ','.join(str(i) for i in range(1, 202))
+    assert client.get(f'/api/tweets?ids={ids}').status_code == 400
+
+
+def test_get_user_tweets_pagination(client, db):
+    """Тест: постраничные твиты одного автора"""
+    user = User.query.filter_by(api_key='test').first()
+    other = User.query.filter_by(api_key='test_two').first()
+
+    tweets = [Tweet(tweet_data=f'Твит {i}', user_id=user.id) for i in range(3)]
+    db.session.add_all(tweets)
+    db.session.add(Tweet(tweet_data='Чужой твит', user_id=other.id))
+    db.session.commit()
+    ids = sorted((tweet.id for tweet in tweets), reverse=True)
+
+    response = client.get(f'/api/users/{user.id}/tweets?limit=2')
+    json_data = response.get_json()
+
+    assert response.status_code == 200
+    assert [tweet['id'] for tweet in json_data['tweets']] == ids[:2]
+    assert json_data['tweets'][0]['author']['id'] == user.id
+
+    response = client.get(f"/api/users/{user.id}/tweets?limit=2&cursor={json_data['next_cursor']}")
+    json_data = response.get_json()
+    assert [tweet['id'] for tweet in json_data['tweets']] == ids[2:]
+    assert json_data['next_cursor'] is None
+
+
+def test_get_user_tweets_etag(client, db):
+    """Тест: твиты автора отдаются с ETag и сбрасываются новым твитом"""
+    user = User.query.filter_by(api_key='test').first()
+
+    response = client.get(f'/api/users/{user.id}/tweets')
+    etag = response.headers['ETag']
+    assert response.get_json()['tweets'] == []
+
+    response = client.get(f'/api/users/{user.id}/tweets', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers={'API_KEY': 'test'})
+
+    response = client.get(f'/api/users/{user.id}/tweets', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()['tweets']) == 1
+
+
+def test_get_user_tweets_errors(client):
+    """Тест: твиты несуществующего пользователя и неверный курсор"""
+    assert client.get('/api/users/999/tweets').status_code == 404
+    assert client.get('/api/users/1/tweets?cursor=bad').status_code == 400
@@ -1,3 +1,4 @@
+import pytest
 from app.models import User, Subscribe
 from unittest.mock import patch, MagicMock
 
@@ -20,6 +21,7 @@ def test_get_my_account_info_no_subscriptions(client, db):
     assert user_data['name'] == 'test'
     assert user_data['followers'] == []
     assert user_data['following'] == []
+    assert user_data['tweets_count'] == 0
 
 
 def test_get_my_account_info_with_subscriptions(client, db):
@@ -258,22 +260,20 @@ def test_get_account_info_many_followers(client, db):
         test_users.append(user)
 
     db.session.add_all(test_users)
-    db.session.flush()
+    db.session.commit()
 
-    subscriptions = []
     for user in test_users:
-        subscribe = Subscribe(subscriber_id=user.id, target_id=user_main.id)
-        subscriptions.append(subscribe)
-
-    db.session.add_all(subscriptions)
-    db.session.commit()
+        client.post(f'/api/users/{user_main.id}/follow', headers={'API_KEY': user.api_key})
 
     response = client.get(f'/api/users/{user_main.id}')
     user_data = response.get_json()['user']
 
-    assert len(user_data['followers']) == 10
+    assert user_data['followers_count'] == 10
+    assert user_data['following_count'] == 0
+    assert [f['id'] for f in user_data['followers']] == [u.id for u in reversed(test_users[-3:])]
 
-    follower_ids = [f['id'] for f in user_data['followers']]
+    response = client.get(f'/api/users/{user_main.id}/followers')
+    follower_ids = [f['id'] for f in response.get_json()['followers']]
     assert len(set(follower_ids)) == 10
 
 
@@ -282,16 +282,7 @@ from unittest.mock import patch, MagicMock
 
 def test_get_my_account_info_database_error(client, db):
     """Тест: обработка ошибок базы данных при получении информации о пользователе"""
-    with patch('app.routers.db.session.query') as mock_query:
-        mock_query_instance = MagicMock()
-        mock_options = MagicMock()
-        mock_filter = MagicMock()
-
-        mock_filter.one_or_none.side_effect = Exception('Database connection error')
-        mock_options.filter.return_value = mock_filter
-        mock_query_instance.options.return_value = mock_options
-        mock_query.return_value = mock_query_instance
-
+    with patch('app.routers.db.session.execute', side_effect=Exception('Database connection error')):
         headers = {'API_KEY': 'test'}
         response = client.get('/api/users/me', headers=headers)
 
@@ -316,3 +307,159 @@ def test_get_account_info_empty_subscription_objects(client, db):
     assert json_data['result'] is True
     assert json_data['user']['followers'] == []
     assert json_data['user']['following'] == []
+
+
+def test_get_account_info_etag(client, db):
+    """Тест: профиль отдаёт 304, пока подписки не изменились"""
+    user1 = User.query.filter_by(api_key='test').first()
+    user2 = User.query.filter_by(api_key='test_two').first()
+
+    response = client.get(f'/api/users/{user1.id}')
+    etag = response.headers['ETag']
+
+    response = client.get(f'/api/users/{user1.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    me = client.get('/api/users/me', headers={'API_KEY': 'test'})
+    me_etag = me.headers['ETag']
+    response = client.get(
+        '/api/users/me', headers={'API_KEY': 'test', 'If-None-Match': me_etag}
+    )
+    assert response.status_code == 304
+
+    client.post(f'/api/users/{user1.id}/follow', headers={'API_KEY': 'test_two'})
+
+    response = client.get(f'/api/users/{user1.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['user']['followers'][0]['id'] == user2.id
+
+    response = client.get(
+        '/api/users/me', headers={'API_KEY': 'test', 'If-None-Match': me_etag}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('url', ['/api/users/me', '/api/users/{user_id}'])
+def test_profile_query_count_does_not_grow(client, db, query_counter, url):
+    """Тест: число запросов профиля не зависит от числа подписок"""
+    user_main = User.query.filter_by(api_key='test').first()
+    url = url.format(user_id=user_main.id)
+    headers = {'API_KEY': 'test'}
+
+    def profile_queries():
+        query_counter.reset()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return query_counter.count
+
+    client.get(url, headers=headers)
+    baseline = profile_queries()
+
+    followers = [User(name=f'follower_{i}', api_key=f'follower_{i}') for i in range(20)]
+    db.session.add_all(followers)
+    db.session.flush()
+    db.session.add_all(Subscribe(subscriber_id=user.id, target_id=user_main.id) for user in followers)
+    db.session.add_all(Subscribe(subscriber_id=user_main.id, target_id=user.id) for user in followers[:5])
+    db.session.commit()
+
+    assert profile_queries() == baseline
+    assert baseline <= 4
+
+
+def test_my_account_matches_profile_with_subscriptions(client, db):
+    """Тест: подписчики и подписки в /me совпадают с профилем по id"""
+    user1 = User.query.filter_by(api_key='test').first()
+    user2 = User.query.filter_by(api_key='test_two').first()
+    user3 = User(name='user3', api_key='key3')
+    db.session.add(user3)
+    db.session.flush()
+    db.session.add_all([
+        Subscribe(subscriber_id=user2.id, target_id=user1.id),
+        Subscribe(subscriber_id=user1.id, target_id=user3.id),
+    ])
+    db.session.commit()
+
+    data_me = client.get('/api/users/me', headers={'API_KEY': 'test'}).get_json()['user']
+    data_id = client.get(f'/api/users/{user1.id}').get_json()['user']
+
+    assert data_me == data_id
+    assert data_me['followers'] == [{'id': user2.id, 'name': 'test_two'}]
+    assert data_me['following'] == [{'id': user3.id, 'name': 'user3'}]
+
+
+def test_get_user_followers_and_following_pagination(client, db):
+    """Тест: постраничные списки подписчиков и подписок"""
+    user_main = User.query.filter_by(api_key='test').first()
+    users = [User(name=f'user_{i}', api_key=f'key_{i}') for i in range(5)]
+    db.session.add_all(users)
+    db.session.flush()
+    db.session.add_all(Subscribe(subscriber_id=user.id, target_id=user_main.id) for user in users)
+    db.session.add(Subscribe(subscriber_id=user_main.id, target_id=users[0].id))
+    db.session.commit()
+
+    collected = []
+    url = f'/api/users/{user_main.id}/followers?limit=2'
+    while url:
+        json_data = client.get(url).get_json()
+        assert len(json_data['followers']) <= 2
+        collected.extend(f['id'] for f in json_data['followers'])
+        cursor = json_data['next_cursor']
+        url = f'/api/users/{user_main.id}/followers?limit=2&cursor={cursor}' if cursor else None
+
+    assert collected == [user.id for user in reversed(users)]
+
+    json_data = client.get(f'/api/users/{user_main.id}/following').get_json()
+    assert json_data['following'] == [{'id': users[0].id, 'name': 'user_0'}]
+    assert json_data['next_cursor'] is None
+
+
+def test_get_user_followers_errors(client, db):
+    """Тест: списки подписок несуществующего пользователя и неверный курсор"""
+    assert client.get('/api/users/999/followers').status_code == 404
+    assert client.get('/api/users/999/following').status_code == 404
+    assert client.get('/api/users/1/followers?cursor=bad').status_code == 400
+
+
+def test_user_counters_maintained(client, db):
+    """Тест: счётчики подписок и твитов обновляются при изменениях"""
+    user_main = User.query.filter_by(api_key='test').first()
+    other = User(name='other', api_key='other_key')
+    db.session.add(other)
+    db.session.commit()
+
+    client.post(f'/api/users/{other.id}/follow', headers={'API_KEY': 'test'})
+    client.post('/api/tweets', json={'tweet_data': 'Твит'}, headers={'API_KEY': 'other_key'})
+
+    db.session.refresh(user_main)
+    db.session.refresh(other)
+    assert (user_main.following_count, user_main.followers_count) == (1, 0)
+    assert (other.followers_count, other.tweets_count) == (1, 1)
+
+    profile = client.get(f'/api/users/{other.id}').get_json()['user']
+    assert (profile['followers_count'], profile['following_count'], profile['tweets_count']) == (1, 0, 1)
+    me = client.get('/api/users/me', headers={'API_KEY': 'other_key'}).get_json()['user']
+    assert me['tweets_count'] == 1
+
+    client.delete(f'/api/users/{other.id}/follow', headers={'API_KEY': 'test'})
+
+    db.session.refresh(other)
+    assert other.followers_count == 0
+
+
+def test_reconcile_user_counters_command(app, db):
+    """Тест: команда сверки исправляет разошедшиеся счётчики"""
+    user_main = User.query.filter_by(api_key='test').first()
+    other = User(name='other', api_key='other_key', followers_count=7)
+    db.session.add(other)
+    db.session.flush()
+    db.session.add(Subscribe(subscriber_id=user_main.id, target_id=other.id))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['reconcile-user-counters'])
+
+    assert 'Расхождений followers_count: 1' in result.output
+    assert 'Исправлено пользователей: 2' in result.output
+    db.session.refresh(user_main)
+    db.session.refresh(other)
+    assert user_main.following_count == 1
+    assert other.followers_count == 1